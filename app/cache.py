@@ -0,0 +1,178 @@
+# app/cache.py
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app.db import DATABASE_READ_URL
+from app.models import Assessment, Couple, Prediction, Recommendation
+from config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, REPLICA_LAG_SECONDS
+
+Tag = Tuple[str, int]  # ("couple", 7), ("doctor", 3), ("assessment", 12)
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "tags", "expires")
+
+    def __init__(self, body: bytes, tags: Set[Tag], expires: float):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.tags = tags
+        self.expires = expires
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU of serialized JSON responses, invalidated by tag.
+    Per-process: each API worker keeps its own copy and only sees its own commits,
+    so entries also expire after ttl seconds; that bounds how long writes made by
+    other workers or out-of-process jobs can be served stale. With a read replica,
+    bodies built within no_store_after_write seconds of a tag's invalidation are
+    served but not kept (the replica may not have the write yet).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 5.0, no_store_after_write: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.no_store_after_write = no_store_after_write
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._by_tag: Dict[Tag, Set[Hashable]] = {}
+        # bumped on every invalidation; guards against caching a body built from pre-write data
+        self._tag_versions: Dict[Tag, int] = {}
+        self._invalidated_at: Dict[Tag, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def versions(self, tags: Iterable[Tag]) -> Dict[Tag, int]:
+        with self._lock:
+            return {t: self._tag_versions.get(t, 0) for t in tags}
+
+    def put(self, key: Hashable, body: bytes, tags: Set[Tag], versions: Dict[Tag, int]) -> CacheEntry:
+        now = time.monotonic()
+        entry = CacheEntry(body, tags, now + self.ttl)
+        with self._lock:
+            # a write landed while the body was being built: serve it, don't keep it
+            if any(self._tag_versions.get(t, 0) != v for t, v in versions.items()):
+                return entry
+            # recent write: the (replica) read may predate it
+            if any(now - self._invalidated_at.get(t, float("-inf")) < self.no_store_after_write for t in tags):
+                return entry
+            self._drop(key)
+            self._entries[key] = entry
+            for t in tags:
+                self._by_tag.setdefault(t, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, tags: Iterable[Tag]):
+        with self._lock:
+            now = time.monotonic()
+            for t in tags:
+                self._tag_versions[t] = self._tag_versions.get(t, 0) + 1
+                if self.no_store_after_write:
+                    self._invalidated_at[t] = now
+                for key in list(self._by_tag.pop(t, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "ttl_s": self.ttl, "hits": self.hits, "misses": self.misses}
+
+    def _drop(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for t in entry.tags:
+            keys = self._by_tag.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[t]
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, REPLICA_LAG_SECONDS if DATABASE_READ_URL else 0.0)
+
+
+async def cached_json(request: Request, key: Hashable, tags: Set[Tag], build: Callable[[], Awaitable[Any]]) -> Response:
+    """
+    Serve a JSON body from the cache (or build and cache it), honoring If-None-Match.
+    build() may raise HTTPException; errors are never cached.
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        versions = response_cache.versions(tags)
+        payload = await build()
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+        entry = response_cache.put(key, body, tags, versions)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# ------------------------
+# Invalidation on writes
+# ------------------------
+def _tags_for_flush(session: Session) -> Set[Tag]:
+    tags: Set[Tag] = set()
+    assessment_ids: Set[int] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Couple):
+            tags.update({("couple", obj.id), ("doctor", obj.doctor_id)})
+        elif isinstance(obj, Assessment):
+            tags.update({("assessment", obj.id), ("couple", obj.couple_id), ("doctor", obj.doctor_id)})
+        elif isinstance(obj, (Prediction, Recommendation)):
+            assessment_ids.add(obj.assessment_id)
+    if assessment_ids:
+        tags.update(("assessment", aid) for aid in assessment_ids)
+        # Predictions/recommendations feed couple history and the doctor dashboard
+        rows = session.connection().execute(
+            select(Assessment.couple_id, Assessment.doctor_id).where(Assessment.id.in_(assessment_ids))
+        ).all()
+        for couple_id, doctor_id in rows:
+            tags.update({("couple", couple_id), ("doctor", doctor_id)})
+    # rows being inserted have no id yet; nothing can be cached under it
+    return {t for t in tags if t[1] is not None}
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_invalidation_tags(session, flush_context, instances):
+    session.info.setdefault("cache_tags", set()).update(_tags_for_flush(session))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    tags = session.info.pop("cache_tags", None)
+    if tags:
+        response_cache.invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("cache_tags", None)
@@ -1,22 +1,146 @@
 # app/db.py
+import time
+import threading
+from typing import Dict, Any
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from config import os, load_dotenv
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica; GET endpoints read from it when set
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
 
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL not set in .env")
 
-engine = create_engine(DATABASE_URL, future=True, pool_pre_ping=True)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+
+
+class PoolStats:
+    """Thread-safe counters for time spent waiting on a pool checkout."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def record(self, wait_s: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_s += wait_s
+            self.wait_max_s = max(self.wait_max_s, wait_s)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            avg = (self.wait_total_s / self.checkouts) if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "wait_avg_ms": round(avg * 1000, 3),
+                "wait_max_ms": round(self.wait_max_s * 1000, 3),
+                "wait_total_ms": round(self.wait_total_s * 1000, 3),
+            }
+
+
+class _TimedPoolMixin:
+    """Records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.record(time.perf_counter() - start)
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# async drivers for the sync URLs in .env
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def _async_url(url: str):
+    u = make_url(url)
+    return u.set(drivername=_ASYNC_DRIVERS.get(u.get_backend_name(), u.drivername))
+
+
+def _pool_kwargs(url: str, poolclass) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"pool_pre_ping": DB_POOL_PRE_PING}
+    # sqlite (local dev) keeps SQLAlchemy's default pool
+    if make_url(url).get_backend_name() != "sqlite":
+        kwargs.update(
+            poolclass=poolclass,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return kwargs
+
+def _make_engine(url: str):
+    return create_engine(url, future=True, **_pool_kwargs(url, TimedQueuePool))
+
+def _make_async_engine(url: str):
+    return create_async_engine(_async_url(url), **_pool_kwargs(url, TimedAsyncQueuePool))
+
+
+# Sync engine: scripts, migrations and background jobs (primary only). Pools open lazily on first use.
+engine = _make_engine(DATABASE_URL)
+
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
 
+# Async engines: the FastAPI service
+async_engine = _make_async_engine(DATABASE_URL)
+async_read_engine = _make_async_engine(DATABASE_READ_URL) if DATABASE_READ_URL else async_engine
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def get_async_read_db():
+    """Async session for read-only endpoints; uses the replica when DATABASE_READ_URL is set."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def pool_metrics() -> Dict[str, Any]:
+    """Pool occupancy and checkout wait-time stats for the write and read engines."""
+    out = {}
+    engines = {"primary": engine, "primary_async": async_engine.sync_engine}
+    if async_read_engine is not async_engine:
+        engines["replica_async"] = async_read_engine.sync_engine
+    for name, eng in engines.items():
+        pool = eng.pool
+        info: Dict[str, Any] = {"status": pool.status()}
+        if isinstance(pool, QueuePool):
+            info.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        if isinstance(pool, _TimedPoolMixin):
+            info.update(pool.stats.snapshot())
+        out[name] = info
+    return out
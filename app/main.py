@@ -1,54 +1,117 @@
 # app/main.py
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+import os
+import asyncio
+from datetime import datetime
+from fastapi import FastAPI, Depends, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
-from app.db import Base, engine, get_db
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.db import async_engine, AsyncReadSessionLocal, get_async_db, get_async_read_db, pool_metrics
+from app.cache import cached_json, response_cache
+from gemini_router import router_stats
 from app.models import (
     Doctor, Couple, Question, Assessment, Answer,
-    PartnerEnum, Prediction, Recommendation
+    PartnerEnum, Prediction, Recommendation, PredictionExplanation
 )
 from app.schemas import (
     DoctorCreate, DoctorOut,
-    CoupleCreate, CoupleOut,
+    CoupleCreate, CoupleOut, CoupleOutcomeIn,
     QuestionCreate, QuestionOut,
     AssessmentCreate, AssessmentOut,
     AnswersBulkIn, PredictionOut,
-    DashboardOut, DashboardCoupleRow,
-    PredictionHistoryOut
+    DashboardOut, DashboardCoupleRow, PredictionHistoryItem,
+    PredictionHistoryOut, BulkPredictIn, BulkPredictOut,
+    WhatIfIn, DoctorDashboardPageOut, CoupleOverviewOut
 )
-from app.services.predictor import predict_for_assessment
-from app.services.recommendation import generate_recommendation
+from app.services.predictor import predict_for_assessments_async, get_explainer, get_scorer
+from app.services.explain import contributions, pack, vectors_to_matrix, explanation_payload
+from app.services.whatif import run_whatif
+from app.services.adaptive import partial_vector, next_question, MODES
+from app.services.similar import get_index, sync_index, refresh_periodically, save_index
+from app.services.shadow import shadow_scorer, shadow_report_query, shadow_report
+from app.services.retention import archive_periodically, restore_async
+from app.services.timeline import timeline_query, build_timeline
+from app.services.export import STREAM_FORMATS, columns, export_query, iter_chunks_async, ndjson_block, csv_block
+from canonical import ID2TEXT
+from app.services.recommendation import generate_recommendation_async
+from config import STATIC_MAX_AGE, ARCHIVE_AFTER_DAYS
 
-# Create tables (demo; in prod use Alembic)
-Base.metadata.create_all(bind=engine)
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the schema is brought up to date by an explicit deploy step (python -m app.migrate), not per worker here
+    # similar-couples index: cohort CSV or snapshot, then any predictions it has not seen
+    index = await asyncio.to_thread(get_index)
+    async with AsyncReadSessionLocal() as db:
+        await sync_index(db, index)
+    # ... and new predictions every SIMILAR_REFRESH_SECONDS, off the request path
+    refresher = asyncio.create_task(refresh_periodically())
+    # hot/cold tiering: move old audit payloads to prediction_archive in the background
+    archiver = asyncio.create_task(archive_periodically()) if ARCHIVE_AFTER_DAYS > 0 else None
+    yield
+    refresher.cancel()
+    if archiver is not None:
+        archiver.cancel()
+    await asyncio.to_thread(shadow_scorer.close)
+    await asyncio.to_thread(save_index)
+    await async_engine.dispose()
 
-app = FastAPI(title="Divorce Risk Service", version="0.1.0")
+
+app = FastAPI(title="Divorce Risk Service", version="0.1.0", lifespan=lifespan)
 
 # Root endpoint for health check or welcome message
 @app.get("/")
-def root():
+async def root():
     return {"message": "Divorce Risk Service API is running."}
 
+@app.get("/metrics/db_pool")
+async def db_pool_metrics():
+    return pool_metrics()
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    return response_cache.stats()
+
+@app.get("/metrics/router")
+async def router_metrics():
+    return router_stats.snapshot()
+
+@app.get("/metrics/scoring")
+async def scoring_metrics():
+    scorer = get_scorer()
+    return scorer.stats() if hasattr(scorer, "stats") else {"address": None, "mode": "in-process"}
+
+@app.get("/metrics/shadow")
+async def shadow_metrics(window: int = Query(10000, ge=1, le=1000000), db: AsyncSession = Depends(get_async_read_db)):
+    """Candidate models (SHADOW_MODEL_PATHS) vs the live model over the latest `window` shadow scores."""
+    rows = (await db.execute(shadow_report_query(window))).all()
+    return {**shadow_scorer.stats(), "window": window, "models": shadow_report(rows)}
+
 # CORS (adjust for your frontend)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], allow_credentials=True
 )
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 @app.post("/doctors", response_model=DoctorOut)
-def create_doctor(payload: DoctorCreate, db: Session = Depends(get_db)):
-    exists = db.query(Doctor).filter(Doctor.email == payload.email).first()
+async def create_doctor(payload: DoctorCreate, db: AsyncSession = Depends(get_async_db)):
+    exists = (await db.execute(select(Doctor).where(Doctor.email == payload.email))).scalars().first()
     if exists:
         raise HTTPException(400, "Doctor with this email already exists")
     doc = Doctor(name=payload.name, email=payload.email)
-    db.add(doc); db.commit(); db.refresh(doc)
+    db.add(doc); await db.commit(); await db.refresh(doc)
     return doc
 
 @app.post("/couples", response_model=CoupleOut)
-def create_couple(payload: CoupleCreate, db: Session = Depends(get_db)):
-    doc = db.query(Doctor).get(payload.doctor_id)
+async def create_couple(payload: CoupleCreate, db: AsyncSession = Depends(get_async_db)):
+    doc = await db.get(Doctor, payload.doctor_id)
     if not doc:
         raise HTTPException(404, "Doctor not found")
     c = Couple(
@@ -56,35 +119,46 @@ def create_couple(payload: CoupleCreate, db: Session = Depends(get_db)):
         partner_a_name=payload.partner_a_name,
         partner_b_name=payload.partner_b_name
     )
-    db.add(c); db.commit(); db.refresh(c)
+    db.add(c); await db.commit(); await db.refresh(c)
+    return c
+
+@app.post("/couples/{couple_id}/outcome", response_model=CoupleOut)
+async def record_outcome(couple_id: int, payload: CoupleOutcomeIn, db: AsyncSession = Depends(get_async_db)):
+    """Record the observed follow-up outcome; labels the couple's assessments for continual_train.py."""
+    c = await db.get(Couple, couple_id)
+    if not c:
+        raise HTTPException(404, "Couple not found")
+    c.outcome = payload.outcome
+    c.outcome_at = datetime.utcnow()
+    await db.commit(); await db.refresh(c)
     return c
 
 @app.post("/questions", response_model=QuestionOut)
-def create_question(payload: QuestionCreate, db: Session = Depends(get_db)):
-    doc = db.query(Doctor).get(payload.doctor_id)
+async def create_question(payload: QuestionCreate, db: AsyncSession = Depends(get_async_db)):
+    doc = await db.get(Doctor, payload.doctor_id)
     if not doc:
         raise HTTPException(404, "Doctor not found")
     q = Question(doctor_id=payload.doctor_id, text=payload.text, active=True)
-    db.add(q); db.commit(); db.refresh(q)
+    db.add(q); await db.commit(); await db.refresh(q)
     return q
 
 @app.post("/assessments", response_model=AssessmentOut)
-def create_assessment(payload: AssessmentCreate, db: Session = Depends(get_db)):
-    doc = db.query(Doctor).get(payload.doctor_id)
+async def create_assessment(payload: AssessmentCreate, db: AsyncSession = Depends(get_async_db)):
+    doc = await db.get(Doctor, payload.doctor_id)
     if not doc:
         raise HTTPException(404, "Doctor not found")
-    couple = db.query(Couple).get(payload.couple_id)
+    couple = await db.get(Couple, payload.couple_id)
     if not couple:
         raise HTTPException(404, "Couple not found")
     if couple.doctor_id != payload.doctor_id:
         raise HTTPException(400, "Couple does not belong to this doctor")
     a = Assessment(doctor_id=payload.doctor_id, couple_id=payload.couple_id, title=payload.title)
-    db.add(a); db.commit(); db.refresh(a)
+    db.add(a); await db.commit(); await db.refresh(a)
     return a
 
 @app.post("/assessments/{assessment_id}/answers/bulk")
-def add_answers(assessment_id: int, payload: AnswersBulkIn, db: Session = Depends(get_db)):
-    assessment = db.query(Assessment).get(assessment_id)
+async def add_answers(assessment_id: int, payload: AnswersBulkIn, db: AsyncSession = Depends(get_async_db)):
+    assessment = await db.get(Assessment, assessment_id)
     if not assessment:
         raise HTTPException(404, "Assessment not found")
     rows = []
@@ -93,120 +167,373 @@ def add_answers(assessment_id: int, payload: AnswersBulkIn, db: Session = Depend
             raise HTTPException(400, "Value must be 0..4")
         rows.append(Answer(
             assessment_id=assessment_id,
+            doctor_id=assessment.doctor_id,
             question_id=item.question_id,
             partner=PartnerEnum(item.partner),
             value=int(item.value),
             user_text=item.text
         ))
-    db.add_all(rows); db.commit()
+    db.add_all(rows); await db.commit()
     return {"inserted": len(rows)}
 
 @app.post("/assessments/{assessment_id}/predict", response_model=PredictionOut)
-def do_predict(assessment_id: int, db: Session = Depends(get_db)):
-    assessment = db.query(Assessment).get(assessment_id)
+async def do_predict(assessment_id: int, db: AsyncSession = Depends(get_async_db)):
+    assessment = await db.get(Assessment, assessment_id)
     if not assessment:
         raise HTTPException(404, "Assessment not found")
 
-    proba, pred_class, vector_json, audit_json = predict_for_assessment(db, assessment_id)
-    pred_row = db.query(Prediction).filter(Prediction.assessment_id == assessment_id)\
-                                   .order_by(Prediction.created_at.desc()).first()
+    pred_row = (await predict_for_assessments_async(db, [assessment_id]))[0]
     return pred_row
 
-@app.get("/doctors/{doctor_id}/dashboard", response_model=DashboardOut)
-def doctor_dashboard(doctor_id: int, db: Session = Depends(get_db)):
-    doc = db.query(Doctor).get(doctor_id)
-    if not doc:
-        raise HTTPException(404, "Doctor not found")
-    couples = db.query(Couple).filter(Couple.doctor_id == doctor_id).all()
-    out_rows: List[DashboardCoupleRow] = []
-    for c in couples:
-        last_pred = (
-            db.query(Prediction)
-            .join(Assessment, Prediction.assessment_id == Assessment.id)
-            .filter(Assessment.couple_id == c.id)
-            .order_by(Prediction.created_at.desc())
-            .first()
-        )
-        out_rows.append(DashboardCoupleRow(
+@app.post("/assessments/predict/bulk", response_model=BulkPredictOut)
+async def do_predict_bulk(payload: BulkPredictIn, db: AsyncSession = Depends(get_async_db)):
+    assessment_ids = list(dict.fromkeys(payload.assessment_ids))
+    found = set((await db.execute(select(Assessment.id).where(Assessment.id.in_(assessment_ids)))).scalars().all())
+    missing = [aid for aid in assessment_ids if aid not in found]
+    if missing:
+        raise HTTPException(404, f"Assessments not found: {missing}")
+
+    pred_rows = await predict_for_assessments_async(db, assessment_ids)
+    return {"items": pred_rows}
+
+@app.get("/assessments/{assessment_id}/next_question")
+async def assessment_next_question(assessment_id: int, mode: str = "change", db: AsyncSession = Depends(get_async_read_db)):
+    """Adaptive mode: the unanswered canonical item worth asking next, or stable=true when more answers won't matter."""
+    if mode not in MODES:
+        raise HTTPException(400, f"mode must be one of {list(MODES)}")
+    assessment = await db.get(Assessment, assessment_id)
+    if not assessment:
+        raise HTTPException(404, "Assessment not found")
+    answers = (await db.execute(
+        select(Answer).where(Answer.doctor_id == assessment.doctor_id, Answer.assessment_id == assessment_id)
+    )).scalars().all()
+    routed = (await db.execute(
+        select(Prediction.vector_json)
+        .where(Prediction.assessment_id == assessment_id)
+        .order_by(Prediction.created_at.desc())
+        .limit(1)
+    )).scalars().first()
+    # scoring may be a round trip to the scoring service: keep it off the event loop
+    out = await asyncio.to_thread(next_question, partial_vector(answers, routed), mode=mode)
+    return {"assessment_id": assessment_id, **out}
+
+@app.post("/assessments/{assessment_id}/whatif")
+async def assessment_whatif(assessment_id: int, payload: Optional[WhatIfIn] = None, db: AsyncSession = Depends(get_async_read_db)):
+    """Rank the answers (and, separately, the unanswered questions) whose change would lower proba the most (latest prediction's vector)."""
+    payload = payload or WhatIfIn()
+    for sc in payload.scenarios:
+        bad = [f for f, v in sc.changes.items() if f not in ID2TEXT or (v is not None and not 0 <= v <= 4)]
+        if bad:
+            raise HTTPException(400, f"Invalid scenario changes (unknown feature or value outside 0..4): {bad}")
+
+    latest_pred = (await db.execute(
+        select(Prediction)
+        .where(Prediction.assessment_id == assessment_id)
+        .order_by(Prediction.created_at.desc())
+        .limit(1)
+    )).scalars().first()
+    if not latest_pred:
+        raise HTTPException(404, "No prediction found for this assessment. Run prediction first.")
+
+    out = await asyncio.to_thread(run_whatif, latest_pred.vector_json, [sc.model_dump() for sc in payload.scenarios],
+                                 top_k=payload.top_k, stored_proba=latest_pred.proba)
+    return {"assessment_id": assessment_id, "prediction_id": latest_pred.id, **out}
+
+@app.get("/assessments/{assessment_id}/similar")
+async def similar_couples(assessment_id: int, k: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_async_read_db)):
+    """Nearest historical couples (stored predictions + reference cohort) to this assessment's latest vector."""
+    row = (await db.execute(
+        select(Prediction, Assessment.couple_id)
+        .join(Assessment, Assessment.id == Prediction.assessment_id)
+        .where(Prediction.assessment_id == assessment_id)
+        .order_by(Prediction.created_at.desc())
+        .limit(1)
+    )).first()
+    if not row:
+        raise HTTPException(404, "No prediction found for this assessment. Run prediction first.")
+    latest_pred, couple_id = row
+
+    # the index catches up in the background (refresh_periodically): neighbours may lag by SIMILAR_REFRESH_SECONDS
+    index = get_index()
+    hits = index.search(vectors_to_matrix([latest_pred.vector_json])[0], k=k, exclude_couple=couple_id)
+
+    pred_ids = [h["ref"] for h in hits if h["source"] == "prediction"]
+    preds, recs = {}, {}
+    if pred_ids:
+        preds = {p.id: p for p in (await db.execute(select(Prediction).where(Prediction.id.in_(pred_ids)))).scalars()}
+        recs = {r.assessment_id: r for r in (await db.execute(
+            select(Recommendation).where(Recommendation.assessment_id.in_([p.assessment_id for p in preds.values()]))
+        )).scalars()}
+
+    items = []
+    for h in hits:
+        item = {"source": h["source"], "distance": h["distance"], "overlap": h["overlap"]}
+        if h["source"] == "cohort":
+            item.update({"cohort_row": h["ref"],
+                         "outcome": None if h["label"] is None else ("divorced" if h["label"] == 1 else "married")})
+        else:
+            p = preds.get(h["ref"])
+            if p is None:
+                continue  # deleted since it was indexed
+            rec = recs.get(p.assessment_id)
+            item.update({"couple_id": h["couple_id"], "assessment_id": p.assessment_id, "prediction_id": p.id,
+                         "proba": p.proba, "pred_class": p.pred_class,
+                         "recommendation": {"domains": rec.domains_json, "modules": rec.modules_json} if rec else None})
+        items.append(item)
+
+    return {"assessment_id": assessment_id, "prediction_id": latest_pred.id, "index_size": len(index), "items": items}
+
+async def _dashboard_rows(db: AsyncSession, doctor_id: int) -> List[DashboardCoupleRow]:
+    """Every couple of a doctor with its latest prediction, in one query."""
+    latest = (
+        select(Assessment.couple_id, func.max(Prediction.id).label("prediction_id"))
+        .join(Prediction, Prediction.assessment_id == Assessment.id)
+        .join(Couple, Couple.id == Assessment.couple_id)
+        .where(Couple.doctor_id == doctor_id, Prediction.doctor_id == doctor_id)  # the latter prunes to the tenant's partition
+        .group_by(Assessment.couple_id)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(Couple, Prediction.proba, Prediction.pred_class)
+        .outerjoin(latest, latest.c.couple_id == Couple.id)
+        .outerjoin(Prediction, Prediction.id == latest.c.prediction_id)
+        .where(Couple.doctor_id == doctor_id)
+        .order_by(Couple.id)
+    )).all()
+    return [
+        DashboardCoupleRow(
             couple_id=c.id,
             partner_a_name=c.partner_a_name,
             partner_b_name=c.partner_b_name,
-            last_proba=(last_pred.proba if last_pred else None),
-            last_class=(last_pred.pred_class if last_pred else None),
-        ))
-    return DashboardOut(doctor_id=doctor_id, couples=out_rows)
+            last_proba=proba,
+            last_class=pred_class,
+        )
+        for c, proba, pred_class in rows
+    ]
+
+@app.get("/doctors/by_email/dashboard", response_model=DoctorDashboardPageOut)
+async def doctor_dashboard_by_email(email: str, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    """Login + dashboard page bootstrap in one round trip."""
+    doc = (await db.execute(select(Doctor).where(Doctor.email == email))).scalars().first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    async def build():
+        return DoctorDashboardPageOut(doctor=DoctorOut.model_validate(doc), couples=await _dashboard_rows(db, doc.id))
+
+    return await cached_json(request, ("dashboard_page", doc.id), {("doctor", doc.id)}, build)
+
+@app.get("/doctors/{doctor_id}/dashboard", response_model=DashboardOut)
+async def doctor_dashboard(doctor_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        doc = await db.get(Doctor, doctor_id)
+        if not doc:
+            raise HTTPException(404, "Doctor not found")
+        return DashboardOut(doctor_id=doctor_id, couples=await _dashboard_rows(db, doctor_id))
+
+    return await cached_json(request, ("dashboard", doctor_id), {("doctor", doctor_id)}, build)
 
 @app.get("/doctors/by_email")
-def get_doctor_by_email(email: str, db: Session = Depends(get_db)):
-    doctor = db.query(Doctor).filter(Doctor.email == email).first()
+async def get_doctor_by_email(email: str, db: AsyncSession = Depends(get_async_read_db)):
+    doctor = (await db.execute(select(Doctor).where(Doctor.email == email))).scalars().first()
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
     return doctor
 
-@app.get("/couples/{couple_id}/history", response_model=PredictionHistoryOut)
-def couple_history(couple_id: int, db: Session = Depends(get_db)):
-    couple = db.query(Couple).get(couple_id)
-    if not couple:
-        raise HTTPException(404, "Couple not found")
-
-    # join prediction -> assessment to get title (and keep prediction fields)
-    preds = (
-        db.query(Prediction, Assessment.title)
+async def _history_items(db: AsyncSession, couple_id: int) -> List[PredictionHistoryItem]:
+    """A couple's predictions (newest first) with assessment title and whether a recommendation exists, in one query."""
+    has_rec = select(Recommendation.id).where(Recommendation.assessment_id == Prediction.assessment_id).exists()
+    rows = (await db.execute(
+        select(Prediction.id, Prediction.assessment_id, Prediction.proba, Prediction.pred_class, Prediction.created_at,
+               Assessment.title, has_rec.label("has_rec"))
         .join(Assessment, Prediction.assessment_id == Assessment.id)
-        .filter(Assessment.couple_id == couple_id)
+        .where(Assessment.couple_id == couple_id)
         .order_by(Prediction.created_at.desc())
-        .all()
-    )
+    )).all()
+    return [
+        PredictionHistoryItem(
+            id=r.id,
+            assessment_id=r.assessment_id,
+            proba=r.proba,
+            pred_class=r.pred_class,
+            created_at=r.created_at.isoformat(),
+            title=r.title,
+            recommendation=bool(r.has_rec),
+        )
+        for r in rows
+    ]
 
-    items = []
-    for p in preds:
-        # p is a tuple-like row with .Prediction and .title
-        pred_obj = p.Prediction
-        assessment_title = p.title
+@app.get("/couples/{couple_id}/history", response_model=PredictionHistoryOut)
+async def couple_history(couple_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        couple = await db.get(Couple, couple_id)
+        if not couple:
+            raise HTTPException(404, "Couple not found")
+        return PredictionHistoryOut(couple_id=couple_id, items=await _history_items(db, couple_id))
+
+    return await cached_json(request, ("history", couple_id), {("couple", couple_id)}, build)
 
-        # check if recommendation exists for this assessment (use assessment id)
-        rec_exists = db.query(Recommendation).filter(Recommendation.assessment_id == pred_obj.assessment_id).first()
 
-        items.append({
-            "id": pred_obj.id,
-            "assessment_id": pred_obj.assessment_id,
-            "proba": pred_obj.proba,
-            "pred_class": pred_obj.pred_class,
-            "created_at": pred_obj.created_at.isoformat(),
-            "title": assessment_title,
-            "recommendation": bool(rec_exists)
-        })
+@app.get("/couples/{couple_id}/timeline")
+async def couple_timeline(couple_id: int, request: Request, window: int = Query(3, ge=1, le=20), db: AsyncSession = Depends(get_async_read_db)):
+    """Overall and per-domain risk over time (delta, moving average over `window` points, band transitions)."""
+    async def build():
+        couple = await db.get(Couple, couple_id)
+        if not couple:
+            raise HTTPException(404, "Couple not found")
+        rows = (await db.execute(timeline_query(couple_id))).all()
+        return {"couple_id": couple_id, "window": window, "domains": build_timeline(rows, window)}
+
+    return await cached_json(request, ("timeline", couple_id, window), {("couple", couple_id)}, build)
+
+
+@app.get("/couples/{couple_id}/overview", response_model=CoupleOverviewOut)
+async def couple_overview(couple_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    """Timeline/recommendation page bootstrap: couple, prediction history and stored recommendations in one round trip."""
+    async def build():
+        couple = await db.get(Couple, couple_id)
+        if not couple:
+            raise HTTPException(404, "Couple not found")
+        recs = (await db.execute(
+            select(Recommendation)
+            .join(Assessment, Recommendation.assessment_id == Assessment.id)
+            .where(Assessment.couple_id == couple_id)
+            .order_by(Recommendation.id)
+        )).scalars().all()
+        return CoupleOverviewOut(
+            couple_id=couple.id,
+            partner_a_name=couple.partner_a_name,
+            partner_b_name=couple.partner_b_name,
+            items=await _history_items(db, couple_id),
+            # latest recommendation per assessment, as GET /assessments/{id}/recommendation returns
+            recommendations={
+                rec.assessment_id: {"id": rec.id, "domains": rec.domains_json, "modules": rec.modules_json, "text": rec.personalized_text,
+                                    "source": rec.program_source}
+                for rec in recs
+            },
+        )
 
-    return PredictionHistoryOut(couple_id=couple_id, items=items)
+    return await cached_json(request, ("overview", couple_id), {("couple", couple_id)}, build)
 
 
 @app.get("/couples/{couple_id}")
-def get_couple(couple_id: int, db: Session = Depends(get_db)):
-    couple = db.query(Couple).filter(Couple.id == couple_id).first()
-    if not couple:
-        raise HTTPException(status_code=404, detail="Couple not found")
-    return {
-        "couple_id": couple.id,
-        "partner_a_name": couple.partner_a_name,
-        "partner_b_name": couple.partner_b_name,
-    }
+async def get_couple(couple_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        couple = await db.get(Couple, couple_id)
+        if not couple:
+            raise HTTPException(status_code=404, detail="Couple not found")
+        return {
+            "couple_id": couple.id,
+            "partner_a_name": couple.partner_a_name,
+            "partner_b_name": couple.partner_b_name,
+        }
+
+    return await cached_json(request, ("couple", couple_id), {("couple", couple_id)}, build)
 
 
 @app.post("/assessments/{assessment_id}/recommendation")
-def create_recommendation(assessment_id: int, db: Session = Depends(get_db)):
-    return generate_recommendation(db, assessment_id)
+async def create_recommendation(assessment_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await generate_recommendation_async(db, assessment_id)
 
 
 @app.get("/assessments/{assessment_id}/recommendation")
-def get_recommendation(assessment_id: int, db: Session = Depends(get_db)):
+async def get_recommendation(assessment_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
     """Return stored recommendation (do not regenerate)."""
-    rec = db.query(Recommendation).filter(Recommendation.assessment_id == assessment_id).order_by(Recommendation.id.desc()).first()
-    if not rec:
-        raise HTTPException(status_code=404, detail="Recommendation not found")
+    async def build():
+        rec = (await db.execute(
+            select(Recommendation).where(Recommendation.assessment_id == assessment_id).order_by(Recommendation.id.desc()).limit(1)
+        )).scalars().first()
+        if not rec:
+            raise HTTPException(status_code=404, detail="Recommendation not found")
+        return {
+            "id": rec.id,
+            "assessment_id": rec.assessment_id,
+            "domains": rec.domains_json,
+            "modules": rec.modules_json,
+            "text": rec.personalized_text,
+            "source": rec.program_source,
+        }
+
+    return await cached_json(request, ("recommendation", assessment_id), {("assessment", assessment_id)}, build)
+
+
+@app.get("/predictions/{prediction_id}/audit")
+async def prediction_audit(prediction_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """Router audit log and fusion summary of one prediction, restored from the archive if it was tiered out."""
+    pred = await db.get(Prediction, prediction_id)
+    if not pred:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    await restore_async(db, [pred])
     return {
-        "id": rec.id,
-        "assessment_id": rec.assessment_id,
-        "domains": rec.domains_json,
-        "modules": rec.modules_json,
-        "text": rec.personalized_text
+        "prediction_id": pred.id,
+        "archived": pred.archived_at is not None,
+        "audit_summary": pred.audit_summary,
+        "audit_json": pred.audit_json,
+        "fusion_json": pred.fusion_json,
     }
+
+@app.get("/predictions/{prediction_id}/explain")
+async def explain_prediction(prediction_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Per-feature contributions from the scoring model and domain roll-up; computed once, then served from storage/cache."""
+    async def build():
+        pred = await db.get(Prediction, prediction_id)
+        if not pred:
+            raise HTTPException(status_code=404, detail="Prediction not found")
+        exp = (await db.execute(
+            select(PredictionExplanation).where(PredictionExplanation.prediction_id == prediction_id)
+        )).scalars().first()
+        if exp is None:
+            # predictions written before explanations existed (or with EXPLAIN_ON_PREDICT off)
+            explained_by, explainer = get_explainer()
+            row = (await asyncio.to_thread(contributions, explainer, vectors_to_matrix([pred.vector_json])))[0]
+            exp = PredictionExplanation(prediction_id=prediction_id, contribs_json=pack(row), model=explained_by)
+            db.add(exp)
+            await db.commit()
+        return explanation_payload(pred, exp)
+
+    return await cached_json(request, ("explain", prediction_id), {("prediction", prediction_id)}, build)
+
+
+@app.get("/exports/predictions")
+async def export_predictions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    doctor_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    audit: bool = True,
+    chunk_size: int = Query(2000, ge=100, le=50000),
+):
+    """
+    Streaming dump of predictions (flattened answers, domain risks, optional audit/fusion),
+    filtered by doctor and created_at range. Reads with yield_per in its own read session,
+    so memory is bounded by chunk_size rather than the number of rows.
+    """
+    query = export_query(doctor_id, since, until, audit)
+
+    async def body():
+        async with AsyncReadSessionLocal() as db:
+            first = True
+            async for chunk in iter_chunks_async(db, query, audit, chunk_size):
+                yield ndjson_block(chunk) if format == "ndjson" else csv_block(chunk, columns(audit), header=first)
+                first = False
+            if first and format == "csv":
+                yield csv_block([], columns(audit), header=True)
+
+    filename = f"predictions{'-doctor' + str(doctor_id) if doctor_id is not None else ''}.{format}"
+    return StreamingResponse(body(), media_type=STREAM_FORMATS[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+class FrontendFiles(StaticFiles):
+    """frontend/ pages revalidate on every load (ETag/Last-Modified); css/js/images are cached for STATIC_MAX_AGE."""
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            page = path.endswith(".html") or path in ("", ".")
+            response.headers["Cache-Control"] = "no-cache" if page else f"public, max-age={STATIC_MAX_AGE}"
+        return response
+
+
+# Mounted last so API routes take precedence; pages at /ui/welcome.html etc.
+app.mount("/ui", FrontendFiles(directory=FRONTEND_DIR, html=True), name="frontend")
@@ -0,0 +1,125 @@
+# app/migrate.py
+"""
+Idempotent in-place upgrade of an existing database to the current models.
+
+Base.metadata.create_all() creates missing tables but never alters existing ones,
+so columns added to tables that already existed are added here (nullable, then
+backfilled where they have a source), followed by every model index whose
+columns exist. Safe to run any number of times. The API does not run it: it
+is a deploy step, run once before the workers start (every worker booting it
+would race on the DDL and repeat the backfill scan on each restart):
+
+    python -m app.migrate
+"""
+import json
+import argparse
+from typing import Any, Dict, List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from app.db import Base, engine
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
+
+# (table, column) added after the table was first created; the type comes from the model
+ADDED_COLUMNS = [
+    ("couples", "outcome"),
+    ("couples", "outcome_at"),
+    ("answers", "doctor_id"),
+    ("predictions", "doctor_id"),
+    ("predictions", "fusion_json"),
+    ("predictions", "answers_hash"),
+    ("predictions", "audit_summary"),
+    ("predictions", "archived_at"),
+    ("recommendations", "program_source"),
+    ("prediction_explanations", "model"),
+]
+# tenant keys copied from the row's assessment
+TENANT_KEYED = ("answers", "predictions")
+
+
+def _is_postgres(eng: Engine) -> bool:
+    return eng.dialect.name == "postgresql"
+
+
+def _existing_columns(eng: Engine, table: str) -> set:
+    return {c["name"] for c in inspect(eng).get_columns(table)}
+
+
+def add_columns(eng: Engine = engine) -> List[str]:
+    """ALTER TABLE ... ADD COLUMN for every ADDED_COLUMNS entry the table lacks. Returns "table.column" added."""
+    added = []
+    tables = set(inspect(eng).get_table_names())
+    for table, name in ADDED_COLUMNS:
+        if table not in tables or name in _existing_columns(eng, table):
+            continue
+        col = Base.metadata.tables[table].c[name]
+        ddl = f"ALTER TABLE {table} ADD COLUMN {name} {col.type.compile(dialect=eng.dialect)}"
+        for fk in col.foreign_keys:
+            ddl += f" REFERENCES {fk.column.table.name}({fk.column.name})"
+        with eng.begin() as conn:
+            conn.execute(text(ddl))
+        added.append(f"{table}.{name}")
+    return added
+
+
+def backfill_tenant_keys(eng: Engine = engine, batch_size: int = 50000) -> Dict[str, int]:
+    """Copy doctor_id from the assessment onto answers / predictions that lack it, one short transaction per id range."""
+    updated = {}
+    for table in TENANT_KEYED:
+        with eng.connect() as conn:
+            max_id = conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table} WHERE doctor_id IS NULL")).scalar()
+        updated[table] = 0
+        for lo in range(0, max_id, batch_size):
+            with eng.begin() as conn:
+                updated[table] += conn.execute(text(
+                    f"UPDATE {table} SET doctor_id = (SELECT a.doctor_id FROM assessments a WHERE a.id = {table}.assessment_id) "
+                    f"WHERE doctor_id IS NULL AND id > :lo AND id <= :hi"
+                ), {"lo": lo, "hi": lo + batch_size}).rowcount
+        if _is_postgres(eng):
+            with eng.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN doctor_id SET NOT NULL"))
+    return updated
+
+
+def create_indexes(eng: Engine = engine) -> List[str]:
+    """CREATE INDEX IF NOT EXISTS for every model index whose columns all exist (CONCURRENTLY on PostgreSQL)."""
+    created = []
+    tables = set(inspect(eng).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing_cols = _existing_columns(eng, table.name)
+        existing_idx = {i["name"] for i in inspect(eng).get_indexes(table.name)}
+        for index in table.indexes:
+            cols = [c.name for c in index.columns]
+            if index.name in existing_idx or not set(cols) <= existing_cols:
+                continue
+            unique = "UNIQUE " if index.unique else ""
+            if _is_postgres(eng):
+                with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    conn.execute(text(f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON {table.name} ({', '.join(cols)})"))
+            else:
+                with eng.begin() as conn:
+                    conn.execute(text(f"CREATE {unique}INDEX IF NOT EXISTS {index.name} ON {table.name} ({', '.join(cols)})"))
+            created.append(index.name)
+    return created
+
+
+def upgrade(eng: Engine = engine, batch_size: int = 50000) -> Dict[str, Any]:
+    """Missing tables, then added columns, tenant-key backfill and indexes. Idempotent."""
+    Base.metadata.create_all(bind=eng)
+    return {
+        "columns_added": add_columns(eng),
+        "tenant_keys_backfilled": backfill_tenant_keys(eng, batch_size),
+        "indexes_created": create_indexes(eng),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=50000, help="Rows per doctor_id backfill transaction")
+    args = parser.parse_args()
+    print(json.dumps(upgrade(engine, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
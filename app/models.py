@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, JSON, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, JSON, Enum, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db import Base
@@ -25,6 +25,8 @@ class Couple(Base):
     doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
     partner_a_name = Column(String(120), nullable=False)
     partner_b_name = Column(String(120), nullable=False)
+    outcome = Column(Integer, nullable=True)                 # observed follow-up, same coding as Class: 1 divorced, 0 not
+    outcome_at = Column(DateTime, nullable=True, index=True)  # when the outcome was recorded (continual_train.py cursor)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     doctor = relationship("Doctor", back_populates="couples")
@@ -54,10 +56,13 @@ class Assessment(Base):
 
     recommendation = relationship("Recommendation", back_populates="assessment", uselist=False)
 
+    __table_args__ = (Index("ix_assessments_doctor_couple", "doctor_id", "couple_id"),)
+
 class Answer(Base):
     __tablename__ = "answers"
     id = Column(Integer, primary_key=True)
     assessment_id = Column(Integer, ForeignKey("assessments.id"), nullable=False)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)  # tenant / partition key (= assessment's doctor)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=True)  # optional
     partner = Column(Enum(PartnerEnum), nullable=False)  # "A" or "B"
     value = Column(Integer, nullable=False)  # 0..4
@@ -66,18 +71,72 @@ class Answer(Base):
 
     assessment = relationship("Assessment", back_populates="answers")
 
+    __table_args__ = (Index("ix_answers_assessment_partner", "assessment_id", "partner", "id"),)
+
 class Prediction(Base):
     __tablename__ = "predictions"
     id = Column(Integer, primary_key=True)
     assessment_id = Column(Integer, ForeignKey("assessments.id"), nullable=False)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)  # tenant / partition key (= assessment's doctor)
     proba = Column(Float, nullable=False)
     pred_class = Column(Integer, nullable=False)  # 0/1
     vector_json = Column(JSON, nullable=False)    # {"Atr1": 1.0, ...}
     audit_json = Column(JSON, nullable=False)     # list of logs (A/B combined)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    fusion_json = Column(JSON, nullable=True)     # {"strategy", "disagreement": {"Atr1": 0.25, ...}, ...}
+    answers_hash = Column(String(64), nullable=True)  # content hash of the answer set it was computed from
+    audit_summary = Column(JSON, nullable=True)   # {"entries", "by_status", "bytes"}; kept hot once audit/fusion are archived
+    archived_at = Column(DateTime, nullable=True, index=True)  # set when audit_json/fusion_json moved to prediction_archive
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     assessment = relationship("Assessment", back_populates="predictions")
+    explanation = relationship("PredictionExplanation", back_populates="prediction", uselist=False, cascade="all,delete")
+    risk_points = relationship("RiskPoint", cascade="all,delete")
+
+    __table_args__ = (
+        Index("ix_predictions_assessment_id", "assessment_id", "id"),
+        Index("ix_predictions_doctor_created", "doctor_id", "created_at"),
+    )
+
+class PredictionExplanation(Base):
+    __tablename__ = "prediction_explanations"
+    id = Column(Integer, primary_key=True)
+    prediction_id = Column(Integer, ForeignKey("predictions.id"), nullable=False, unique=True, index=True)
+    contribs_json = Column(JSON, nullable=False)  # [Atr1..Atr54 log-odds contributions, bias]
+    model = Column(String(16), nullable=True)  # SCORING_MODEL the contributions explain; NULL = full
+    created_at = Column(DateTime, default=datetime.utcnow)
 
+    prediction = relationship("Prediction", back_populates="explanation")
+
+class RiskPoint(Base):
+    """One (prediction, domain) point of a couple's risk timeline; domain "overall" carries proba. Written with the prediction."""
+    __tablename__ = "risk_points"
+    id = Column(Integer, primary_key=True)
+    couple_id = Column(Integer, ForeignKey("couples.id", ondelete="CASCADE"), nullable=False)
+    prediction_id = Column(Integer, ForeignKey("predictions.id", ondelete="CASCADE"), nullable=False, index=True)
+    assessment_id = Column(Integer, nullable=False)
+    domain = Column(String(32), nullable=False)
+    risk = Column(Float, nullable=False)
+    band = Column(String(8), nullable=False)
+    created_at = Column(DateTime, nullable=False)  # the prediction's created_at
+
+    __table_args__ = (Index("ix_risk_points_couple_time", "couple_id", "created_at", "prediction_id"),)
+
+class ShadowScore(Base):
+    """A candidate model's probability for a live prediction (written off the request path)."""
+    __tablename__ = "shadow_scores"
+    id = Column(Integer, primary_key=True)
+    prediction_id = Column(Integer, ForeignKey("predictions.id", ondelete="CASCADE"), nullable=False, index=True)
+    model_name = Column(String(64), nullable=False, index=True)
+    proba = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PredictionArchive(Base):
+    """Cold copy of a prediction's audit_json + fusion_json (zlib-compressed JSON), written by app/services/retention.py."""
+    __tablename__ = "prediction_archive"
+    id = Column(Integer, primary_key=True)
+    prediction_id = Column(Integer, ForeignKey("predictions.id", ondelete="CASCADE"), nullable=False, unique=True, index=True)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
 
 class Recommendation(Base):
     __tablename__ = "recommendations"
@@ -87,5 +146,6 @@ class Recommendation(Base):
     domains_json = Column(JSON, nullable=False)       # risk scores + bands
     modules_json = Column(JSON, nullable=False)       # base deterministic modules
     personalized_text = Column(Text, nullable=False)  # final LLM recommendation
+    program_source = Column(String, nullable=True)    # "gemini" | "local" | "placeholder" (local until the LLM text lands)
 
     assessment = relationship("Assessment", back_populates="recommendation")
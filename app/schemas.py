@@ -22,8 +22,12 @@ class CoupleOut(BaseModel):
     doctor_id: int
     partner_a_name: str
     partner_b_name: str
+    outcome: Optional[int] = None
     class Config: from_attributes = True
 
+class CoupleOutcomeIn(BaseModel):
+    outcome: int = Field(ge=0, le=1)  # 1 = divorced, 0 = still together at follow-up
+
 
 class PredictionHistoryItem(BaseModel):
     id: int
@@ -32,6 +36,7 @@ class PredictionHistoryItem(BaseModel):
     pred_class: int
     created_at: str   # ISO timestamp
     title: Optional[str] = None
+    recommendation: bool = False  # a recommendation exists for this assessment
 
     class Config:
         from_attributes = True
@@ -79,8 +84,25 @@ class PredictionOut(BaseModel):
     pred_class: int
     vector_json: Dict[str, Optional[float]]
     audit_json: List[Dict[str, Any]]
+    fusion_json: Optional[Dict[str, Any]] = None
     class Config: from_attributes = True
 
+class BulkPredictIn(BaseModel):
+    # one routing pass and one scoring batch per request: bounded (larger lists get a 422)
+    assessment_ids: List[int] = Field(min_length=1, max_length=500)
+
+class BulkPredictOut(BaseModel):
+    items: List[PredictionOut]
+
+class WhatIfScenario(BaseModel):
+    name: Optional[str] = None
+    changes: Dict[str, Optional[int]]  # {"Atr5": 4, ...}; None clears an answer
+
+class WhatIfIn(BaseModel):
+    # scored in the same model call as the 270-row single-change grid: bounded (longer lists get a 422)
+    scenarios: List[WhatIfScenario] = Field(default=[], max_length=100)
+    top_k: int = Field(default=10, ge=1, le=54)
+
 class DashboardCoupleRow(BaseModel):
     couple_id: int
     partner_a_name: str
@@ -91,3 +113,14 @@ class DashboardCoupleRow(BaseModel):
 class DashboardOut(BaseModel):
     doctor_id: int
     couples: List[DashboardCoupleRow]
+
+class DoctorDashboardPageOut(BaseModel):
+    doctor: DoctorOut
+    couples: List[DashboardCoupleRow]
+
+class CoupleOverviewOut(BaseModel):
+    couple_id: int
+    partner_a_name: str
+    partner_b_name: str
+    items: List[PredictionHistoryItem]
+    recommendations: Dict[int, Dict[str, Any]]  # assessment_id -> {"id", "domains", "modules", "text"}
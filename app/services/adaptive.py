@@ -0,0 +1,106 @@
+# app/services/adaptive.py
+from typing import List, Dict, Any, Optional
+import numpy as np
+import pandas as pd
+from canonical import FEATURES, ID2TEXT
+from config import DATA_PATH, FUSION_STRATEGY, ADAPTIVE_STABLE_DELTA
+from app.models import Answer
+from app.services.fusion import fuse_partners
+from app.services.predictor import score_matrix
+
+VALUES = np.arange(5)  # answer scale 0..4
+FEATURE_INDEX = {f: i for i, f in enumerate(FEATURES)}
+TEXT2ID = {" ".join(t.lower().split()): f for f, t in ID2TEXT.items()}
+MODES = ("change", "stabilize")
+
+# P(answer value | feature, Class) from the reference cohort, shape (2, 54, 5); Laplace-smoothed
+_priors: Optional[np.ndarray] = None
+
+
+def get_priors() -> np.ndarray:
+    global _priors
+    if _priors is None:
+        df = pd.read_csv(DATA_PATH)
+        counts = np.ones((2, len(FEATURES), len(VALUES)))
+        for cls in (0, 1):
+            X = df.loc[df["Class"] == cls, FEATURES].to_numpy(dtype=int)
+            for v in VALUES:
+                counts[cls, :, v] += (X == v).sum(axis=0)
+        _priors = counts / counts.sum(axis=2, keepdims=True)
+    return _priors
+
+
+def partial_vector(answers: List[Answer], routed: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    Current (54,) vector, NaN = unknown. Starts from the latest routed prediction
+    vector (if any) and overlays answers whose text is a canonical item verbatim,
+    which is what the adaptive flow asks, so no routing call is needed per step.
+    """
+    x_a = np.full(len(FEATURES), np.nan)
+    x_b = np.full(len(FEATURES), np.nan)
+    for a in answers:
+        fid = TEXT2ID.get(" ".join(a.user_text.lower().split()))
+        if fid is not None:
+            (x_a if a.partner == "A" else x_b)[FEATURE_INDEX[fid]] = float(a.value)
+    direct = fuse_partners(x_a, x_b, strategy=FUSION_STRATEGY).fused[0]
+    if routed:
+        base = np.array([np.nan if routed.get(f) is None else float(routed[f]) for f in FEATURES])
+        direct = np.where(np.isnan(direct), base, direct)
+    return direct
+
+
+def next_question(x: np.ndarray, mode: str = "change", decision_thr: float = 0.5, top_k: int = 3) -> Dict[str, Any]:
+    """
+    Score every unanswered item at each value 0..4 in one model call and pick the next question.
+
+    Answer likelihoods come from the cohort, mixed by the current proba:
+        p(v) = proba * P(v | item, divorced) + (1 - proba) * P(v | item, married)
+      - change:    highest expected |proba shift|
+      - stabilize: largest worst-case |proba shift|, i.e. resolve the item that most
+                   threatens the current decision (reaches "stable" in fewest steps)
+    The assessment is reported stable once no single remaining answer could move
+    proba by ADAPTIVE_STABLE_DELTA or flip the decision.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Choose one of {MODES}")
+    x = np.asarray(x, dtype=float)
+    open_idx = np.flatnonzero(np.isnan(x))
+
+    # row 0 = current vector, then one row per (open item, value)
+    X = np.repeat(x[None, :], 1 + len(open_idx) * len(VALUES), axis=0)
+    rows = 1 + np.arange(len(open_idx) * len(VALUES))
+    X[rows, np.repeat(open_idx, len(VALUES))] = np.tile(VALUES, len(open_idx))
+    probas = score_matrix(X).astype(float)
+    base = float(probas[0])
+    per_value = probas[1:].reshape(len(open_idx), len(VALUES))
+
+    priors = get_priors()
+    likelihood = base * priors[1, open_idx] + (1 - base) * priors[0, open_idx]
+    expected_shift = (likelihood * np.abs(per_value - base)).sum(axis=1)
+    max_shift = np.abs(per_value - base).max(axis=1) if len(open_idx) else np.zeros(0)
+    can_flip = ((per_value >= decision_thr) != (base >= decision_thr)).any(axis=1)
+
+    stable = bool(len(open_idx) == 0 or (max_shift.max() < ADAPTIVE_STABLE_DELTA and not can_flip.any()))
+    order = np.argsort(-(expected_shift if mode == "change" else max_shift), kind="stable")
+
+    candidates = [
+        {
+            "feature": FEATURES[open_idx[j]],
+            "text": ID2TEXT[FEATURES[open_idx[j]]],
+            "expected_shift": round(float(expected_shift[j]), 4),
+            "max_shift": round(float(max_shift[j]), 4),
+            "can_flip": bool(can_flip[j]),
+            "by_value": [round(float(p), 4) for p in per_value[j]],
+        }
+        for j in order[:top_k]
+    ]
+    return {
+        "mode": mode,
+        "proba": round(base, 4),
+        "pred_class": int(base >= decision_thr),
+        "answered": int(len(FEATURES) - len(open_idx)),
+        "remaining": int(len(open_idx)),
+        "stable": stable,
+        "next": None if stable else candidates[0],
+        "candidates": candidates,
+    }
@@ -0,0 +1,154 @@
+# app/services/explain.py
+"""
+Per-feature log-odds contributions of the scoring model for stored predictions.
+
+vector_json holds the exact fused values a prediction was scored on, so the
+contributions of a stored row add up to its proba. Predictions written with
+EXPLAIN_ON_PREDICT off (or before explanations existed) are explained lazily by
+/predictions/{id}/explain, or in bulk ahead of time:
+
+    python -m app.services.explain --batch-size 1000
+"""
+import json
+import argparse
+from typing import List, Dict, Any, Iterable, Optional, Callable
+import numpy as np
+import xgboost as xgb
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from canonical import FEATURES, ID2TEXT
+from app.models import Prediction, PredictionExplanation
+from app.services.recommendation import DOMAIN_MAP
+
+# contributions are stored as log-odds, 54 features followed by the bias term
+_ROUND = 5
+
+# (N, 54) float matrix (NaN = unanswered) -> (N, 55) log-odds contributions, bias last
+Explainer = Callable[[np.ndarray], np.ndarray]
+
+
+def vectors_to_matrix(vectors: Iterable[Dict[str, Any]]) -> np.ndarray:
+    """Stored vector_json dicts -> (N, 54) float matrix with NaN for missing answers."""
+    return np.array([[np.nan if v.get(f) is None else float(v[f]) for f in FEATURES] for v in vectors], dtype=float)
+
+
+def stored_vector(fused_row: np.ndarray) -> Dict[str, Optional[float]]:
+    """
+    One fused row as vector_json: the exact values that were scored (ints where
+    integral, None = unanswered), so vectors_to_matrix gives the scored row back.
+    """
+    return {f: None if np.isnan(v) else (int(v) if float(v).is_integer() else float(v)) for f, v in zip(FEATURES, fused_row)}
+
+
+def tree_explainer(booster: xgb.Booster) -> Explainer:
+    """TreeSHAP for an XGBoost booster (the full model, or a pruned / distilled compact one)."""
+    def explain(X: np.ndarray) -> np.ndarray:
+        dm = xgb.DMatrix(np.asarray(X, dtype=float), feature_names=booster.feature_names, missing=np.nan)
+        return booster.predict(dm, pred_contribs=True)
+    return explain
+
+
+def compact_explainer(path: str) -> Explainer:
+    """
+    Explainer for a model written by model_compact.py (see inference.load_compact_model).
+    The linear variant's contributions are exact: coef * value (missing answers
+    imputed with the training mean), with the intercept as the bias.
+    """
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    if spec.get("kind") != "linear":
+        booster = xgb.Booster()
+        booster.load_model(path)
+        return tree_explainer(booster)
+    coef = np.asarray(spec["coef"], dtype=float)
+    fill = np.asarray(spec["fill"], dtype=float)
+    intercept = float(spec["intercept"])
+
+    def explain(X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        contribs = np.where(np.isnan(X), fill, X) * coef
+        return np.hstack([contribs, np.full((len(X), 1), intercept)])
+    return explain
+
+
+def contributions(explainer: Explainer, X: np.ndarray) -> np.ndarray:
+    """
+    Contributions for many rows in one model call.
+    Returns (N, 55): one log-odds contribution per feature, then the bias.
+    """
+    if len(X) == 0:
+        return np.zeros((0, len(FEATURES) + 1))
+    return explainer(X)
+
+
+def pack(row: np.ndarray) -> List[float]:
+    """Compact JSON form: a flat list of 55 rounded floats."""
+    return [round(float(v), _ROUND) for v in row]
+
+
+def explanation_payload(pred: Prediction, exp: PredictionExplanation) -> Dict[str, Any]:
+    """Per-feature contributions (largest first) plus a DOMAIN_MAP roll-up."""
+    contribs = exp.contribs_json
+    feats = contribs[:len(FEATURES)]
+    vector = pred.vector_json or {}
+    items = [
+        {"feature": f, "text": ID2TEXT[f], "value": vector.get(f), "contribution": c}
+        for f, c in zip(FEATURES, feats)
+        if c != 0.0
+    ]
+    items.sort(key=lambda it: abs(it["contribution"]), reverse=True)
+
+    by_feature = dict(zip(FEATURES, feats))
+    # domains overlap (e.g. Atr32-36 are in communication and criticism), so roll-ups need not sum to the total
+    domains = {
+        domain: round(sum(by_feature[f"Atr{i}"] for i in indices), _ROUND)
+        for domain, indices in DOMAIN_MAP.items()
+    }
+    return {
+        "prediction_id": pred.id,
+        "assessment_id": pred.assessment_id,
+        "proba": pred.proba,
+        "model": exp.model or "full",  # SCORING_MODEL that was explained (rows from before the column: full)
+        "base_value": contribs[len(FEATURES)],  # log-odds before any feature; base + contributions = logit(proba)
+        "contributions": items,
+        "domains": dict(sorted(domains.items(), key=lambda kv: kv[1], reverse=True)),
+    }
+
+
+def backfill_explanations(db: Session, model_name: str, explainer: Explainer, batch_size: int = 1000, limit: Optional[int] = None) -> int:
+    """Compute and store explanations for predictions that have none, batch_size rows per model call."""
+    done = 0
+    while limit is None or done < limit:
+        take = batch_size if limit is None else min(batch_size, limit - done)
+        preds = db.execute(
+            select(Prediction)
+            .outerjoin(PredictionExplanation, PredictionExplanation.prediction_id == Prediction.id)
+            .where(PredictionExplanation.id.is_(None))
+            .order_by(Prediction.id)
+            .limit(take)
+        ).scalars().all()
+        if not preds:
+            break
+        contribs = contributions(explainer, vectors_to_matrix(p.vector_json for p in preds))
+        db.add_all(PredictionExplanation(prediction_id=p.id, contribs_json=pack(row), model=model_name) for p, row in zip(preds, contribs))
+        db.commit()
+        done += len(preds)
+    return done
+
+
+def main():
+    from app.db import SessionLocal
+    from app.services.predictor import get_explainer
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=1000, help="Predictions per model call and transaction")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many predictions")
+    args = parser.parse_args()
+    model_name, explainer = get_explainer()
+    with SessionLocal() as db:
+        done = backfill_explanations(db, model_name, explainer, args.batch_size, args.limit)
+    print(json.dumps({"model": model_name, "explained": done}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# app/services/export.py
+"""
+Streaming research export of predictions: one flat row per prediction with the
+54 answers as columns, per-domain risk and band, and (optionally) the routing
+audit and fusion summary, restored from prediction_archive when tiered out.
+
+Rows are read with yield_per (server-side cursor on PostgreSQL) and written
+chunk by chunk, so memory stays bounded by the chunk size whatever the row count.
+NDJSON and CSV stream over HTTP (GET /exports/predictions) and to files;
+Parquet and Arrow IPC (files only) need pyarrow and fall back to CSV without it.
+"""
+import io
+import csv
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from canonical import FEATURES
+from app.models import Assessment, Prediction, PredictionArchive
+from app.services.recommendation import DOMAIN_MAP, calculate_domain_risks
+from app.services.retention import decode
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional; Parquet / Arrow exports fall back to CSV
+    pa = None
+
+FORMATS = ("ndjson", "csv", "parquet", "arrow")
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+BASE_COLUMNS = ["prediction_id", "assessment_id", "couple_id", "doctor_id", "created_at", "proba", "pred_class"]
+DOMAIN_COLUMNS = [f"{prefix}_{d}" for d in DOMAIN_MAP for prefix in ("risk", "band")]
+AUDIT_COLUMNS = ["audit_json", "fusion_json"]
+
+
+def columns(audit: bool) -> List[str]:
+    return BASE_COLUMNS + FEATURES + DOMAIN_COLUMNS + (AUDIT_COLUMNS if audit else [])
+
+
+def export_query(doctor_id: Optional[int] = None, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None, audit: bool = True):
+    cols = [Prediction.id, Prediction.assessment_id, Assessment.couple_id, Prediction.doctor_id,
+            Prediction.created_at, Prediction.proba, Prediction.pred_class, Prediction.vector_json]
+    if audit:
+        cols += [Prediction.audit_json, Prediction.fusion_json, PredictionArchive.payload]
+    query = select(*cols).join(Assessment, Assessment.id == Prediction.assessment_id)
+    if audit:
+        query = query.outerjoin(PredictionArchive, PredictionArchive.prediction_id == Prediction.id)
+    if doctor_id is not None:
+        query = query.where(Prediction.doctor_id == doctor_id)
+    if since is not None:
+        query = query.where(Prediction.created_at >= since)
+    if until is not None:
+        query = query.where(Prediction.created_at < until)
+    return query.order_by(Prediction.id)
+
+
+def flatten(row, audit: bool) -> Dict[str, Any]:
+    vector = row.vector_json or {}
+    out = {
+        "prediction_id": row.id, "assessment_id": row.assessment_id, "couple_id": row.couple_id,
+        "doctor_id": row.doctor_id, "created_at": row.created_at.isoformat() if row.created_at else None,
+        "proba": row.proba, "pred_class": row.pred_class,
+    }
+    out.update((f, vector.get(f)) for f in FEATURES)
+    for domain, r in calculate_domain_risks(vector).items():
+        out[f"risk_{domain}"] = r["risk"]
+        out[f"band_{domain}"] = r["band"]
+    if audit:
+        data = decode(row.payload) if row.payload is not None else {"audit_json": row.audit_json, "fusion_json": row.fusion_json}
+        out["audit_json"] = data["audit_json"]
+        out["fusion_json"] = data["fusion_json"]
+    return out
+
+
+def iter_chunks(conn: Connection, query, audit: bool, chunk_size: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+    result = conn.execution_options(yield_per=chunk_size).execute(query)
+    for part in result.partitions():
+        yield [flatten(r, audit) for r in part]
+
+
+async def iter_chunks_async(db: AsyncSession, query, audit: bool, chunk_size: int = 5000) -> AsyncIterator[List[Dict[str, Any]]]:
+    result = await db.stream(query.execution_options(yield_per=chunk_size))
+    async for part in result.partitions():
+        yield [flatten(r, audit) for r in part]
+
+
+def ndjson_block(rows: List[Dict[str, Any]]) -> str:
+    return "".join(json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in rows)
+
+
+def csv_block(rows: List[Dict[str, Any]], cols: List[str], header: bool = False) -> str:
+    """CSV text for a chunk; nested audit/fusion values are JSON-encoded cells."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(cols)
+    for r in rows:
+        writer.writerow([json.dumps(r[c], separators=(",", ":")) if c in AUDIT_COLUMNS else r[c] for c in cols])
+    return buf.getvalue()
+
+
+def _arrow_schema(cols: List[str]):
+    types = {"prediction_id": pa.int64(), "assessment_id": pa.int64(), "couple_id": pa.int64(), "doctor_id": pa.int64(),
+             "created_at": pa.string(), "proba": pa.float64(), "pred_class": pa.int8()}
+    types.update((f, pa.float32()) for f in FEATURES)  # fused answers: 0..4 in half points (A/B mean)
+    types.update((c, pa.float64() if c.startswith("risk_") else pa.string()) for c in DOMAIN_COLUMNS)
+    types.update((c, pa.string()) for c in AUDIT_COLUMNS)
+    return pa.schema([(c, types[c]) for c in cols])
+
+
+def _arrow_batch(rows: List[Dict[str, Any]], schema):
+    arrays = {c: [r[c] for r in rows] for c in schema.names}
+    for c in AUDIT_COLUMNS:
+        if c in arrays:
+            arrays[c] = [json.dumps(v, separators=(",", ":")) for v in arrays[c]]
+    return pa.RecordBatch.from_pydict(arrays, schema=schema)
+
+
+def resolve_format(fmt: str) -> str:
+    return "csv" if fmt in ("parquet", "arrow") and pa is None else fmt
+
+
+def write_file(chunks: Iterator[List[Dict[str, Any]]], fmt: str, path: str, audit: bool) -> Dict[str, Any]:
+    """Write chunks to path in fmt (one Parquet row group / Arrow record batch per chunk). Returns rows and the format used."""
+    fmt = resolve_format(fmt)
+    cols = columns(audit)
+    rows = 0
+    if fmt in ("ndjson", "csv"):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for i, chunk in enumerate(chunks):
+                f.write(ndjson_block(chunk) if fmt == "ndjson" else csv_block(chunk, cols, header=(i == 0)))
+                rows += len(chunk)
+            if fmt == "csv" and rows == 0:
+                f.write(csv_block([], cols, header=True))
+        return {"rows": rows, "format": fmt}
+
+    schema = _arrow_schema(cols)
+    writer = pq.ParquetWriter(path, schema, compression="zstd") if fmt == "parquet" else pa.ipc.new_file(path, schema)
+    try:
+        for chunk in chunks:
+            batch = _arrow_batch(chunk, schema)
+            if fmt == "parquet":
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            rows += len(chunk)
+    finally:
+        writer.close()
+    return {"rows": rows, "format": fmt}
@@ -0,0 +1,92 @@
+# app/services/fusion.py
+from typing import Dict, Any, Optional, NamedTuple
+import numpy as np
+from canonical import FEATURES
+from app.services.recommendation import POSITIVE_ITEMS
+
+# +1 where a higher answer means higher risk, -1 where it means lower risk
+RISK_SIGN = np.array([-1.0 if f in POSITIVE_ITEMS else 1.0 for f in FEATURES])
+
+# Where each fused value came from
+SRC_NONE, SRC_A, SRC_B, SRC_BOTH = 0, 1, 2, 3
+
+STRATEGIES = ("mean", "max_risk", "min_risk", "confidence", "disagreement")
+
+
+class FusionResult(NamedTuple):
+    fused: np.ndarray         # (N, 54) float, NaN where neither partner answered
+    disagreement: np.ndarray  # (N, 54) |a - b| / 4 in [0, 1], NaN unless both answered
+    source: np.ndarray        # (N, 54) int8, SRC_* codes
+
+
+def _riskier(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pick, per cell, the answer that implies more risk."""
+    return np.where((a - b) * RISK_SIGN >= 0, a, b)
+
+
+def fuse_partners(
+    x_a: np.ndarray,
+    x_b: np.ndarray,
+    strategy: str = "mean",
+    conf_a: Optional[np.ndarray] = None,
+    conf_b: Optional[np.ndarray] = None,
+) -> FusionResult:
+    """
+    Fuse partner A/B answer matrices (N x 54, NaN = unanswered) into one matrix.
+
+    Strategies:
+      - mean:         plain average of whichever answers are present
+      - max_risk:     the riskier of the two answers (risk direction per item)
+      - min_risk:     the safer of the two answers
+      - confidence:   average weighted by routing relation_conf (conf_a / conf_b)
+      - disagreement: mean pulled towards the riskier answer in proportion to |a - b|
+    A single present answer is always used as is.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown fusion strategy '{strategy}'. Choose one of {STRATEGIES}")
+
+    a = np.atleast_2d(np.asarray(x_a, dtype=float))
+    b = np.atleast_2d(np.asarray(x_b, dtype=float))
+    has_a = ~np.isnan(a)
+    has_b = ~np.isnan(b)
+    both = has_a & has_b
+
+    source = (has_a * SRC_A + has_b * SRC_B).astype(np.int8)
+    # zero-filled copies keep arithmetic warning-free; masks decide what is used
+    a0 = np.where(has_a, a, 0.0)
+    b0 = np.where(has_b, b, 0.0)
+    disagreement = np.where(both, np.abs(a0 - b0) / 4.0, np.nan)
+
+    if strategy == "mean":
+        paired = (a0 + b0) / 2.0
+    elif strategy == "max_risk":
+        paired = _riskier(a0, b0)
+    elif strategy == "min_risk":
+        paired = np.where(_riskier(a0, b0) == a0, b0, a0)
+    elif strategy == "confidence":
+        wa = np.ones_like(a0) if conf_a is None else np.nan_to_num(np.atleast_2d(conf_a), nan=0.0)
+        wb = np.ones_like(b0) if conf_b is None else np.nan_to_num(np.atleast_2d(conf_b), nan=0.0)
+        total = wa + wb
+        paired = np.where(total > 0, (a0 * wa + b0 * wb) / np.where(total > 0, total, 1.0), (a0 + b0) / 2.0)
+    else:  # disagreement
+        w = np.where(both, disagreement, 0.0)
+        paired = (1.0 - w) * ((a0 + b0) / 2.0) + w * _riskier(a0, b0)
+
+    fused = np.select([both, has_a, has_b], [paired, a0, b0], default=np.nan)
+    return FusionResult(fused=fused, disagreement=disagreement, source=source)
+
+
+def fusion_summary(result: FusionResult, row: int, strategy: str) -> Dict[str, Any]:
+    """JSON-friendly per-feature disagreement for one fused row (only features both partners answered)."""
+    d = result.disagreement[row]
+    per_feature = {f: round(float(v), 3) for f, v in zip(FEATURES, d) if not np.isnan(v)}
+    return {
+        "strategy": strategy,
+        "disagreement": per_feature,
+        "mean_disagreement": round(float(np.mean(list(per_feature.values()))), 3) if per_feature else None,
+        "answered_by": {
+            "A": int((result.source[row] == SRC_A).sum()),
+            "B": int((result.source[row] == SRC_B).sum()),
+            "both": int((result.source[row] == SRC_BOTH).sum()),
+        },
+    }
@@ -1,11 +1,25 @@
 # app/services/predictor.py
+import json
+import asyncio
+import hashlib
+from itertools import groupby
 from typing import List, Dict, Any, Tuple
 import numpy as np
 import pandas as pd
-from sqlalchemy.orm import Session
-from inference import load_xgb_model, predict_from_free_text_LLM
-from canonical import FEATURES
-from app.models import Answer, Prediction, Assessment
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from inference import load_xgb_model, load_compact_model, route_texts_async, vector_from_routes
+from canonical import FEATURES, CANONICAL_VERSION
+from config import FUSION_STRATEGY, EXPLAIN_ON_PREDICT, SCORING_MODEL, COMPACT_MODEL_PATH, SCORING_SERVICE, MODEL_PATH, ROUTER_BACKEND, ROUTER_PROMPT_MODE
+from app.services.fusion import fuse_partners, fusion_summary
+from app.services.explain import contributions, pack, stored_vector, tree_explainer, compact_explainer, Explainer
+from app.services.shadow import shadow_scorer
+from app.services.retention import restore_async
+from app.services.timeline import attach_points
+from app.services.scoring import ScoringClient
+from app.models import Answer, Prediction, Assessment, PredictionExplanation
+
+FEATURE_INDEX = {f: i for i, f in enumerate(FEATURES)}
 
 # Load XGB once (process-wide)
 _xgb_model = None
@@ -15,6 +29,45 @@ def get_model():
         _xgb_model = load_xgb_model()
     return _xgb_model
 
+# Hot-path scorer: the full model, or the compact one from model_compact.py (SCORING_MODEL=compact);
+# with SCORING_SERVICE set, the shared scoring service (in-process scorer while it is unreachable).
+# Explanations use the same model (get_explainer()).
+_scorer = None
+_local_scorer = None
+def get_local_scorer():
+    global _local_scorer
+    if _local_scorer is None:
+        if SCORING_MODEL == "compact":
+            _local_scorer = load_compact_model(COMPACT_MODEL_PATH)
+        else:
+            booster = get_model().get_booster()
+            _local_scorer = lambda X: booster.inplace_predict(X, missing=np.nan)
+    return _local_scorer
+
+def get_scorer():
+    global _scorer
+    if _scorer is None:
+        _scorer = ScoringClient(SCORING_SERVICE, fallback=get_local_scorer) if SCORING_SERVICE else get_local_scorer()
+    return _scorer
+
+_explainer = None
+def get_explainer() -> Tuple[str, Explainer]:
+    """(SCORING_MODEL, explainer) for the model that scores predictions on the hot path."""
+    global _explainer
+    if _explainer is None:
+        if SCORING_MODEL == "compact":
+            _explainer = (SCORING_MODEL, compact_explainer(COMPACT_MODEL_PATH))
+        else:
+            _explainer = (SCORING_MODEL, tree_explainer(get_model().get_booster()))
+    return _explainer
+
+def score_matrix(X: np.ndarray) -> np.ndarray:
+    """P(divorce) for an (N, 54) float matrix (NaN = unanswered) in one model call."""
+    X = np.asarray(X, dtype=np.float32)
+    if len(X) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return get_scorer()(X)
+
 def _qas_from_answers(answers: List[Answer]) -> List[Dict[str, Any]]:
     """Turn DB answers into the qas format the inference expects."""
     qas = []
@@ -22,63 +75,200 @@ def _qas_from_answers(answers: List[Answer]) -> List[Dict[str, Any]]:
         qas.append({"text": a.user_text, "value": a.value})
     return qas
 
-def _avg_vectors(x_a: pd.Series, x_b: pd.Series) -> pd.Series:
-    """Element-wise average ignoring NaNs."""
-    arr = np.vstack([x_a.values, x_b.values])
-    avg = np.nanmean(arr, axis=0)
-    return pd.Series(avg, index=FEATURES, dtype=float)
+def _conf_vector(logs: List[Dict[str, Any]]) -> np.ndarray:
+    """Routing confidence behind each filled feature (best match wins, as in dedup='best')."""
+    conf = np.full(len(FEATURES), np.nan)
+    for log in logs:
+        fid = log.get("feature")
+        if fid in FEATURE_INDEX:
+            i = FEATURE_INDEX[fid]
+            conf[i] = np.fmax(conf[i], float(log.get("relation_conf", 0.0)))
+    return conf
+
+def _audit_records(logs_a: List[Dict[str, Any]], logs_b: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge A/B audit logs, tagging each entry with its partner."""
+    tagged = [{**log, "partner": "A"} for log in logs_a] + [{**log, "partner": "B"} for log in logs_b]
+    return pd.DataFrame(tagged).fillna("").to_dict(orient="records") if tagged else []
+
+def _unique_texts(answers_all: List[Answer]) -> List[str]:
+    # Route each distinct text once; routing does not depend on the answer value
+    return list(dict.fromkeys(a.user_text for a in answers_all))
+
+# Identity of what turns answers into a prediction in this process: the hot-path model file
+# (read once, like the model itself), SCORING_MODEL and the router backend / prompt mode
+_fingerprint = None
+def scoring_fingerprint() -> str:
+    global _fingerprint
+    if _fingerprint is None:
+        with open(COMPACT_MODEL_PATH if SCORING_MODEL == "compact" else MODEL_PATH, "rb") as f:
+            model_digest = hashlib.sha256(f.read()).hexdigest()
+        _fingerprint = f"{SCORING_MODEL}:{model_digest[:16]}:{ROUTER_BACKEND}:{ROUTER_PROMPT_MODE}"
+    return _fingerprint
+
+def answers_hash(answers: List[Answer], decision_thr: float) -> str:
+    """Content hash of an answer set (order-insensitive) plus the settings and model that decide its prediction."""
+    items = sorted((a.partner.value, int(a.value), " ".join(a.user_text.split())) for a in answers)
+    payload = json.dumps([CANONICAL_VERSION, FUSION_STRATEGY, scoring_fingerprint(), decision_thr, items], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _hashes(assessment_ids: List[int], answers_all: List[Answer], decision_thr: float) -> Dict[int, str]:
+    by_assessment: Dict[int, List[Answer]] = {aid: [] for aid in assessment_ids}
+    for a in answers_all:
+        by_assessment[a.assessment_id].append(a)
+    return {aid: answers_hash(answers, decision_thr) for aid, answers in by_assessment.items()}
+
+def _tenant_keys_query(assessment_ids: List[int]):
+    return select(Assessment.id, Assessment.doctor_id, Assessment.couple_id).where(Assessment.id.in_(assessment_ids))
+
+def _latest_predictions_query(assessment_ids: List[int], doctor_ids: List[int]):
+    latest_ids = (
+        select(func.max(Prediction.id))
+        .where(Prediction.doctor_id.in_(doctor_ids), Prediction.assessment_id.in_(assessment_ids))
+        .group_by(Prediction.assessment_id)
+    )
+    return select(Prediction).where(Prediction.id.in_(latest_ids))
+
+def _unchanged(latest: List[Prediction], hashes: Dict[int, str]) -> Dict[int, Prediction]:
+    """Latest predictions whose answer set is still the current one: returned as is."""
+    return {p.assessment_id: p for p in latest if p.answers_hash is not None and p.answers_hash == hashes.get(p.assessment_id)}
 
-def predict_for_assessment(db: Session, assessment_id: int, decision_thr: float = 0.5) -> Tuple[float, int, Dict[str, float], List[Dict[str, Any]]]:
+def _build_predictions(assessment_ids: List[int], answers_all: List[Answer], route_by_text: Dict[str, Dict[str, Any]], decision_thr: float, hashes: Dict[int, str] = None, doctors: Dict[int, int] = None) -> Tuple[List[Prediction], np.ndarray]:
     """
-    - Pull all answers for assessment.
-    - Split by partner A/B.
-    - Map/normalize each side via LLM.
-    - Average A & B per canonical feature.
-    - Run XGB on the averaged vector.
-    - Save Prediction row; return results.
+    Fuse A/B vectors per assessment, score the N x 54 matrix in one model call, build Prediction rows.
+    answers_all must be ordered by (assessment, partner) as _answers_query returns them.
+    Returns the rows and the fused matrix they were scored on.
     """
-    answers_all = db.query(Answer).filter(Answer.assessment_id == assessment_id).all()
-    a_answers = [a for a in answers_all if a.partner.value == "A"]
-    b_answers = [a for a in answers_all if a.partner.value == "B"]
-
-    model = get_model()
-
-    # Build qas lists
-    qas_a = _qas_from_answers(a_answers)
-    qas_b = _qas_from_answers(b_answers)
-
-    # If one side is missing, we still proceed with the other
-    proba_a, pred_a, x_a, audit_a = predict_from_free_text_LLM(qas_a, model, nli_thr=0.65, dedup="best", decision_thr=decision_thr) if qas_a else (0.0, 0, pd.Series(np.nan, index=FEATURES), pd.DataFrame([]))
-    proba_b, pred_b, x_b, audit_b = predict_from_free_text_LLM(qas_b, model, nli_thr=0.65, dedup="best", decision_thr=decision_thr) if qas_b else (0.0, 0, pd.Series(np.nan, index=FEATURES), pd.DataFrame([]))
-
-    # Average vectors
-    x_avg = _avg_vectors(x_a.reindex(FEATURES), x_b.reindex(FEATURES))
-
-    # Final prediction on averaged vector
-    X_row = pd.DataFrame([x_avg.values], columns=FEATURES)
-    proba = float(model.predict_proba(X_row)[0, 1])
-    pred_class = int(proba >= decision_thr)
-
-    # Merge audits and tag partner
-    audit_a = audit_a.copy()
-    audit_b = audit_b.copy()
-    if not audit_a.empty:
-        audit_a["partner"] = "A"
-    if not audit_b.empty:
-        audit_b["partner"] = "B"
-    audit_combined = pd.concat([audit_a, audit_b], ignore_index=True) if not (audit_a.empty and audit_b.empty) else pd.DataFrame([])
-
-    # Persist prediction
-    pred_row = Prediction(
-        assessment_id=assessment_id,
-        proba=proba,
-        pred_class=pred_class,
-        vector_json={feat: (None if pd.isna(v) else int(round(v))) for feat, v in x_avg.items()},
-        audit_json=(audit_combined.fillna("").to_dict(orient="records") if not audit_combined.empty else []),
+    by_assessment: Dict[int, Dict[str, List[Answer]]] = {aid: {"A": [], "B": []} for aid in assessment_ids}
+    for (aid, partner), group in groupby(answers_all, key=lambda a: (a.assessment_id, a.partner.value)):
+        by_assessment[aid][partner] = list(group)
+
+    n = len(assessment_ids)
+    if n == 0:
+        return [], np.zeros((0, len(FEATURES)))
+    X_a = np.full((n, len(FEATURES)), np.nan)
+    X_b = np.full((n, len(FEATURES)), np.nan)
+    C_a = np.full((n, len(FEATURES)), np.nan)
+    C_b = np.full((n, len(FEATURES)), np.nan)
+    audits: List[List[Dict[str, Any]]] = []
+    for i, aid in enumerate(assessment_ids):
+        qas_a = _qas_from_answers(by_assessment[aid]["A"])
+        qas_b = _qas_from_answers(by_assessment[aid]["B"])
+        x_a, logs_a = vector_from_routes(qas_a, [route_by_text[qa["text"]] for qa in qas_a], nli_thr=0.65, dedup="best")
+        x_b, logs_b = vector_from_routes(qas_b, [route_by_text[qa["text"]] for qa in qas_b], nli_thr=0.65, dedup="best")
+        X_a[i], X_b[i] = x_a.reindex(FEATURES).values, x_b.reindex(FEATURES).values
+        C_a[i], C_b[i] = _conf_vector(logs_a), _conf_vector(logs_b)
+        audits.append(_audit_records(logs_a, logs_b))
+
+    fusion = fuse_partners(X_a, X_b, strategy=FUSION_STRATEGY, conf_a=C_a, conf_b=C_b)
+
+    # Final prediction on all fused vectors at once
+    probas = score_matrix(fusion.fused)
+    # Contributions for the whole batch in one call, on the matrix that was scored (stored as is in
+    # vector_json, so the lazy /explain path sees the same input and both add up to proba)
+    if EXPLAIN_ON_PREDICT:
+        explained_by, explainer = get_explainer()
+        contribs = contributions(explainer, fusion.fused)
+    else:
+        contribs = None
+
+    rows = []
+    for i, (aid, audit) in enumerate(zip(assessment_ids, audits)):
+        proba = float(probas[i])
+        rows.append(Prediction(
+            assessment_id=aid,
+            doctor_id=(doctors or {}).get(aid),
+            proba=proba,
+            pred_class=int(proba >= decision_thr),
+            vector_json=stored_vector(fusion.fused[i]),
+            audit_json=audit,
+            fusion_json=fusion_summary(fusion, i, FUSION_STRATEGY),
+            explanation=(PredictionExplanation(contribs_json=pack(contribs[i]), model=explained_by) if contribs is not None else None),
+            answers_hash=(hashes or {}).get(aid),
+        ))
+    return rows, fusion.fused
+
+def _answers_query(assessment_ids: List[int], doctor_ids: List[int]):
+    # doctor_id lets PostgreSQL prune to the tenants' partitions; the partner split comes
+    # from the (assessment_id, partner) index order instead of a Python pass
+    return (
+        select(Answer)
+        .where(Answer.doctor_id.in_(doctor_ids), Answer.assessment_id.in_(assessment_ids))
+        .order_by(Answer.assessment_id, Answer.partner, Answer.id)
     )
-    db.add(pred_row)
-    db.commit()
-    db.refresh(pred_row)
 
-    return proba, pred_class, pred_row.vector_json, pred_row.audit_json
+async def _predict_async(db: AsyncSession, assessment_ids: List[int], decision_thr: float) -> List[Prediction]:
+    """
+    Batched prediction for many assessments:
+    - Load every answer for all assessments in one query (by tenant, ordered by assessment and partner).
+    - Reuse the latest Prediction of any assessment whose answer set is unchanged (answers_hash),
+      with archived audit/fusion payloads restored.
+    - Route all unique texts of the rest in as few LLM batches as possible.
+    - Build an N x 54 matrix of averaged A/B vectors and score it in one model call.
+    - Insert all new Prediction rows (with their timeline risk points) in one transaction.
+    Returns the Prediction rows in the same order as assessment_ids.
+    """
+    keys = {aid: (doctor_id, couple_id) for aid, doctor_id, couple_id in (await db.execute(_tenant_keys_query(assessment_ids))).all()}
+    doctor_ids = sorted({d for d, _ in keys.values()})
+    answers_all = (await db.execute(_answers_query(assessment_ids, doctor_ids))).scalars().all()
+    hashes = _hashes(assessment_ids, answers_all, decision_thr)
+    reused = _unchanged((await db.execute(_latest_predictions_query(assessment_ids, doctor_ids))).scalars().all(), hashes)
+    await restore_async(db, list(reused.values()))
+    todo = [aid for aid in assessment_ids if aid not in reused]
+    if todo:
+        answers_todo = [a for a in answers_all if a.assessment_id not in reused]
+        unique_texts = _unique_texts(answers_todo)
+        route_by_text = dict(zip(unique_texts, await route_texts_async(unique_texts))) if unique_texts else {}
+
+        # vectors, scoring (or the scoring service round trip) and contributions are CPU work: off the event loop
+        rows, fused = await asyncio.to_thread(
+            _build_predictions, todo, answers_todo, route_by_text, decision_thr, hashes, {aid: keys[aid][0] for aid in todo})
+        attach_points(rows, {aid: keys[aid][1] for aid in todo})
+        db.add_all(rows)
+        await db.commit()
+        for row in rows:
+            await db.refresh(row)
+        shadow_scorer.submit(rows, fused)  # queued only; candidates score on a background thread
+        reused.update(zip(todo, rows))
+    return [reused[aid] for aid in assessment_ids]
+
+# Single-flight: (assessment id, decision_thr) -> future of the prediction being computed in this process
+_inflight: Dict[Tuple[int, float], "asyncio.Future[Prediction]"] = {}
+
+class _LeaderCancelled(Exception):
+    """Set on shared futures when the request computing them was cancelled: waiters compute it themselves."""
+
+async def predict_for_assessments_async(db: AsyncSession, assessment_ids: List[int], decision_thr: float = 0.5) -> List[Prediction]:
+    """
+    Predictions for assessment_ids, in order (see _predict_async); DB and LLM waits do not hold a worker thread.
+    Concurrent calls for the same assessment (double clicks, retries) share one
+    computation instead of each routing, scoring and inserting a Prediction.
+    """
+    waiting = {aid: _inflight[(aid, decision_thr)] for aid in assessment_ids if (aid, decision_thr) in _inflight}
+    mine = [aid for aid in dict.fromkeys(assessment_ids) if aid not in waiting]
+    loop = asyncio.get_running_loop()
+    futures = {aid: loop.create_future() for aid in mine}
+    _inflight.update(((aid, decision_thr), fut) for aid, fut in futures.items())
+    try:
+        rows = await _predict_async(db, mine, decision_thr) if mine else []
+        for aid, row in zip(mine, rows):
+            futures[aid].set_result(row)
+    except BaseException as exc:
+        # only real failures reach the waiters; a cancelled leader (client gone) is not one
+        shared = exc if isinstance(exc, Exception) else _LeaderCancelled()
+        for fut in futures.values():
+            if not fut.done():
+                fut.set_exception(shared)
+                fut.exception()  # retrieved: no "never retrieved" warning when nobody was waiting
+        raise
+    finally:
+        for aid in mine:
+            _inflight.pop((aid, decision_thr), None)
 
+    by_id = dict(zip(mine, rows))
+    for aid, fut in waiting.items():
+        try:
+            by_id[aid] = await asyncio.shield(fut)
+        except _LeaderCancelled:
+            # the entry is gone: the first waiter back leads a fresh computation, the rest join it
+            by_id[aid] = (await predict_for_assessments_async(db, [aid], decision_thr))[0]
+    return [by_id[aid] for aid in assessment_ids]
@@ -1,9 +1,14 @@
 # app/services/recommendation.py
 import json
-from typing import Dict, Any, List
-from sqlalchemy.orm import Session
+import asyncio
+from typing import Dict, Any, List, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import AsyncSessionLocal
 from app.models import Assessment, Prediction, Recommendation
-from recommend_program import call_gemini_recommend  # <-- LLM call
+from recommend_program import call_gemini_recommend_async  # <-- LLM call
+from program_local import render_program
+from config import PROGRAM_BACKEND
 
 # ------------------------
 # Positive / Negative sets
@@ -53,6 +58,20 @@ DOMAIN_MAP = {
 }
 
 
+BANDS = ["Green", "Yellow", "Orange", "Red"]
+
+
+def risk_band(score: float) -> str:
+    """Risk in [0,1] -> Green (<0.25) / Yellow (<0.5) / Orange (<0.75) / Red."""
+    if score < 0.25:
+        return "Green"
+    elif score < 0.5:
+        return "Yellow"
+    elif score < 0.75:
+        return "Orange"
+    return "Red"
+
+
 def calculate_domain_risks(vector_json: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
     """Aggregate answers into risk bands per domain using risk_0_1 normalization."""
     domain_scores: Dict[str, Dict[str, Any]] = {}
@@ -65,17 +84,7 @@ def calculate_domain_risks(vector_json: Dict[str, Any]) -> Dict[str, Dict[str, A
                 values.append(risk_0_1(key, vector_json[key]))
 
         avg_score = (sum(values) / len(values)) if values else 0.0
-
-        if avg_score < 0.25:
-            band = "Green"
-        elif avg_score < 0.5:
-            band = "Yellow"
-        elif avg_score < 0.75:
-            band = "Orange"
-        else:
-            band = "Red"
-
-        domain_scores[domain] = {"risk": round(avg_score, 3), "band": band}
+        domain_scores[domain] = {"risk": round(avg_score, 3), "band": risk_band(avg_score)}
 
     return domain_scores
 
@@ -83,42 +92,35 @@ def calculate_domain_risks(vector_json: Dict[str, Any]) -> Dict[str, Dict[str, A
 # ------------------------
 # Recommendation Pipeline
 # ------------------------
-def generate_recommendation(db: Session, assessment_id: int):
-    """Generate recommendations with LLM personalization."""
-    # 1. get assessment
-    assessment = db.query(Assessment).filter(Assessment.id == assessment_id).first()
-    if not assessment:
-        return {"error": "Assessment not found"}
-
-    # 2. get latest prediction
-    latest_pred = (
-        db.query(Prediction)
-        .filter(Prediction.assessment_id == assessment_id)
-        .order_by(Prediction.created_at.desc())
-        .first()
-    )
-    if not latest_pred:
-        return {"error": "No prediction/vector data found. Run prediction first."}
-
-    # 3. parse vector_json
-    vector_raw = latest_pred.vector_json
+def _parse_vector_json(vector_raw: Any):
+    """Return (vector_json, error)."""
     if isinstance(vector_raw, (str, bytes)):
         try:
-            vector_json = json.loads(vector_raw)
+            return json.loads(vector_raw), None
         except Exception:
-            return {"error": "Invalid vector_json format"}
+            return None, "Invalid vector_json format"
     elif isinstance(vector_raw, dict):
-        vector_json = vector_raw
+        return vector_raw, None
     else:
         try:
-            vector_json = json.loads(json.dumps(vector_raw))
+            return json.loads(json.dumps(vector_raw)), None
         except Exception:
-            return {"error": "Unrecognized vector_json type"}
+            return None, "Unrecognized vector_json type"
+
+
+def _recommendation_payload(rec: Recommendation) -> Dict[str, Any]:
+    return {
+        "id": rec.id,
+        "assessment_id": rec.assessment_id,
+        "domains": rec.domains_json,
+        "modules": rec.modules_json,
+        "text": rec.personalized_text,  # markdown program
+        "source": rec.program_source,
+    }
 
-    # 4. calculate risks
-    domain_risks = calculate_domain_risks(vector_json)
 
-    # 5. build modules (rules-based)
+def build_modules(domain_risks: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rules-based intervention modules per at-risk domain."""
     modules: List[Dict[str, Any]] = []
     for domain, d in domain_risks.items():
         band = d.get("band", "Green")
@@ -171,43 +173,89 @@ def generate_recommendation(db: Session, assessment_id: int):
                 "Daily ownership reflection",
                 "Practice open-ended questions instead of rebuttals"
             ]})
+    return modules
+
 
-    # 6. Call Gemini LLM to build the 4-week markdown table
+async def _program_text_async(domain_risks: Dict[str, Dict[str, Any]], modules: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """(markdown program, source) per PROGRAM_BACKEND; the local table is also the fail-safe when Gemini fails."""
+    if PROGRAM_BACKEND in ("local", "placeholder"):
+        return render_program(domain_risks, modules), PROGRAM_BACKEND
     try:
-        personalized_text = call_gemini_recommend(domain_risks, modules)
-    except Exception as e:
-        # fail-safe: if LLM call fails, produce a concise summary instead
-        top_domains_sorted = sorted(domain_risks.items(), key=lambda kv: kv[1]["risk"], reverse=True)
-        top_summary_lines = []
-        for dom, info in top_domains_sorted[:3]:
-            top_summary_lines.append(f"{dom.capitalize()}: {info['band']} (risk={info['risk']})")
-        personalized_text = "Top concerns: " + "; ".join(top_summary_lines) if top_summary_lines else "No major concerns (all Green)."
-
-    # 7. save in DB (create or update)
-    existing = db.query(Recommendation).filter(Recommendation.assessment_id == assessment_id).first()
-    if existing:
-        existing.domains_json = domain_risks
-        existing.modules_json = modules
-        existing.personalized_text = personalized_text
-        db.add(existing)
-        db.commit()
-        db.refresh(existing)
-        rec = existing
+        return await call_gemini_recommend_async(domain_risks, modules), "gemini"
+    except Exception:
+        return render_program(domain_risks, modules), "local"
+
+
+def _apply_llm_text(rec: Recommendation, modules: List[Dict[str, Any]], text: Any) -> bool:
+    """Swap a placeholder for the LLM program unless the row was regenerated from other modules meanwhile."""
+    if rec is None or rec.program_source != "placeholder" or rec.modules_json != modules:
+        return False
+    if text:
+        rec.personalized_text = text
+        rec.program_source = "gemini"
     else:
-        rec = Recommendation(
-            assessment_id=assessment_id,
-            domains_json=domain_risks,
-            modules_json=modules,
-            personalized_text=personalized_text
-        )
-        db.add(rec)
-        db.commit()
-        db.refresh(rec)
+        rec.program_source = "local"  # LLM failed: the placeholder is the final program
+    return True
 
-    return {
-        "id": rec.id,
-        "assessment_id": assessment_id,
-        "domains": rec.domains_json,
-        "modules": rec.modules_json,
-        "text": rec.personalized_text  # markdown program
-    }
+
+# placeholder swaps in flight (a bare create_task may be garbage-collected before it finishes)
+_placeholder_tasks: Set[asyncio.Task] = set()
+
+
+async def _replace_placeholder_async(rec_id: int, domain_risks: Dict[str, Dict[str, Any]], modules: List[Dict[str, Any]]):
+    try:
+        text = await call_gemini_recommend_async(domain_risks, modules)
+    except Exception:
+        text = None
+    async with AsyncSessionLocal() as db:
+        if _apply_llm_text(await db.get(Recommendation, rec_id), modules, text):
+            await db.commit()  # the flush invalidates the cached GET /recommendation and overview
+
+
+async def generate_recommendation_async(db: AsyncSession, assessment_id: int):
+    """
+    Generate recommendations with LLM personalization: domain risks and rule-based
+    modules from the latest prediction's vector, then the 4-week program (Gemini,
+    or the local table as primary, fail-safe or instant placeholder), saved on the
+    assessment's Recommendation row.
+    """
+    assessment = await db.get(Assessment, assessment_id)
+    if not assessment:
+        return {"error": "Assessment not found"}
+
+    latest_pred = (await db.execute(
+        select(Prediction)
+        .where(Prediction.assessment_id == assessment_id)
+        .order_by(Prediction.created_at.desc())
+        .limit(1)
+    )).scalars().first()
+    if not latest_pred:
+        return {"error": "No prediction/vector data found. Run prediction first."}
+
+    vector_json, err = _parse_vector_json(latest_pred.vector_json)
+    if err:
+        return {"error": err}
+
+    domain_risks = calculate_domain_risks(vector_json)
+    modules = build_modules(domain_risks)
+
+    personalized_text, source = await _program_text_async(domain_risks, modules)
+
+    existing = (await db.execute(
+        select(Recommendation).where(Recommendation.assessment_id == assessment_id).limit(1)
+    )).scalars().first()
+    rec = existing or Recommendation(assessment_id=assessment_id)
+    rec.domains_json = domain_risks
+    rec.modules_json = modules
+    rec.personalized_text = personalized_text
+    rec.program_source = source
+    db.add(rec)
+    await db.commit()
+    await db.refresh(rec)
+
+    if source == "placeholder":
+        task = asyncio.create_task(_replace_placeholder_async(rec.id, domain_risks, modules))
+        _placeholder_tasks.add(task)
+        task.add_done_callback(_placeholder_tasks.discard)
+
+    return _recommendation_payload(rec)
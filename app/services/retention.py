@@ -0,0 +1,163 @@
+# app/services/retention.py
+"""
+Hot/cold tiering of prediction payloads.
+
+audit_json (one router log per answer) and fusion_json are only read when a
+single prediction is shown in full, yet they make up most of every predictions
+row. Once a prediction is older than ARCHIVE_AFTER_DAYS both move, as one
+zlib-compressed JSON blob, to prediction_archive; the hot row keeps proba,
+class, vector_json (similar / what-if / explain / next_question read it) and a
+small audit_summary. restore() / restore_async() put the archived payloads back
+on loaded Prediction objects, so callers see the same data as before.
+
+The job walks predictions by id in batches of ARCHIVE_BATCH_SIZE, each in its
+own short transaction (rows locked with SKIP LOCKED on PostgreSQL), so it never
+holds long locks on the hot table and several workers can run it at once.
+
+    python -m app.services.retention --days 180
+"""
+import json
+import zlib
+import time
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL_SECONDS
+from app.db import SessionLocal
+from app.models import Prediction, PredictionArchive
+
+logger = logging.getLogger(__name__)
+
+
+def encode(audit_json: List[Dict[str, Any]], fusion_json: Optional[Dict[str, Any]]) -> bytes:
+    raw = json.dumps({"audit_json": audit_json, "fusion_json": fusion_json}, separators=(",", ":"), default=str)
+    return zlib.compress(raw.encode("utf-8"), 6)
+
+
+def decode(payload: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def audit_summary(audit_json: List[Dict[str, Any]], fusion_json: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """What stays on the hot row: entry count, router status counts and the uncompressed payload size."""
+    statuses = Counter(str(log.get("status", "")) for log in audit_json or [])
+    raw = json.dumps({"audit_json": audit_json, "fusion_json": fusion_json}, separators=(",", ":"), default=str)
+    return {"entries": len(audit_json or []), "by_status": dict(statuses), "bytes": len(raw)}
+
+
+def archive_batch(db: Session, cutoff: datetime, after_id: int = 0, batch_size: int = ARCHIVE_BATCH_SIZE) -> List[int]:
+    """
+    Archive up to batch_size not-yet-archived predictions created before cutoff with id > after_id,
+    in one transaction. Returns the archived ids (empty when nothing is left).
+    """
+    rows = db.execute(
+        select(Prediction.id, Prediction.audit_json, Prediction.fusion_json)
+        .where(Prediction.archived_at.is_(None), Prediction.created_at < cutoff, Prediction.id > after_id)
+        .order_by(Prediction.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not rows:
+        db.rollback()
+        return []
+    now = datetime.utcnow()
+    db.execute(insert(PredictionArchive.__table__), [
+        {"prediction_id": pid, "payload": encode(audit, fusion), "archived_at": now} for pid, audit, fusion in rows
+    ])
+    table = Prediction.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("pid"))
+        .values(audit_json=[], fusion_json=None, audit_summary=bindparam("summary"), archived_at=now),
+        [{"pid": pid, "summary": audit_summary(audit, fusion)} for pid, audit, fusion in rows],
+    )
+    db.commit()
+    return [pid for pid, _, _ in rows]
+
+
+def archive_older_than(days: int, batch_size: int = ARCHIVE_BATCH_SIZE, session_factory=SessionLocal,
+                       max_batches: Optional[int] = None, pause: float = 0.0) -> Dict[str, Any]:
+    """Archive everything older than `days` days, batch by batch (optionally sleeping `pause` s between batches)."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    archived, batches, last_id = 0, 0, 0
+    start = time.perf_counter()
+    while max_batches is None or batches < max_batches:
+        with session_factory() as db:
+            ids = archive_batch(db, cutoff, after_id=last_id, batch_size=batch_size)
+        if not ids:
+            break
+        archived += len(ids)
+        batches += 1
+        last_id = ids[-1]
+        if pause:
+            time.sleep(pause)
+    return {"archived": archived, "batches": batches, "cutoff": cutoff.isoformat(), "seconds": round(time.perf_counter() - start, 2)}
+
+
+async def archive_periodically(days: int = ARCHIVE_AFTER_DAYS, interval: float = ARCHIVE_INTERVAL_SECONDS):
+    """Background task for the app lifespan: one archive pass per interval, on a worker thread."""
+    while True:
+        try:
+            await asyncio.to_thread(archive_older_than, days)
+        except Exception:  # keep the loop alive; the next pass retries
+            logger.exception("archive pass failed")
+        await asyncio.sleep(interval)
+
+
+def _apply(preds: List[Prediction], payloads: Dict[int, bytes]) -> List[Prediction]:
+    for p in preds:
+        if p.id in payloads:
+            data = decode(payloads[p.id])
+            # loaded state, not a change: the hot row stays slim on the next commit
+            set_committed_value(p, "audit_json", data["audit_json"])
+            set_committed_value(p, "fusion_json", data["fusion_json"])
+    return preds
+
+
+def _payloads_query(preds: List[Prediction]):
+    ids = [p.id for p in preds if p.archived_at is not None]
+    return select(PredictionArchive.prediction_id, PredictionArchive.payload).where(PredictionArchive.prediction_id.in_(ids)) if ids else None
+
+
+def restore(db: Session, preds: List[Prediction]) -> List[Prediction]:
+    """Fill audit_json / fusion_json of archived predictions from prediction_archive (one query)."""
+    query = _payloads_query(preds)
+    return _apply(preds, dict(db.execute(query).all())) if query is not None else preds
+
+
+async def restore_async(db: AsyncSession, preds: List[Prediction]) -> List[Prediction]:
+    query = _payloads_query(preds)
+    return _apply(preds, dict((await db.execute(query)).all())) if query is not None else preds
+
+
+def tier_stats(db: Session) -> Dict[str, Any]:
+    hot, cold = db.execute(
+        select(func.count(Prediction.id).filter(Prediction.archived_at.is_(None)),
+               func.count(Prediction.id).filter(Prediction.archived_at.is_not(None)))
+    ).one()
+    archive_bytes = db.execute(select(func.coalesce(func.sum(func.length(PredictionArchive.payload)), 0))).scalar()
+    return {"hot": hot, "archived": cold, "archive_bytes": int(archive_bytes)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS or 180, help="Archive predictions older than this")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+    result = archive_older_than(args.days, args.batch_size, max_batches=args.max_batches, pause=args.pause)
+    with SessionLocal() as db:
+        result.update(tier_stats(db))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
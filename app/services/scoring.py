@@ -0,0 +1,277 @@
+# app/services/scoring.py
+"""
+In-host scoring service shared by all API workers (SCORING_SERVICE).
+
+Each API worker otherwise scores through its own model copy, so CPU-bound tree
+evaluation competes with request handling under the GIL. With SCORING_SERVICE
+set, predictor.get_scorer() returns a ScoringClient instead: it sends the
+(N, 54) float32 matrix over a local socket (unix:/path or host:port) and reads
+back N probabilities. The service collects requests from every connection into
+dynamic batches (up to SCORING_BATCH_SIZE rows, or whatever arrived within
+SCORING_MAX_WAIT_MS of the first one), scores each batch with one model call in
+a pool of SCORING_WORKERS processes and splits the results back per request.
+While every worker is busy, new requests keep accumulating into the next batch.
+
+Frames: request = uint32 rows + rows*54 float32 (NaN = unanswered);
+reply = uint32 rows + rows float32 (rows = 0xFFFFFFFF: scoring failed).
+
+    python -m app.services.scoring --address unix:/tmp/divorce-scoring.sock --workers 2
+"""
+import os
+import time
+import socket
+import signal
+import struct
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from canonical import FEATURES
+from config import SCORING_MODEL, COMPACT_MODEL_PATH, SCORING_SERVICE, SCORING_BATCH_SIZE, SCORING_MAX_WAIT_MS, SCORING_WORKERS
+
+_HEADER = struct.Struct("!I")
+_FAILED = 0xFFFFFFFF
+N_FEATURES = len(FEATURES)
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """"unix:/path" -> (AF_UNIX, path); "host:port" -> (AF_INET, (host, port))."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def load_scorer() -> Callable[[np.ndarray], np.ndarray]:
+    """The hot-path scorer predictor.get_scorer() would build in-process (SCORING_MODEL)."""
+    from inference import load_xgb_model, load_compact_model
+    if SCORING_MODEL == "compact":
+        return load_compact_model(COMPACT_MODEL_PATH)
+    booster = load_xgb_model().get_booster()
+    return lambda X: booster.inplace_predict(X, missing=np.nan)
+
+
+# ------------------------
+# Service
+# ------------------------
+_worker_scorer = None
+
+
+def _init_worker():
+    global _worker_scorer
+    _worker_scorer = load_scorer()
+
+
+def _score_batch(X: np.ndarray) -> np.ndarray:
+    return np.asarray(_worker_scorer(X), dtype=np.float32)
+
+
+class ScoringService:
+    """Dynamic batcher in front of a process pool; one asyncio loop serves every client connection."""
+
+    def __init__(self, address: str, workers: int = 1, batch_size: int = 256, max_wait_ms: float = 2.0):
+        self.address = address
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "asyncio.Queue[Tuple[np.ndarray, asyncio.Future]]" = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                (n,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                X = np.frombuffer(await reader.readexactly(n * N_FEATURES * 4), dtype=np.float32).reshape(n, N_FEATURES)
+                fut = loop.create_future()
+                await self._queue.put((X, fut))
+                try:
+                    probas = await fut
+                    writer.write(_HEADER.pack(n) + probas.astype(np.float32).tobytes())
+                except Exception:
+                    writer.write(_HEADER.pack(_FAILED))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        """First waiting request, then whatever else arrives until batch_size rows or max_wait elapsed."""
+        loop = asyncio.get_running_loop()
+        items = [await self._queue.get()]
+        rows = len(items[0][0])
+        deadline = loop.time() + self.max_wait
+        while rows < self.batch_size:
+            remaining = deadline - loop.time()
+            try:
+                item = self._queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self._queue.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            items.append(item)
+            rows += len(item[0])
+        return items
+
+    async def _dispatch(self, items: List[Tuple[np.ndarray, asyncio.Future]], slots: asyncio.Semaphore):
+        loop = asyncio.get_running_loop()
+        try:
+            X = items[0][0] if len(items) == 1 else np.concatenate([x for x, _ in items])
+            probas = await loop.run_in_executor(self._pool, _score_batch, X)
+            start = 0
+            for x, fut in items:
+                if not fut.done():
+                    fut.set_result(probas[start:start + len(x)])
+                start += len(x)
+            self.batches += 1
+            self.rows += len(X)
+        except Exception as exc:
+            self.errors += 1
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(exc)
+        finally:
+            slots.release()
+
+    async def _batcher(self):
+        slots = asyncio.Semaphore(self.workers)  # one batch in flight per worker process
+        while True:
+            await slots.acquire()
+            items = await self._collect()
+            self.requests += len(items)
+            task = asyncio.create_task(self._dispatch(items, slots))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        # load the model in every worker before accepting connections
+        await asyncio.gather(*(loop.run_in_executor(self._pool, time.sleep, 0.05) for _ in range(self.workers)))
+        family, addr = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(addr):
+                os.unlink(addr)
+            server = await asyncio.start_unix_server(self._handle, path=addr)
+        else:
+            server = await asyncio.start_server(self._handle, host=addr[0], port=addr[1])
+        batcher = asyncio.create_task(self._batcher())
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"scoring service on {self.address}: {self.workers} worker(s), batch {self.batch_size}, wait {self.max_wait * 1000:g} ms", flush=True)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            batcher.cancel()
+            self._pool.shutdown(cancel_futures=True)  # stop the worker processes with the service
+            if family == socket.AF_UNIX and os.path.exists(addr):
+                os.unlink(addr)
+
+
+# ------------------------
+# Client
+# ------------------------
+class ScoringClient:
+    """
+    Callable scorer (X -> P(divorce)) backed by the scoring service, one blocking
+    connection per thread. When the service cannot be reached it scores with
+    fallback() in-process and retries the service after retry_seconds.
+    """
+
+    def __init__(self, address: str, fallback: Callable[[], Callable[[np.ndarray], np.ndarray]],
+                 timeout: float = 5.0, retry_seconds: float = 5.0):
+        self.address = address
+        self.family, self.addr = parse_address(address)
+        self.fallback = fallback
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._local = threading.local()
+        self._down_until = 0.0
+        self.calls = 0
+        self.remote_rows = 0
+        self.fallbacks = 0
+        self.last_error: Optional[str] = None
+
+    def _conn(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(self.family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.addr)
+            if self.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._local.sock = sock
+        return sock
+
+    def _drop_conn(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    @staticmethod
+    def _recv(sock: socket.socket, size: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = sock.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError("scoring service closed the connection")
+            buf += chunk
+        return bytes(buf)
+
+    def _remote(self, X: np.ndarray) -> np.ndarray:
+        sock = self._conn()
+        sock.sendall(_HEADER.pack(len(X)) + X.tobytes())
+        (n,) = _HEADER.unpack(self._recv(sock, _HEADER.size))
+        if n == _FAILED:
+            raise RuntimeError("scoring service failed to score the batch")
+        return np.frombuffer(self._recv(sock, n * 4), dtype=np.float32)
+
+    def __call__(self, X: np.ndarray) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        self.calls += 1
+        if time.monotonic() >= self._down_until:
+            try:
+                probas = self._remote(X)
+                self.remote_rows += len(X)
+                return probas
+            except (OSError, RuntimeError) as e:
+                self._drop_conn()
+                self._down_until = time.monotonic() + self.retry_seconds
+                self.last_error = repr(e)
+        self.fallbacks += 1
+        return self.fallback()(X)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "calls": self.calls,
+            "remote_rows": self.remote_rows,
+            "fallbacks": self.fallbacks,
+            "service_down": time.monotonic() < self._down_until,
+            "last_error": self.last_error,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", default=SCORING_SERVICE or "unix:/tmp/divorce-scoring.sock", help="unix:/path or host:port")
+    parser.add_argument("--workers", type=int, default=SCORING_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=SCORING_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=SCORING_MAX_WAIT_MS)
+    args = parser.parse_args()
+    service = ScoringService(args.address, args.workers, args.batch_size, args.max_wait_ms)
+    asyncio.run(service.serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# app/services/shadow.py
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from config import SHADOW_MODEL_PATHS, SHADOW_BATCH_SIZE, SHADOW_FLUSH_SECONDS, SHADOW_QUEUE_SIZE
+from inference import load_compact_model
+from app.db import SessionLocal
+from app.models import Prediction, ShadowScore
+
+_PSI_BINS = np.linspace(0.0, 1.0, 11)
+
+
+class ShadowScorer:
+    """
+    Scores new predictions with candidate models on a background thread.
+
+    submit() only appends to a bounded in-memory queue (dropping when full), so the
+    request path never waits on a candidate model or on the shadow_scores insert.
+    The worker drains up to batch_size vectors (or whatever arrived within
+    flush_seconds), scores them with every candidate in one call each and inserts
+    one ShadowScore row per (prediction, candidate). Per-process.
+    """
+
+    def __init__(self, paths: List[str], session_factory: Callable[[], Session],
+                 batch_size: int = 256, flush_seconds: float = 1.0, maxsize: int = 10000):
+        self.paths = paths
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=maxsize)
+        self._models: Optional[Dict[str, Callable[[np.ndarray], np.ndarray]]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.paths)
+
+    def submit(self, rows: List[Prediction], X: np.ndarray):
+        """Queue committed predictions with the exact (N, 54) matrix the live model scored."""
+        if not self.enabled or not rows:
+            return
+        self._ensure_worker()
+        for row, x in zip(rows, X):
+            try:
+                self._queue.put_nowait((row.id, x))
+                self.submitted += 1
+            except queue.Full:
+                self.dropped += 1
+
+    def flush(self):
+        """Block until everything submitted so far has been scored and stored."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "candidates": [self._name(p) for p in self.paths],
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "scored": self.scored,
+            "queued": self._queue.qsize(),
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+    @staticmethod
+    def _name(path: str) -> str:
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+                    self._thread.start()
+
+    def _load_models(self) -> Dict[str, Callable[[np.ndarray], np.ndarray]]:
+        models = {}
+        for path in self.paths:
+            try:
+                models[self._name(path)] = load_compact_model(path)
+            except Exception as e:  # a broken candidate must not take the others down
+                self.errors += 1
+                self.last_error = f"{path}: {e}"
+        return models
+
+    def _run(self):
+        self._models = self._load_models()
+        stop = False
+        while not stop:
+            batch = []
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._score(batch)
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = str(e)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+    def _score(self, batch: List[tuple]):
+        ids = [pid for pid, _ in batch]
+        X = np.asarray([x for _, x in batch], dtype=np.float32)
+        rows = []
+        for name, score in self._models.items():
+            probas = score(X)
+            rows.extend({"prediction_id": pid, "model_name": name, "proba": float(p)} for pid, p in zip(ids, probas))
+        if rows:
+            with self.session_factory() as db:
+                db.execute(insert(ShadowScore.__table__), rows)
+                db.commit()
+        self.scored += len(batch)
+
+
+def _psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Population stability index of actual vs expected probabilities over 10 equal-width bins."""
+    e = np.histogram(expected, bins=_PSI_BINS)[0] / max(len(expected), 1)
+    a = np.histogram(actual, bins=_PSI_BINS)[0] / max(len(actual), 1)
+    e, a = np.clip(e, 1e-4, None), np.clip(a, 1e-4, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def comparison(live: np.ndarray, shadow: np.ndarray, threshold: float = 0.5) -> Dict[str, Any]:
+    """Agreement and drift of a candidate's probabilities against the live model's on the same predictions."""
+    live_cls, shadow_cls = live >= threshold, shadow >= threshold
+    diff = shadow - live
+    return {
+        "n": int(len(live)),
+        "agreement": round(float(np.mean(live_cls == shadow_cls)), 4),
+        "flips_to_1": int(np.sum(~live_cls & shadow_cls)),
+        "flips_to_0": int(np.sum(live_cls & ~shadow_cls)),
+        "mean_diff": round(float(diff.mean()), 4),
+        "mean_abs_diff": round(float(np.abs(diff).mean()), 4),
+        "p95_abs_diff": round(float(np.quantile(np.abs(diff), 0.95)), 4),
+        "live_mean": round(float(live.mean()), 4),
+        "shadow_mean": round(float(shadow.mean()), 4),
+        "psi": round(_psi(live, shadow), 4),
+    }
+
+
+def shadow_report_query(window: int):
+    """The latest `window` (live proba, shadow proba, candidate) triples."""
+    return (
+        select(ShadowScore.model_name, Prediction.proba, ShadowScore.proba)
+        .join(Prediction, Prediction.id == ShadowScore.prediction_id)
+        .order_by(ShadowScore.id.desc())
+        .limit(window)
+    )
+
+
+def shadow_report(rows) -> Dict[str, Any]:
+    by_model: Dict[str, List[tuple]] = {}
+    for name, live, shadow in rows:
+        by_model.setdefault(name, []).append((live, shadow))
+    return {
+        name: comparison(np.array([r[0] for r in pairs]), np.array([r[1] for r in pairs]))
+        for name, pairs in sorted(by_model.items())
+    }
+
+
+def _make_scorer() -> ShadowScorer:
+    paths = [p.strip() for p in SHADOW_MODEL_PATHS.split(",") if p.strip()]
+    return ShadowScorer(paths, SessionLocal, SHADOW_BATCH_SIZE, SHADOW_FLUSH_SECONDS, SHADOW_QUEUE_SIZE)
+
+
+shadow_scorer = _make_scorer()
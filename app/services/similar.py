@@ -0,0 +1,343 @@
+# app/services/similar.py
+import os
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from canonical import FEATURES
+from app.db import AsyncReadSessionLocal
+from app.models import Assessment, Prediction
+from app.services.explain import vectors_to_matrix
+from config import (DATA_PATH, SEED, SIMILAR_INDEX_PATH, SIMILAR_MIN_OVERLAP, SIMILAR_IVF_MIN_ROWS, SIMILAR_NPROBE,
+                    SIMILAR_REFRESH_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+N_FEAT = len(FEATURES)
+SRC_COHORT, SRC_PREDICTION = 0, 1
+_KMEANS_SAMPLE = 65536
+_KMEANS_ITERS = 10
+_ASSIGN_CHUNK = 65536
+
+
+class VectorIndex:
+    """
+    In-memory nearest-neighbour index over 54-dim answer vectors (NaN = unanswered).
+
+    Distance is the RMS difference over the features both vectors answered. Each row
+    is stored as [x^2 | x | present] (zeros where missing, float32), so scoring rows
+    against a query is a single (n, 162) x (162, 2) product:
+        sum m*(x - q)^2 = x^2 . m - 2 x . (m*q) + present . (m*q^2),  overlap = present . m
+
+    Small indexes are searched exhaustively. Once trained (train(), from
+    SIMILAR_IVF_MIN_ROWS rows) rows are bucketed by k-means cell over mean-imputed
+    vectors and a query scores only the nprobe cells nearest to it (approximate, but
+    a few thousand rows instead of millions). Rows are appended in place (capacity
+    doubles); a newer prediction for the same assessment retires the older row.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._block = np.zeros((capacity, 3 * N_FEAT), dtype=np.float32)
+        self.source = np.zeros(capacity, dtype=np.int8)
+        self.ref = np.zeros(capacity, dtype=np.int64)      # cohort row number or prediction id
+        self.couple = np.full(capacity, -1, dtype=np.int64)
+        self.label = np.full(capacity, -1, dtype=np.int8)  # cohort Class (1 = divorced); -1 for predictions
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.cell = np.zeros(capacity, dtype=np.int32)
+        self.size = 0
+        self.last_prediction_id = 0
+        self._row_by_assessment: Dict[int, int] = {}
+        # coarse quantizer (None until trained)
+        self.centroids: Optional[np.ndarray] = None
+        self._fill: Optional[np.ndarray] = None
+        self.trained_size = 0
+
+    def __len__(self) -> int:
+        return int(self.alive[:self.size].sum())
+
+    _ARRAYS = ("_block", "source", "ref", "couple", "label", "alive", "cell")
+
+    def _grow(self, need: int):
+        cap = len(self.source)
+        if need <= cap:
+            return
+        new_cap = max(need, 2 * cap)
+        for name in self._ARRAYS:
+            old = getattr(self, name)
+            fresh = np.zeros((new_cap,) + old.shape[1:], dtype=old.dtype)
+            if name in ("couple", "label"):
+                fresh.fill(-1)
+            fresh[:self.size] = old[:self.size]
+            setattr(self, name, fresh)
+
+    @staticmethod
+    def _encode(X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32).reshape(-1, N_FEAT)
+        present = ~np.isnan(X)
+        x0 = np.where(present, X, 0.0).astype(np.float32)
+        return np.hstack([x0 * x0, x0, present.astype(np.float32)])
+
+    @staticmethod
+    def _impute(rows: np.ndarray, fill: np.ndarray) -> np.ndarray:
+        """Encoded rows -> dense vectors with missing answers set to the feature mean."""
+        present = rows[:, 2 * N_FEAT:] > 0
+        return np.where(present, rows[:, N_FEAT:2 * N_FEAT], fill)
+
+    @classmethod
+    def _assign(cls, rows: np.ndarray, centroids: np.ndarray, fill: np.ndarray) -> np.ndarray:
+        cells = np.empty(len(rows), dtype=np.int32)
+        c2 = (centroids ** 2).sum(axis=1)
+        for start in range(0, len(rows), _ASSIGN_CHUNK):
+            dense = cls._impute(rows[start:start + _ASSIGN_CHUNK], fill)
+            cells[start:start + len(dense)] = (c2 - 2.0 * dense @ centroids.T).argmin(axis=1)
+        return cells
+
+    def add(self, X: np.ndarray, source: int, refs, couples=None, labels=None, assessments=None):
+        rows = self._encode(X)
+        n = len(rows)
+        if n == 0:
+            return
+        with self._lock:
+            self._grow(self.size + n)
+            sl = slice(self.size, self.size + n)
+            self._block[sl] = rows
+            self.source[sl] = source
+            self.ref[sl] = refs
+            self.couple[sl] = -1 if couples is None else couples
+            self.label[sl] = -1 if labels is None else labels
+            self.cell[sl] = 0 if self.centroids is None else self._assign(rows, self.centroids, self._fill)
+            self.alive[sl] = True
+            if assessments is not None:
+                for offset, aid in enumerate(assessments):
+                    old = self._row_by_assessment.get(int(aid))
+                    if old is not None:
+                        self.alive[old] = False
+                    self._row_by_assessment[int(aid)] = self.size + offset
+            if source == SRC_PREDICTION:
+                self.last_prediction_id = max(self.last_prediction_id, int(np.max(refs)))
+            self.size += n
+
+    def needs_training(self) -> bool:
+        """Big enough for cells, and untrained or grown 4x since the last training."""
+        return self.size >= SIMILAR_IVF_MIN_ROWS and (self.centroids is None or self.size >= 4 * self.trained_size)
+
+    def train(self, n_cells: Optional[int] = None, seed: int = SEED):
+        """k-means (Lloyd) on a sample of rows, then bucket every row by nearest centroid."""
+        with self._lock:
+            n = self.size
+            rows = self._block[:n]
+        rng = np.random.default_rng(seed)
+        n_cells = n_cells or int(np.clip(np.sqrt(n), 16, 4096))
+        present = rows[:, 2 * N_FEAT:]
+        fill = (rows[:, N_FEAT:2 * N_FEAT].sum(axis=0) / np.maximum(present.sum(axis=0), 1.0)).astype(np.float32)
+
+        sample = rows[rng.choice(n, size=min(n, _KMEANS_SAMPLE), replace=False)]
+        dense = np.where(sample[:, 2 * N_FEAT:] > 0, sample[:, N_FEAT:2 * N_FEAT], fill)
+        centroids = dense[rng.choice(len(dense), size=min(n_cells, len(dense)), replace=False)].copy()
+        for _ in range(_KMEANS_ITERS):
+            labels = ((centroids ** 2).sum(axis=1) - 2.0 * dense @ centroids.T).argmin(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, dense)
+            counts = np.bincount(labels, minlength=len(centroids))[:, None]
+            centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids).astype(np.float32)
+
+        cells = self._assign(rows, centroids, fill)
+        with self._lock:
+            # rows appended while training are assigned here; centroids and cells are published together
+            if self.size > n:
+                cells = np.concatenate([cells, self._assign(self._block[n:self.size], centroids, fill)])
+            self._fill, self.centroids = fill, centroids
+            self.cell[:self.size] = cells
+            self.trained_size = self.size
+
+    @staticmethod
+    def _candidates(q0: np.ndarray, m: np.ndarray, nprobe: int, centroids: Optional[np.ndarray],
+                    fill: Optional[np.ndarray], cell: np.ndarray) -> Optional[np.ndarray]:
+        """Row ids in the nprobe cells nearest to q, or None for an exhaustive scan."""
+        if centroids is None:
+            return None
+        dense = np.where(m > 0, q0, fill)
+        near = ((centroids - dense) ** 2).sum(axis=1).argsort()[:nprobe]
+        probe = np.zeros(len(centroids), dtype=bool)
+        probe[near] = True
+        return np.flatnonzero(probe[cell])
+
+    def search(self, q: np.ndarray, k: int = 10, min_overlap: int = SIMILAR_MIN_OVERLAP,
+               exclude_couple: Optional[int] = None, nprobe: int = SIMILAR_NPROBE,
+               exact: bool = False) -> List[Dict[str, Any]]:
+        """Nearest rows to q, one per couple. Over-fetches so that duplicates can be skipped."""
+        q = np.asarray(q, dtype=np.float32).reshape(N_FEAT)
+        m = (~np.isnan(q)).astype(np.float32)
+        q0 = np.where(m > 0, q, 0.0).astype(np.float32)
+        W = np.zeros((3 * N_FEAT, 2), dtype=np.float32)
+        W[:N_FEAT, 0] = m
+        W[N_FEAT:2 * N_FEAT, 0] = -2.0 * m * q0
+        W[2 * N_FEAT:, 0] = m * q0 * q0
+        W[2 * N_FEAT:, 1] = m
+
+        # Snapshot under the lock, scan outside it: add() only writes rows past size and
+        # _grow() swaps in new arrays, so the first n rows of these references stay valid.
+        with self._lock:
+            n = self.size
+            block, alive, couple, source, ref, label, cell = (
+                self._block, self.alive, self.couple, self.source, self.ref, self.label, self.cell)
+            centroids, fill = self.centroids, self._fill
+            if not exact and centroids is not None:
+                cell = cell[:n].copy()  # train() rewrites cells in place
+
+        idx = None if exact else self._candidates(q0, m, nprobe, centroids, fill, cell)
+        if idx is None:
+            idx = slice(0, n)  # exhaustive: views, no copy of the block
+        out = block[idx] @ W
+        alive, couple = alive[idx], couple[idx]
+        source, ref, label = source[idx], ref[idx], label[idx]
+        count = len(out)
+
+        overlap = out[:, 1]
+        dist = np.sqrt(np.maximum(out[:, 0], 0.0) / np.maximum(overlap, 1.0))
+        ok = alive & (overlap >= min(min_overlap, float(m.sum())))
+        if exclude_couple is not None:
+            ok &= couple != exclude_couple
+        dist = np.where(ok, dist, np.inf)
+
+        take = min(count, 4 * k)
+        if take == 0:
+            return []
+        top = np.argpartition(dist, take - 1)[:take] if take < count else np.arange(count)
+        top = top[np.argsort(dist[top], kind="stable")]
+
+        results, seen_couples = [], set()
+        for i in top:
+            if not np.isfinite(dist[i]):
+                break
+            if couple[i] >= 0:
+                if couple[i] in seen_couples:
+                    continue
+                seen_couples.add(int(couple[i]))
+            results.append({
+                "source": "cohort" if source[i] == SRC_COHORT else "prediction",
+                "ref": int(ref[i]),
+                "couple_id": int(couple[i]) if couple[i] >= 0 else None,
+                "label": int(label[i]) if label[i] >= 0 else None,
+                "distance": round(float(dist[i]), 4),
+                "overlap": int(overlap[i]),
+            })
+            if len(results) == k:
+                break
+        return results
+
+    # ------------------------
+    # Persistence
+    # ------------------------
+    def save(self, path: str):
+        with self._lock:
+            n = self.size
+            arrays = {name.lstrip("_"): getattr(self, name)[:n] for name in self._ARRAYS}
+            arrays["assessments"] = np.array(list(self._row_by_assessment.items()), dtype=np.int64).reshape(-1, 2)
+            if self.centroids is not None:
+                arrays.update(centroids=self.centroids, fill=self._fill, trained_size=np.array(self.trained_size))
+            tmp = path + ".tmp.npz"
+            np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        data = np.load(path)
+        n = len(data["source"])
+        index = cls(capacity=max(1024, n))
+        for name in cls._ARRAYS:
+            getattr(index, name)[:n] = data[name.lstrip("_")]
+        index.size = n
+        index._row_by_assessment = {int(a): int(r) for a, r in data["assessments"]}
+        preds = index.ref[:n][index.source[:n] == SRC_PREDICTION]
+        index.last_prediction_id = int(preds.max()) if len(preds) else 0
+        if "centroids" in data:
+            index.centroids, index._fill = data["centroids"], data["fill"]
+            index.trained_size = int(data["trained_size"])
+        return index
+
+
+def load_cohort(index: VectorIndex, path: str = DATA_PATH):
+    """Add the reference dataset (one row per surveyed couple, Class = outcome)."""
+    df = pd.read_csv(path)
+    index.add(df[FEATURES].to_numpy(dtype=float), SRC_COHORT, np.arange(len(df)),
+              labels=df["Class"].astype(int).to_numpy() if "Class" in df else None)
+
+
+def build_index() -> VectorIndex:
+    """Persisted index if SIMILAR_INDEX_PATH exists, else the CSV cohort (predictions are caught up by sync_index)."""
+    if SIMILAR_INDEX_PATH and os.path.exists(SIMILAR_INDEX_PATH):
+        return VectorIndex.load(SIMILAR_INDEX_PATH)
+    index = VectorIndex()
+    if os.path.exists(DATA_PATH):
+        load_cohort(index)
+    return index
+
+
+_index: Optional[VectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> VectorIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+    return _index
+
+
+_sync_lock = asyncio.Lock()
+
+
+async def sync_index(db: AsyncSession, index: VectorIndex, batch_size: int = 5000) -> int:
+    """
+    Append predictions written since the index last looked (by any worker), then
+    retrain if due. Returns rows added. Calls are serialized: overlapping ones
+    would append the same rows twice and train concurrently.
+    """
+    async with _sync_lock:
+        return await _sync_index(db, index, batch_size)
+
+
+async def _sync_index(db: AsyncSession, index: VectorIndex, batch_size: int) -> int:
+    added = 0
+    while True:
+        rows = (await db.execute(
+            select(Prediction.id, Prediction.assessment_id, Prediction.vector_json, Assessment.couple_id)
+            .join(Assessment, Assessment.id == Prediction.assessment_id)
+            .where(Prediction.id > index.last_prediction_id)
+            .order_by(Prediction.id)
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            break
+        index.add(vectors_to_matrix(r.vector_json for r in rows), SRC_PREDICTION,
+                  refs=[r.id for r in rows], couples=[r.couple_id for r in rows],
+                  assessments=[r.assessment_id for r in rows])
+        added += len(rows)
+    if index.needs_training():
+        await asyncio.to_thread(index.train)
+    return added
+
+
+async def refresh_periodically(interval: float = SIMILAR_REFRESH_SECONDS):
+    """Background task for the app lifespan: catch the index up with new predictions once per interval."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncReadSessionLocal() as db:
+                await sync_index(db, get_index())
+        except Exception:  # keep the loop alive; the next pass retries
+            logger.exception("similar index refresh failed")
+
+
+def save_index():
+    """Persist the index (if built and SIMILAR_INDEX_PATH is set) so the next start skips the rebuild."""
+    if _index is not None and SIMILAR_INDEX_PATH:
+        _index.save(SIMILAR_INDEX_PATH)
@@ -0,0 +1,133 @@
+# app/services/timeline.py
+"""
+Per-couple risk timelines.
+
+Every prediction writes one narrow risk_points row per domain (plus "overall" =
+proba) in the same transaction, so GET /couples/{id}/timeline is a single range
+scan on (couple_id, created_at) followed by deltas, moving averages and band
+transitions over the already-computed points; nothing is recomputed per request.
+
+Predictions written before this existed (or bulk-inserted) are filled in with:
+
+    python -m app.services.timeline --backfill
+"""
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.db import SessionLocal, engine
+from app.migrate import upgrade
+from app.models import Assessment, Prediction, RiskPoint
+from app.services.recommendation import BANDS, calculate_domain_risks, risk_band
+
+OVERALL = "overall"
+
+
+def domain_points(proba: float, vector_json: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """(domain, risk, band) of one prediction: overall first, then the recommendation domains."""
+    points = [{"domain": OVERALL, "risk": round(float(proba), 4), "band": risk_band(float(proba))}]
+    points.extend({"domain": d, "risk": r["risk"], "band": r["band"]} for d, r in calculate_domain_risks(vector_json or {}).items())
+    return points
+
+
+def attach_points(rows: List[Prediction], couple_by_assessment: Dict[int, int]):
+    """Give new Prediction objects their RiskPoint children so they are inserted in the same flush."""
+    now = datetime.utcnow()
+    for p in rows:
+        if p.created_at is None:
+            p.created_at = now  # explicit, so the points carry the prediction's own timestamp
+        p.risk_points = [
+            RiskPoint(couple_id=couple_by_assessment[p.assessment_id], assessment_id=p.assessment_id, created_at=p.created_at, **pt)
+            for pt in domain_points(p.proba, p.vector_json)
+        ]
+
+
+def timeline_query(couple_id: int):
+    return (
+        select(RiskPoint.prediction_id, RiskPoint.assessment_id, RiskPoint.domain, RiskPoint.risk, RiskPoint.band, RiskPoint.created_at)
+        .where(RiskPoint.couple_id == couple_id)
+        .order_by(RiskPoint.created_at, RiskPoint.prediction_id)
+    )
+
+
+def _series(points, window: int) -> Dict[str, Any]:
+    risks = [p.risk for p in points]
+    out, transitions = [], []
+    running = 0.0
+    for i, p in enumerate(points):
+        running += p.risk - (risks[i - window] if i >= window else 0.0)
+        out.append({
+            "prediction_id": p.prediction_id,
+            "assessment_id": p.assessment_id,
+            "created_at": p.created_at.isoformat(),
+            "risk": p.risk,
+            "band": p.band,
+            "delta": round(p.risk - risks[i - 1], 4) if i else None,
+            "moving_avg": round(running / min(i + 1, window), 4),
+        })
+        prev = points[i - 1].band if i else None
+        if prev is not None and p.band != prev:
+            transitions.append({
+                "prediction_id": p.prediction_id,
+                "created_at": p.created_at.isoformat(),
+                "from": prev,
+                "to": p.band,
+                "direction": "worse" if BANDS.index(p.band) > BANDS.index(prev) else "better",
+            })
+    return {
+        "latest": out[-1]["risk"],
+        "band": out[-1]["band"],
+        "change": round(risks[-1] - risks[0], 4),
+        "points": out,
+        "transitions": transitions,
+    }
+
+
+def build_timeline(rows, window: int = 3) -> Dict[str, Dict[str, Any]]:
+    """Rows from timeline_query -> {domain: {latest, band, change, points[], transitions[]}}, overall first."""
+    by_domain: Dict[str, List[Any]] = {}
+    for r in rows:
+        by_domain.setdefault(r.domain, []).append(r)
+    order = sorted(by_domain, key=lambda d: (d != OVERALL, d))
+    return {d: _series(by_domain[d], window) for d in order}
+
+
+def backfill(db: Session, batch_size: int = 1000, limit: Optional[int] = None) -> int:
+    """Write risk points for predictions that have none, in id order, one transaction per batch."""
+    done, last_id = 0, 0
+    while limit is None or done < limit:
+        rows = db.execute(
+            select(Prediction.id, Prediction.assessment_id, Assessment.couple_id, Prediction.created_at,
+                   Prediction.proba, Prediction.vector_json)
+            .join(Assessment, Assessment.id == Prediction.assessment_id)
+            .where(Prediction.id > last_id, ~select(RiskPoint.id).where(RiskPoint.prediction_id == Prediction.id).exists())
+            .order_by(Prediction.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.execute(insert(RiskPoint.__table__), [
+            {"couple_id": r.couple_id, "prediction_id": r.id, "assessment_id": r.assessment_id,
+             "created_at": r.created_at or datetime.utcnow(), **pt}
+            for r in rows for pt in domain_points(r.proba, r.vector_json)
+        ])
+        db.commit()
+        done += len(rows)
+        last_id = rows[-1].id
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backfill", action="store_true", help="Write risk points for predictions that have none")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    if args.backfill:
+        upgrade(engine)  # risk_points table and the columns the backfill query reads
+        with SessionLocal() as db:
+            print(f"Backfilled risk points for {backfill(db, args.batch_size)} predictions")
+
+
+if __name__ == "__main__":
+    main()
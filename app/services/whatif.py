@@ -0,0 +1,86 @@
+# app/services/whatif.py
+from typing import List, Dict, Any, Optional
+import numpy as np
+from canonical import FEATURES, ID2TEXT
+from app.services.explain import vectors_to_matrix
+from app.services.predictor import score_matrix
+
+VALUES = np.arange(5, dtype=float)  # answer scale 0..4
+FEATURE_INDEX = {f: i for i, f in enumerate(FEATURES)}
+
+
+def _single_feature_grid(base: np.ndarray) -> np.ndarray:
+    """(54 * 5, 54) matrix: base vector with one feature set to each of 0..4."""
+    n_feat, n_val = len(FEATURES), len(VALUES)
+    grid = np.repeat(base[None, :], n_feat * n_val, axis=0)
+    rows = np.arange(n_feat * n_val)
+    grid[rows, rows // n_val] = np.tile(VALUES, n_feat)
+    return grid
+
+
+def _scenario_matrix(base: np.ndarray, scenarios: List[Dict[str, Any]]) -> np.ndarray:
+    X = np.repeat(base[None, :], len(scenarios), axis=0)
+    for r, sc in enumerate(scenarios):
+        for feat, value in sc["changes"].items():
+            X[r, FEATURE_INDEX[feat]] = np.nan if value is None else float(value)
+    return X
+
+
+def run_whatif(vector_json: Dict[str, Any], scenarios: Optional[List[Dict[str, Any]]] = None, top_k: int = 10,
+               stored_proba: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Score every single-answer change (54 features x 5 values) plus optional
+    multi-feature scenarios in one model call, and rank the answers whose
+    best change lowers proba the most: changes to given answers in "items",
+    unanswered questions (current None) in "unanswered", top_k each.
+
+    base_proba is the stored vector rescored with the current model (the
+    baseline of every delta); it can differ from the prediction's stored_proba
+    when that was scored by an older model (or, for rows written before
+    vector_json kept half points, on the unrounded fused values).
+    """
+    scenarios = scenarios or []
+    base = vectors_to_matrix([vector_json])[0]
+    grid = _single_feature_grid(base)
+    X = np.vstack([base[None, :], grid] + ([_scenario_matrix(base, scenarios)] if scenarios else []))
+    probas = score_matrix(X).astype(float)
+
+    base_proba = probas[0]
+    per_value = probas[1:1 + len(grid)].reshape(len(FEATURES), len(VALUES))
+    scenario_probas = probas[1 + len(grid):]
+
+    best_idx = per_value.argmin(axis=1)
+    best_proba = per_value[np.arange(len(FEATURES)), best_idx]
+    order = np.argsort(best_proba - base_proba, kind="stable")
+
+    items, unanswered = [], []
+    for i in order:
+        delta = float(best_proba[i] - base_proba)
+        if delta >= 0 or (len(items) >= top_k and len(unanswered) >= top_k):
+            break  # no remaining answer change lowers the risk
+        f = FEATURES[i]
+        bucket = unanswered if vector_json.get(f) is None else items
+        if len(bucket) >= top_k:
+            continue
+        bucket.append({
+            "feature": f,
+            "text": ID2TEXT[f],
+            "current": vector_json.get(f),
+            "suggested": int(VALUES[best_idx[i]]),
+            "proba": round(float(best_proba[i]), 4),
+            "delta": round(delta, 4),
+            "by_value": [round(float(p), 4) for p in per_value[i]],
+        })
+
+    return {
+        "stored_proba": None if stored_proba is None else round(float(stored_proba), 4),
+        "base_proba": round(float(base_proba), 4),
+        "items": items,
+        "unanswered": unanswered,
+        "scenarios": [
+            {"name": sc.get("name") or f"scenario_{k + 1}", "changes": sc["changes"],
+             "proba": round(float(p), 4), "delta": round(float(p - base_proba), 4)}
+            for k, (sc, p) in enumerate(zip(scenarios, scenario_probas))
+        ],
+        "rows_scored": int(len(X)),
+    }
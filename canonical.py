@@ -1,60 +1,70 @@
 # canonical.py
+import json
+import hashlib
+
 canonical_items = [
-    {"id": "Atr1",  "text": "When one of us apologizes when discussions go in a bad direction, the issue does not extend."},
-    {"id": "Atr2",  "text": "I know we can ignore our differences, even if things get hard sometimes."},
-    {"id": "Atr3",  "text": "When we need it, we can take our discussions from the beginning and correct it."},
-    {"id": "Atr4",  "text": "When I argue with my wife, it will eventually work for me to contact her."},
-    {"id": "Atr5",  "text": "The time I spent with my wife is special for us."},
-    {"id": "Atr6",  "text": "We don't have time at home as partners."},
-    {"id": "Atr7",  "text": "We are like two strangers who share the same environment at home rather than family."},
-    {"id": "Atr8",  "text": "I enjoy our holidays with my wife."},
-    {"id": "Atr9",  "text": "I enjoy traveling with my wife."},
-    {"id": "Atr10", "text": "My wife and I have most of our goals in common."},
-    {"id": "Atr11", "text": "In the future, when I look back, I see that my wife and I are in harmony with each other."},
-    {"id": "Atr12", "text": "My wife and I have similar values in terms of personal freedom."},
-    {"id": "Atr13", "text": "My wife and I have similar entertainment preferences."},
-    {"id": "Atr14", "text": "Most of our goals for people (children, friends, etc.) are the same."},
-    {"id": "Atr15", "text": "Our dreams of living together are similar and harmonious."},
-    {"id": "Atr16", "text": "We're compatible about what love should be."},
-    {"id": "Atr17", "text": "We share the same views about being happy in life."},
-    {"id": "Atr18", "text": "We have similar ideas about how marriage should be."},
-    {"id": "Atr19", "text": "We have similar ideas about how roles should be in marriage."},
-    {"id": "Atr20", "text": "We have similar values in trust."},
-    {"id": "Atr21", "text": "I know exactly what my wife likes."},
-    {"id": "Atr22", "text": "I know how my wife wants to be taken care of when she's sick."},
-    {"id": "Atr23", "text": "I know my wife's favorite food."},
-    {"id": "Atr24", "text": "I can tell what kind of stress my wife is facing in her life."},
-    {"id": "Atr25", "text": "I have knowledge of my wife's inner world."},
-    {"id": "Atr26", "text": "I know my wife's basic concerns."},
-    {"id": "Atr27", "text": "I know what my wife's current sources of stress are."},
-    {"id": "Atr28", "text": "I know my wife's hopes and wishes."},
-    {"id": "Atr29", "text": "I know my wife very well."},
-    {"id": "Atr30", "text": "I know my wife's friends and their social relationships."},
-    {"id": "Atr31", "text": "I feel aggressive when I argue with my wife."},
-    {"id": "Atr32", "text": "When discussing with my wife, I usually use expressions such as 'you always' or 'you never'."},
-    {"id": "Atr33", "text": "I can use negative statements about my wife's personality during discussions."},
-    {"id": "Atr34", "text": "I can use offensive expressions during our discussions."},
-    {"id": "Atr35", "text": "I can insult during discussions."},
-    {"id": "Atr36", "text": "I can be humiliating when we argue."},
-    {"id": "Atr37", "text": "My argument with my wife is not calm."},
-    {"id": "Atr38", "text": "I hate my wife's way of bringing it up."},
-    {"id": "Atr39", "text": "Fights often occur suddenly."},
-    {"id": "Atr40", "text": "We start a fight before I know what's going on."},
-    {"id": "Atr41", "text": "When I talk to my wife about something, my calm suddenly breaks."},
-    {"id": "Atr42", "text": "When I argue with my wife, I just snap and don't say a word."},
-    {"id": "Atr43", "text": "I'm mostly thirsty to calm the environment a little bit."},
-    {"id": "Atr44", "text": "Sometimes I think it's good for me to leave home for a while."},
-    {"id": "Atr45", "text": "I'd rather stay silent than argue with my wife."},
-    {"id": "Atr46", "text": "Even if I'm right in the argument, I don't want to upset the other side."},
-    {"id": "Atr47", "text": "When I argue with my wife, I remain silent because I fear losing control of my anger."},
-    {"id": "Atr48", "text": "I feel right in our discussions."},
-    {"id": "Atr49", "text": "I have nothing to do with what I've been accused of."},
-    {"id": "Atr50", "text": "I'm not actually the one who's guilty about what I'm accused of."},
-    {"id": "Atr51", "text": "I'm not the one who's wrong about problems at home."},
-    {"id": "Atr52", "text": "I wouldn't hesitate to tell her about my wife's inadequacy."},
-    {"id": "Atr53", "text": "When I discuss, I remind her of my wife's inadequate issues."},
-    {"id": "Atr54", "text": "I'm not afraid to tell her about my wife's incompetence."}
+    {"id": "Atr1",  "text": "When one of us apologizes when discussions go in a bad direction, the issue does not extend.", "key": "apology stops escalation"},
+    {"id": "Atr2",  "text": "I know we can ignore our differences, even if things get hard sometimes.", "key": "can ignore our differences"},
+    {"id": "Atr3",  "text": "When we need it, we can take our discussions from the beginning and correct it.", "key": "restart and correct discussions"},
+    {"id": "Atr4",  "text": "When I argue with my wife, it will eventually work for me to contact her.", "key": "reaching out after a fight works"},
+    {"id": "Atr5",  "text": "The time I spent with my wife is special for us.", "key": "our time together is special"},
+    {"id": "Atr6",  "text": "We don't have time at home as partners.", "key": "no time at home as partners"},
+    {"id": "Atr7",  "text": "We are like two strangers who share the same environment at home rather than family.", "key": "like strangers sharing a home"},
+    {"id": "Atr8",  "text": "I enjoy our holidays with my wife.", "key": "enjoy holidays together"},
+    {"id": "Atr9",  "text": "I enjoy traveling with my wife.", "key": "enjoy traveling together"},
+    {"id": "Atr10", "text": "My wife and I have most of our goals in common.", "key": "most goals in common"},
+    {"id": "Atr11", "text": "In the future, when I look back, I see that my wife and I are in harmony with each other.", "key": "future harmony together"},
+    {"id": "Atr12", "text": "My wife and I have similar values in terms of personal freedom.", "key": "similar values on personal freedom"},
+    {"id": "Atr13", "text": "My wife and I have similar entertainment preferences.", "key": "similar entertainment tastes"},
+    {"id": "Atr14", "text": "Most of our goals for people (children, friends, etc.) are the same.", "key": "same goals for people (children, friends)"},
+    {"id": "Atr15", "text": "Our dreams of living together are similar and harmonious.", "key": "shared dreams of living together"},
+    {"id": "Atr16", "text": "We're compatible about what love should be.", "key": "agree on what love should be"},
+    {"id": "Atr17", "text": "We share the same views about being happy in life.", "key": "same views on happiness in life"},
+    {"id": "Atr18", "text": "We have similar ideas about how marriage should be.", "key": "similar ideas of marriage"},
+    {"id": "Atr19", "text": "We have similar ideas about how roles should be in marriage.", "key": "similar ideas of marriage roles"},
+    {"id": "Atr20", "text": "We have similar values in trust.", "key": "similar values in trust"},
+    {"id": "Atr21", "text": "I know exactly what my wife likes.", "key": "know what spouse likes"},
+    {"id": "Atr22", "text": "I know how my wife wants to be taken care of when she's sick.", "key": "know care spouse wants when sick"},
+    {"id": "Atr23", "text": "I know my wife's favorite food.", "key": "know spouse's favorite food"},
+    {"id": "Atr24", "text": "I can tell what kind of stress my wife is facing in her life.", "key": "can tell spouse's life stress"},
+    {"id": "Atr25", "text": "I have knowledge of my wife's inner world.", "key": "know spouse's inner world"},
+    {"id": "Atr26", "text": "I know my wife's basic concerns.", "key": "know spouse's basic concerns"},
+    {"id": "Atr27", "text": "I know what my wife's current sources of stress are.", "key": "know spouse's current stress sources"},
+    {"id": "Atr28", "text": "I know my wife's hopes and wishes.", "key": "know spouse's hopes and wishes"},
+    {"id": "Atr29", "text": "I know my wife very well.", "key": "know spouse very well"},
+    {"id": "Atr30", "text": "I know my wife's friends and their social relationships.", "key": "know spouse's friends and social ties"},
+    {"id": "Atr31", "text": "I feel aggressive when I argue with my wife.", "key": "feel aggressive when arguing"},
+    {"id": "Atr32", "text": "When discussing with my wife, I usually use expressions such as 'you always' or 'you never'.", "key": "say 'you always' / 'you never'"},
+    {"id": "Atr33", "text": "I can use negative statements about my wife's personality during discussions.", "key": "negative remarks on spouse's personality"},
+    {"id": "Atr34", "text": "I can use offensive expressions during our discussions.", "key": "offensive expressions in discussions"},
+    {"id": "Atr35", "text": "I can insult during discussions.", "key": "insult during discussions"},
+    {"id": "Atr36", "text": "I can be humiliating when we argue.", "key": "humiliating when arguing"},
+    {"id": "Atr37", "text": "My argument with my wife is not calm.", "key": "arguments are not calm"},
+    {"id": "Atr38", "text": "I hate my wife's way of bringing it up.", "key": "hate how spouse brings things up"},
+    {"id": "Atr39", "text": "Fights often occur suddenly.", "key": "fights start suddenly"},
+    {"id": "Atr40", "text": "We start a fight before I know what's going on.", "key": "fight starts before I know why"},
+    {"id": "Atr41", "text": "When I talk to my wife about something, my calm suddenly breaks.", "key": "my calm suddenly breaks"},
+    {"id": "Atr42", "text": "When I argue with my wife, I just snap and don't say a word.", "key": "snap and say nothing"},
+    {"id": "Atr43", "text": "I'm mostly thirsty to calm the environment a little bit.", "key": "want to calm things down"},
+    {"id": "Atr44", "text": "Sometimes I think it's good for me to leave home for a while.", "key": "leaving home for a while seems good"},
+    {"id": "Atr45", "text": "I'd rather stay silent than argue with my wife.", "key": "rather stay silent than argue"},
+    {"id": "Atr46", "text": "Even if I'm right in the argument, I don't want to upset the other side.", "key": "don't upset spouse even when right"},
+    {"id": "Atr47", "text": "When I argue with my wife, I remain silent because I fear losing control of my anger.", "key": "silent for fear of losing my temper"},
+    {"id": "Atr48", "text": "I feel right in our discussions.", "key": "feel right in our discussions"},
+    {"id": "Atr49", "text": "I have nothing to do with what I've been accused of.", "key": "not involved in what I'm accused of"},
+    {"id": "Atr50", "text": "I'm not actually the one who's guilty about what I'm accused of.", "key": "not the guilty one when accused"},
+    {"id": "Atr51", "text": "I'm not the one who's wrong about problems at home.", "key": "not the one wrong about home problems"},
+    {"id": "Atr52", "text": "I wouldn't hesitate to tell her about my wife's inadequacy.", "key": "would tell spouse of their inadequacy"},
+    {"id": "Atr53", "text": "When I discuss, I remind her of my wife's inadequate issues.", "key": "remind spouse of their inadequacies"},
+    {"id": "Atr54", "text": "I'm not afraid to tell her about my wife's incompetence.", "key": "not afraid to call spouse incompetent"}
 ]
 
 FEATURES = [c["id"] for c in canonical_items]
 ID2TEXT = {c["id"]: c["text"] for c in canonical_items}
+
+# Short content hash of the bank; changes whenever an item is edited
+CANONICAL_VERSION = hashlib.sha1(json.dumps(canonical_items, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+def canonical_index() -> str:
+    """Compact one-line-per-item index of short keys ("Atr1: apology stops escalation") for router prompts."""
+    return "\n".join(f'{c["id"]}: {c["key"]}' for c in canonical_items)
@@ -10,3 +10,78 @@ GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash")
 DATA_PATH = os.getenv("DATA_PATH", "data/divorce_atr.csv")
 MODEL_PATH = os.getenv("MODEL_PATH", "models/xgb_model.json")  # xgboost native format
 SEED = int(os.getenv("SEED", "42"))
+
+# Max user texts per Gemini routing call (bulk prediction packs unique texts into as few calls as possible)
+ROUTER_BATCH_SIZE = int(os.getenv("ROUTER_BATCH_SIZE", "200"))
+# Estimated-token budget for the user texts of one routing call; larger lists are split into chunks
+ROUTER_CHUNK_TOKENS = int(os.getenv("ROUTER_CHUNK_TOKENS", "2000"))
+# Max routing calls in flight at once when a list is split into several chunks
+ROUTER_MAX_CONCURRENCY = int(os.getenv("ROUTER_MAX_CONCURRENCY", "4"))
+
+# Max entries in the per-process response cache for polled read endpoints
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+# Seconds a cached response lives: the bound on staleness for writes this worker did not see
+# (other API workers, scripts and jobs; each worker only invalidates on its own commits)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "5"))
+# With DATABASE_READ_URL: responses rebuilt this soon after a write are served but not cached (replica lag)
+REPLICA_LAG_SECONDS = float(os.getenv("REPLICA_LAG_SECONDS", "2"))
+
+# How partner A/B answers are combined: mean | max_risk | min_risk | confidence | disagreement
+FUSION_STRATEGY = os.getenv("FUSION_STRATEGY", "mean")
+
+# 4-week program: "gemini" (LLM, local program_local.py table if the call fails), "local" (no LLM), or
+# "placeholder" (local table stored at once, replaced by the LLM version in the background)
+PROGRAM_BACKEND = os.getenv("PROGRAM_BACKEND", "gemini")
+# Router LLM backend: "gemini", or "stub" for the deterministic local router in router_stub.py
+ROUTER_BACKEND = os.getenv("ROUTER_BACKEND", "gemini")
+# "lean" (compact canonical index in the system prompt, positional output) or "legacy" (full bank per call)
+ROUTER_PROMPT_MODE = os.getenv("ROUTER_PROMPT_MODE", "lean")
+# Extra router calls that re-request only the items missing or invalid in the previous reply
+ROUTER_REPAIR_ROUNDS = int(os.getenv("ROUTER_REPAIR_ROUNDS", "2"))
+# Compute feature contributions (scoring model) when predictions are written (else lazily on first /explain)
+EXPLAIN_ON_PREDICT = os.getenv("EXPLAIN_ON_PREDICT", "1").lower() in ("1", "true", "yes")
+# Similar-couples vector index: optional .npz snapshot (loaded at start, written at shutdown) and
+# the minimum number of commonly answered items for two vectors to be compared
+SIMILAR_INDEX_PATH = os.getenv("SIMILAR_INDEX_PATH", "")
+SIMILAR_MIN_OVERLAP = int(os.getenv("SIMILAR_MIN_OVERLAP", "10"))
+# From this many indexed vectors, similar-couples search probes the SIMILAR_NPROBE nearest k-means cells instead of scanning everything
+SIMILAR_IVF_MIN_ROWS = int(os.getenv("SIMILAR_IVF_MIN_ROWS", "100000"))
+SIMILAR_NPROBE = int(os.getenv("SIMILAR_NPROBE", "16"))
+# Seconds between background catch-ups of the similar-couples index with new predictions
+SIMILAR_REFRESH_SECONDS = float(os.getenv("SIMILAR_REFRESH_SECONDS", "30"))
+
+# Adaptive questionnaire: stop asking once no remaining answer could move proba by this much (or flip the class)
+ADAPTIVE_STABLE_DELTA = float(os.getenv("ADAPTIVE_STABLE_DELTA", "0.05"))
+
+# Browser cache lifetime (seconds) for frontend css/js/images served under /ui (pages always revalidate)
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "604800"))
+
+# Model used for scoring on the hot path: "full" (MODEL_PATH) or "compact" (COMPACT_MODEL_PATH, from model_compact.py)
+SCORING_MODEL = os.getenv("SCORING_MODEL", "full")
+COMPACT_MODEL_PATH = os.getenv("COMPACT_MODEL_PATH", "models/xgb_compact.json")
+# Shared scoring service (python -m app.services.scoring): "unix:/path" or "host:port" ("" = score in-process).
+# It batches vectors from all API workers (up to SCORING_BATCH_SIZE rows or SCORING_MAX_WAIT_MS after the
+# first) and scores them in SCORING_WORKERS processes
+SCORING_SERVICE = os.getenv("SCORING_SERVICE", "")
+SCORING_BATCH_SIZE = int(os.getenv("SCORING_BATCH_SIZE", "256"))
+SCORING_MAX_WAIT_MS = float(os.getenv("SCORING_MAX_WAIT_MS", "2"))
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "1"))
+
+# Shadow scoring: comma-separated candidate model files (xgboost json or model_compact.py linear json)
+# scored on a background thread for every new prediction; compare at /metrics/shadow
+SHADOW_MODEL_PATHS = os.getenv("SHADOW_MODEL_PATHS", "")
+SHADOW_BATCH_SIZE = int(os.getenv("SHADOW_BATCH_SIZE", "256"))
+SHADOW_FLUSH_SECONDS = float(os.getenv("SHADOW_FLUSH_SECONDS", "1.0"))
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "10000"))
+
+# Retention: audit/fusion payloads of predictions older than ARCHIVE_AFTER_DAYS move to the compressed
+# prediction_archive table (0 disables the background job), ARCHIVE_BATCH_SIZE rows per short transaction,
+# one pass every ARCHIVE_INTERVAL_SECONDS
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Continual training (continual_train.py): chunked on-disk store of labeled vectors from the DB and
+# where a candidate that fails the validation gates is written (e.g. for SHADOW_MODEL_PATHS)
+TRAIN_STORE_DIR = os.getenv("TRAIN_STORE_DIR", "data/train_store")
+CANDIDATE_MODEL_PATH = os.getenv("CANDIDATE_MODEL_PATH", "models/xgb_candidate.json")
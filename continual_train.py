@@ -0,0 +1,327 @@
+# continual_train.py
+"""
+Continual training from assessments whose couple has a recorded outcome
+(POST /couples/{id}/outcome; same coding as Class in data/divorce_atr.csv).
+
+  ingest  streams labeled vectors (latest prediction per assessment) out of the
+          DB in chunks into TRAIN_STORE_DIR: one columnar .npz part per chunk
+          (X float32 (n, 54), y, prediction_id, couple_id, assessment_id) plus
+          manifest.json with the outcome_at cursor, so each run reads only newly
+          labeled couples. The cursor advances to the newest outcome_at actually
+          read, and only outcomes older than --settle-seconds are read: outcome_at
+          is stamped before its transaction commits, so a fresher one may not be
+          visible yet. A corrected outcome is read again with its new label and
+          supersedes the assessment's earlier row: it replaces it in the replay /
+          hold-out reservoirs, and update trains on the latest row per assessment
+          only. Parts already trained on are not revisited (the current model saw
+          the old label once; the corrected row is trained on with the next update).
+  update  continues boosting the current MODEL_PATH booster for --rounds trees
+          on the parts not trained on yet plus a bounded replay sample (a
+          reservoir seeded with the CSV training split), then gates the
+          candidate: accuracy on the model_train.py hold-out may not drop by more
+          than --max-acc-drop, and log loss on the store hold-out (couples with
+          couple_id % 5 == 0, never trained on) may not rise by more than
+          --max-logloss-rise. Passing candidates replace MODEL_PATH (previous
+          model kept as *.prev.json; API processes pick it up on restart),
+          failing ones go to CANDIDATE_MODEL_PATH (e.g. for SHADOW_MODEL_PATHS).
+          With SCORING_MODEL=compact the hot path serves COMPACT_MODEL_PATH, which
+          is derived from MODEL_PATH: pass --rebuild-compact VARIANT to re-run
+          model_compact.py after a promotion, or the API keeps the old compact model.
+  run     ingest + update, once or every --every seconds.
+
+Work per run is proportional to the new rows (plus fixed-size replay / hold-out
+reservoirs), not to the size of the store.
+
+    python continual_train.py run --every 86400
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, log_loss
+from canonical import FEATURES
+from config import DATA_PATH, MODEL_PATH, SEED, TRAIN_STORE_DIR, CANDIDATE_MODEL_PATH, SCORING_MODEL
+from app.db import engine
+from app.models import Assessment, Couple, Prediction
+from app.services.explain import vectors_to_matrix
+
+HOLDOUT_MOD = 5          # couple_id % HOLDOUT_MOD == 0 -> store hold-out
+REPLAY_CAPACITY = 20000  # rows kept for replay against forgetting
+HOLDOUT_CAPACITY = 5000  # rows kept for the store hold-out gate
+MIN_HOLDOUT_ROWS = 20    # below this the store hold-out gate is skipped
+
+# Same family as model_train.py; a lower learning rate so an update nudges the model instead of rewriting it
+PARAMS = {
+    "objective": "binary:logistic", "eval_metric": "logloss", "max_depth": 4, "subsample": 0.9,
+    "colsample_bytree": 0.9, "lambda": 1.0, "alpha": 0.0, "tree_method": "hist", "seed": SEED,
+}
+
+
+class TrainStore:
+    """Append-only chunked store of labeled vectors under one directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"cursor": None, "parts": [], "rows": 0, "trained_through": 0,
+                             "replay_seen": 0, "holdout_seen": 0, "history": []}
+        self.rng = np.random.default_rng(SEED + len(self.manifest["parts"]))
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def write_part(self, X: np.ndarray, y: np.ndarray, prediction_id: np.ndarray, couple_id: np.ndarray,
+                   assessment_id: np.ndarray) -> Dict[str, Any]:
+        # named by position; a crashed run's unreferenced parts are overwritten by the next one
+        os.makedirs(self.path, exist_ok=True)
+        name = f"part-{len(self.manifest['parts']) + 1:06d}.npz"
+        np.savez(self._file(name), X=X.astype(np.float32), y=y.astype(np.int8),
+                 prediction_id=prediction_id.astype(np.int64), couple_id=couple_id.astype(np.int64),
+                 assessment_id=assessment_id.astype(np.int64))
+        part = {"name": name, "rows": int(len(y)), "max_prediction_id": int(prediction_id.max())}
+        self.manifest["parts"].append(part)
+        self.manifest["rows"] += part["rows"]
+        return part
+
+    def load_parts(self, parts: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        data = [np.load(self._file(p["name"])) for p in parts]
+        if not data:
+            return {"X": np.zeros((0, len(FEATURES)), np.float32), "y": np.zeros(0, np.int8),
+                    "couple_id": np.zeros(0, np.int64), "assessment_id": np.zeros(0, np.int64)}
+        out = {k: np.concatenate([d[k] for d in data]) for k in ("X", "y", "couple_id")}
+        out["assessment_id"] = np.concatenate([_assessment_ids(d) for d in data])
+        return out
+
+    def reservoir(self, name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(X, y, assessment_id) of a reservoir; assessment_id is -1 for cohort rows."""
+        path = self._file(f"{name}.npz")
+        if not os.path.exists(path):
+            return np.zeros((0, len(FEATURES)), np.float32), np.zeros(0, np.int8), np.zeros(0, np.int64)
+        d = np.load(path)
+        return d["X"], d["y"], _assessment_ids(d)
+
+    def add_to_reservoir(self, name: str, capacity: int, X: np.ndarray, y: np.ndarray, assessment_id: Optional[np.ndarray] = None):
+        """
+        Uniform sample (algorithm R) of every row ever added, at most capacity rows. A row
+        whose assessment is already held (a corrected outcome) replaces the held one.
+        """
+        aid = np.full(len(y), -1, np.int64) if assessment_id is None else np.asarray(assessment_id, np.int64)
+        R_X, R_y, R_a = self.reservoir(name)
+        keep = ~np.isin(R_a, aid[aid >= 0])
+        R_X, R_y, R_a = list(R_X[keep]), list(R_y[keep]), list(R_a[keep])
+        seen = self.manifest[f"{name}_seen"]
+        for x, label, a in zip(X, y, aid):
+            if len(R_X) < capacity:
+                R_X.append(x)
+                R_y.append(label)
+                R_a.append(a)
+            else:
+                j = int(self.rng.integers(0, seen + 1))
+                if j < capacity:
+                    R_X[j], R_y[j], R_a[j] = x, label, a
+            seen += 1
+        self.manifest[f"{name}_seen"] = seen
+        os.makedirs(self.path, exist_ok=True)
+        np.savez(self._file(f"{name}.npz"), X=np.asarray(R_X, dtype=np.float32).reshape(-1, len(FEATURES)),
+                 y=np.asarray(R_y, dtype=np.int8), assessment_id=np.asarray(R_a, dtype=np.int64))
+
+
+def _assessment_ids(d) -> np.ndarray:
+    # parts and reservoirs written before assessment_id was stored: unknown (-1)
+    return d["assessment_id"] if "assessment_id" in d else np.full(len(d["y"]), -1, np.int64)
+
+
+def latest_per_assessment(assessment_id: np.ndarray) -> np.ndarray:
+    """Mask keeping the last row of each assessment (rows without one, -1, are all kept)."""
+    keep = assessment_id < 0
+    _, first_from_end = np.unique(assessment_id[::-1], return_index=True)
+    keep[len(assessment_id) - 1 - first_from_end] = True
+    return keep
+
+
+def _cohort_split():
+    """The model_train.py split of the reference CSV."""
+    df = pd.read_csv(DATA_PATH)
+    X = df[FEATURES].to_numpy(dtype=np.float32)
+    y = df["Class"].astype(int).values
+    return train_test_split(X, y, test_size=0.2, random_state=SEED, stratify=y)
+
+
+def labeled_query(since: Optional[datetime], until: datetime):
+    """Latest prediction of every assessment of couples whose outcome was recorded in (since, until]."""
+    newer = aliased(Prediction)
+    query = (
+        select(Prediction.id, Prediction.assessment_id, Prediction.vector_json, Assessment.couple_id, Couple.outcome, Couple.outcome_at)
+        .join(Assessment, Assessment.id == Prediction.assessment_id)
+        .join(Couple, Couple.id == Assessment.couple_id)
+        .where(Couple.outcome.is_not(None), Couple.outcome_at <= until)
+        .where(~select(newer.id).where(newer.assessment_id == Prediction.assessment_id, newer.id > Prediction.id).exists())
+        .order_by(Prediction.id)
+    )
+    if since is not None:
+        query = query.where(Couple.outcome_at > since)
+    return query
+
+
+def ingest(store: TrainStore, chunk_size: int = 10000, settle_seconds: float = 300) -> Dict[str, Any]:
+    """
+    Stream newly labeled vectors into store parts. A corrected outcome is ingested again with
+    its new label and replaces the assessment's row in the reservoirs (see latest_per_assessment for parts).
+    """
+    if not store.manifest["parts"] and not store.manifest["replay_seen"]:
+        X_train, _, y_train, _ = _cohort_split()
+        store.add_to_reservoir("replay", REPLAY_CAPACITY, X_train, y_train)
+    until = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    since = datetime.fromisoformat(store.manifest["cursor"]) if store.manifest["cursor"] else None
+    newest = since
+    rows = parts = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=chunk_size).execute(labeled_query(since, until))
+        for chunk in result.partitions():
+            X = vectors_to_matrix(r.vector_json for r in chunk)
+            y = np.array([r.outcome for r in chunk])
+            pid = np.array([r.id for r in chunk])
+            cid = np.array([r.couple_id for r in chunk])
+            aid = np.array([r.assessment_id for r in chunk])
+            store.write_part(X, y, pid, cid, aid)
+            hold = cid % HOLDOUT_MOD == 0
+            store.add_to_reservoir("holdout", HOLDOUT_CAPACITY, X[hold], y[hold], aid[hold])
+            store.add_to_reservoir("replay", REPLAY_CAPACITY, X[~hold], y[~hold], aid[~hold])
+            rows += len(chunk)
+            parts += 1
+            latest = max(r.outcome_at for r in chunk)
+            newest = latest if newest is None else max(newest, latest)
+    store.manifest["cursor"] = newest.isoformat() if newest else None
+    store.save()
+    return {"ingested": rows, "parts": parts, "store_rows": store.manifest["rows"], "cursor": store.manifest["cursor"]}
+
+
+def _metrics(booster: xgb.Booster, X: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    p = booster.inplace_predict(X, missing=np.nan)
+    return {"acc": round(float(accuracy_score(y, p >= 0.5)), 4),
+            "logloss": round(float(log_loss(y, np.clip(p, 1e-6, 1 - 1e-6), labels=[0, 1])), 4)}
+
+
+def update(store: TrainStore, rounds: int = 20, eta: float = 0.03, replay_ratio: float = 1.0, min_new: int = 50,
+           max_acc_drop: float = 0.01, max_logloss_rise: float = 0.0, out: str = MODEL_PATH,
+           rebuild_compact: Optional[str] = None) -> Dict[str, Any]:
+    """Continue boosting on untrained parts + replay; promote the candidate only if it passes the gates."""
+    new_parts = store.manifest["parts"][store.manifest["trained_through"]:]
+    new = store.load_parts(new_parts)
+    # a corrected outcome is a later row of the same assessment: only the latest label is trained on
+    train = (new["couple_id"] % HOLDOUT_MOD != 0) & latest_per_assessment(new["assessment_id"])
+    X_new, y_new = new["X"][train], new["y"][train]
+    if len(y_new) < min_new:
+        return {"status": "skipped", "reason": f"{len(y_new)} new training rows < min_new={min_new}"}
+
+    R_X, R_y, _ = store.reservoir("replay")
+    take = store.rng.choice(len(R_y), size=min(len(R_y), int(replay_ratio * len(y_new))), replace=False)
+    X = np.vstack([X_new, R_X[take]])
+    y = np.concatenate([y_new, R_y[take]])
+
+    current = xgb.Booster()
+    current.load_model(out)
+    start = time.perf_counter()
+    dtrain = xgb.DMatrix(X, label=y, missing=np.nan, feature_names=current.feature_names)
+    candidate = xgb.train({**PARAMS, "eta": eta}, dtrain, num_boost_round=rounds, xgb_model=current)
+    seconds = time.perf_counter() - start
+
+    _, X_test, _, y_test = _cohort_split()
+    H_X, H_y, _ = store.reservoir("holdout")
+    gates = {"cohort": {"current": _metrics(current, X_test, y_test), "candidate": _metrics(candidate, X_test, y_test)}}
+    passed = gates["cohort"]["candidate"]["acc"] >= gates["cohort"]["current"]["acc"] - max_acc_drop
+    if len(H_y) >= MIN_HOLDOUT_ROWS and len(np.unique(H_y)) == 2:
+        gates["store"] = {"current": _metrics(current, H_X, H_y), "candidate": _metrics(candidate, H_X, H_y)}
+        passed = passed and gates["store"]["candidate"]["logloss"] <= gates["store"]["current"]["logloss"] + max_logloss_rise
+
+    if passed:
+        current.save_model(f"{os.path.splitext(out)[0]}.prev.json")
+        tmp = f"{os.path.splitext(out)[0]}.tmp.json"  # .json: xgboost picks its save format from the extension
+        candidate.save_model(tmp)
+        os.replace(tmp, out)
+        store.manifest["trained_through"] = len(store.manifest["parts"])
+    else:
+        os.makedirs(os.path.dirname(CANDIDATE_MODEL_PATH) or ".", exist_ok=True)
+        candidate.save_model(CANDIDATE_MODEL_PATH)
+
+    result = {
+        "status": "promoted" if passed else "rejected",
+        "at": datetime.utcnow().isoformat(),
+        "new_rows": int(len(y_new)),
+        "replay_rows": int(len(take)),
+        "trees": candidate.num_boosted_rounds(),
+        "train_seconds": round(seconds, 2),
+        "gates": gates,
+        "saved_to": out if passed else CANDIDATE_MODEL_PATH,
+    }
+    if passed and rebuild_compact:
+        # COMPACT_MODEL_PATH is derived from the full model: rebuild it from the promoted one
+        subprocess.run([sys.executable, "model_compact.py", "--write", rebuild_compact],
+                       env={**os.environ, "MODEL_PATH": out}, check=True, stdout=subprocess.DEVNULL)
+        result["compact_rebuilt"] = rebuild_compact
+    elif passed and SCORING_MODEL == "compact":
+        result["warning"] = "SCORING_MODEL=compact still serves the old COMPACT_MODEL_PATH; rebuild it (--rebuild-compact)"
+    store.manifest["history"].append(result)
+    store.save()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("ingest", "update", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--store", default=TRAIN_STORE_DIR)
+        if name in ("ingest", "run"):
+            p.add_argument("--chunk-size", type=int, default=10000)
+            p.add_argument("--settle-seconds", type=float, default=300,
+                           help="Only read outcomes recorded at least this long ago (their transactions have committed)")
+        if name in ("update", "run"):
+            p.add_argument("--rounds", type=int, default=20, help="Trees added per update")
+            p.add_argument("--eta", type=float, default=0.03)
+            p.add_argument("--replay-ratio", type=float, default=1.0, help="Replay rows per new training row")
+            p.add_argument("--min-new", type=int, default=50, help="Skip the update below this many new training rows")
+            p.add_argument("--max-acc-drop", type=float, default=0.01)
+            p.add_argument("--max-logloss-rise", type=float, default=0.0)
+            p.add_argument("--out", default=MODEL_PATH)
+            p.add_argument("--rebuild-compact", choices=("pruned", "distilled", "linear"), default=None,
+                           help="After a promotion, rebuild COMPACT_MODEL_PATH with model_compact.py --write VARIANT")
+        if name == "run":
+            p.add_argument("--every", type=float, default=0, help="Repeat every N seconds (0 = once)")
+    args = parser.parse_args()
+
+    while True:
+        store = TrainStore(args.store)
+        if args.cmd in ("ingest", "run"):
+            print(json.dumps(ingest(store, args.chunk_size, args.settle_seconds)))
+        if args.cmd in ("update", "run"):
+            print(json.dumps(update(store, args.rounds, args.eta, args.replay_ratio, args.min_new,
+                                    args.max_acc_drop, args.max_logloss_rise, args.out, args.rebuild_compact)))
+        if args.cmd != "run" or not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# export_data.py
+"""
+Research export of predictions to a file, streamed in chunks (constant memory).
+
+One row per prediction: ids, created_at, proba/class, Atr1..Atr54, risk_/band_
+per domain and, unless --no-audit, the routing audit and fusion summary
+(restored from the archive for tiered-out predictions). Parquet / Arrow IPC
+need pyarrow; without it the export is written as CSV.
+
+    python export_data.py --format parquet --out exports/predictions.parquet --doctor-id 3 --since 2024-01-01
+"""
+import os
+import json
+import time
+import argparse
+import resource
+from datetime import datetime
+from app.db import engine
+from app.services.export import FORMATS, export_query, iter_chunks, resolve_format, write_file
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--out", default=None, help="Output path (default exports/predictions.<format>)")
+    parser.add_argument("--doctor-id", type=int, default=None)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="created_at >= (ISO date/time)")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="created_at < (ISO date/time)")
+    parser.add_argument("--no-audit", action="store_true", help="Leave out audit_json / fusion_json")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    audit = not args.no_audit
+    fmt = resolve_format(args.format)
+    out = args.out or f"exports/predictions.{fmt}"
+    if fmt != args.format:
+        print(f"pyarrow not installed; writing {fmt} instead of {args.format}")
+        out = f"{os.path.splitext(out)[0]}.{fmt}"
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        chunks = iter_chunks(conn, export_query(args.doctor_id, args.since, args.until, audit), audit, args.chunk_size)
+        result = write_file(chunks, fmt, out, audit)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({**result, "out": out, "bytes": os.path.getsize(out), "seconds": round(elapsed, 1),
+                      "rows_per_s": round(result["rows"] / elapsed) if elapsed else None,
+                      "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)}))
+
+
+if __name__ == "__main__":
+    main()
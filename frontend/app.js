@@ -2,7 +2,8 @@
 // ==========================
 // Global Config
 // ==========================
-const API_BASE = "http://127.0.0.1:8000"; // FastAPI backend URL
+// FastAPI backend URL: same origin when served by the API (/ui), else the local dev server
+const API_BASE = location.protocol.startsWith("http") ? location.origin : "http://127.0.0.1:8000";
 let doctorId = localStorage.getItem("doctorId");
 
 // ==========================
@@ -44,9 +45,9 @@ document.getElementById("loginForm")?.addEventListener("submit", async (e) => {
   e.preventDefault();
   const email = document.getElementById("loginEmail").value;
 
-  // Call your API to check doctor by email
+  // Doctor + dashboard in one request; dashboard.html renders it without refetching
   const res = await fetch(
-    `${API_BASE}/doctors/by_email?email=${encodeURIComponent(email)}`
+    `${API_BASE}/doctors/by_email/dashboard?email=${encodeURIComponent(email)}`
   );
 
   if (!res.ok) {
@@ -54,9 +55,11 @@ document.getElementById("loginForm")?.addEventListener("submit", async (e) => {
     return;
   }
 
-  const doctor = await res.json();
-  doctorId = doctor.doctor_id || doctor.id;
+  const page = await res.json();
+  const doctor = page.doctor;
+  doctorId = doctor.id;
   localStorage.setItem("doctorId", doctorId);
+  sessionStorage.setItem("dashboardBootstrap", JSON.stringify(page));
 
   alert(`Welcome back, Dr. ${doctor.name}!`);
   window.location.href = "dashboard.html";
@@ -72,13 +75,18 @@ async function loadDashboard() {
     return;
   }
 
-  const res = await fetch(`${API_BASE}/doctors/${doctorId}/dashboard`);
-  if (!res.ok) {
-    alert("Failed to load dashboard");
-    return;
+  // Right after login the dashboard payload came with the login response
+  const bootstrap = sessionStorage.getItem("dashboardBootstrap");
+  sessionStorage.removeItem("dashboardBootstrap");
+  let data = bootstrap ? JSON.parse(bootstrap) : null;
+  if (!data || String(data.doctor.id) !== String(doctorId)) {
+    const res = await fetch(`${API_BASE}/doctors/${doctorId}/dashboard`);
+    if (!res.ok) {
+      alert("Failed to load dashboard");
+      return;
+    }
+    data = await res.json();
   }
-
-  const data = await res.json();
   const tbody = document.querySelector("#couplesTable tbody");
   tbody.innerHTML = ""; // clear old rows
 
@@ -1,19 +1,29 @@
 # gemini_router.py
+import re
 import json
+import math
 import time
+import asyncio
 import random
+import threading
 from typing import Dict, Any, List, Union
 import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, DeadlineExceeded
-from config import GEMINI_API_KEY, GEMINI_MODEL_NAME
-from canonical import canonical_items
+from config import GEMINI_API_KEY, GEMINI_MODEL_NAME, ROUTER_BACKEND, ROUTER_PROMPT_MODE, ROUTER_REPAIR_ROUNDS
+from canonical import canonical_items, canonical_index, CANONICAL_VERSION, ID2TEXT
 
-if not GEMINI_API_KEY:
-    raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) not set. Put it in .env.")
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional; stdlib json is the fallback
+    _loads = json.loads
 
-genai.configure(api_key=GEMINI_API_KEY)
+if ROUTER_BACKEND != "stub":
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) not set. Put it in .env.")
+    genai.configure(api_key=GEMINI_API_KEY)
 
-ROUTER_SYSTEM = (
+ROUTER_RULES = (
     "You are a semantic router for a fixed bank of 54 survey items (Atr1..Atr54). "
     "For each USER sentence, select EXACTLY ONE canonical item that best matches the MEANING, not just keywords. "
     "Also classify the stance of the USER sentence relative to the chosen canonical text:\n"
@@ -23,6 +33,10 @@ ROUTER_SYSTEM = (
     "CRITICAL RULES:\n"
     "1) Prefer 'entails' or 'contradicts' when the meaning is clear. Use 'neutral' only when truly unsure.\n"
     "2) Do not guess below the confidence threshold supplied in the prompt; if nothing is above threshold, return 'no_match'.\n\n"
+)
+
+# Legacy prompt: canonical bank + schema hint are sent with every call
+ROUTER_SYSTEM = ROUTER_RULES + (
     "Output JSON ONLY, as:\n"
     "{\n"
     "  \"results\": [\n"
@@ -36,29 +50,127 @@ ROUTER_SYSTEM = (
     "}\n\n"
 )
 
-
-gemini_model = genai.GenerativeModel(
-    model_name=GEMINI_MODEL_NAME,
-    system_instruction=ROUTER_SYSTEM,
-    generation_config={
-        "temperature": 0.0,
-        "response_mime_type": "application/json",
-    },
+# Lean prompt: the canonical bank lives in the system instruction as a versioned index of short item
+# keys (not the full statements), and results come back as positional arrays. Alternates are only
+# requested when topk > 1.
+ROUTER_SYSTEM_LEAN = ROUTER_RULES + (
+    "The prompt is {\"t\": [USER texts], \"min_conf\": threshold, \"k\": topk}.\n"
+    "Output JSON ONLY, one entry per USER text, in order, where i is the 0-based index of the text in t:\n"
+    "{\"r\": [[i, \"Atr##\"|\"no_match\", \"e\"|\"c\"|\"n\", confidence]]}\n"
+    "e = entails, c = contradicts, n = neutral. "
+    "If k > 1, append a 5th element: [[\"Atr##\", confidence], ...] with up to k-1 alternates.\n\n"
+    "Each canonical item is a first-person statement from a spouse's marriage questionnaire, given below "
+    "as a short key; match on the statement the key stands for, not on its exact words.\n"
+    f"CANONICAL ITEMS v{CANONICAL_VERSION}:\n" + canonical_index()
 )
 
+_RELATION_CODES = {"e": "entails", "c": "contradicts", "n": "neutral"}
+_VALID_RELATIONS = set(_RELATION_CODES.values())
+_VALID_TARGETS = set(ID2TEXT) | {"no_match"}
+_LEAN_ITEM_RE = re.compile(r'\[\s*(\d+)\s*,\s*"([A-Za-z_0-9]+)"\s*,\s*"([a-z]+)"\s*,\s*([0-9]*\.?[0-9]+)\s*[\],]')
+
+_GENERATION_CONFIG = {
+    "temperature": 0.0,
+    "response_mime_type": "application/json",
+}
+
+
+def _make_router_model(system_instruction: str):
+    if ROUTER_BACKEND == "stub":
+        from router_stub import StubRouterModel
+        return StubRouterModel(system_instruction=system_instruction)
+    return genai.GenerativeModel(
+        model_name=GEMINI_MODEL_NAME,
+        system_instruction=system_instruction,
+        generation_config=_GENERATION_CONFIG,
+    )
+
+
+def router_system(mode: str = ROUTER_PROMPT_MODE) -> str:
+    return ROUTER_SYSTEM_LEAN if mode == "lean" else ROUTER_SYSTEM
+
+
+gemini_model = _make_router_model(router_system())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars/token) for budgeting when no usage metadata is available."""
+    return math.ceil(len(text) / 4)
+
+
+class RouterStats:
+    """Per-call token volume and latency of router LLM calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.input_tokens = 0
+            self.output_tokens = 0
+            self.latency_s = 0.0
+            self.last: Dict[str, Any] = {}
+
+    def record(self, prompt_text: str, resp, latency_s: float):
+        usage = getattr(resp, "usage_metadata", None)
+        in_tok = getattr(usage, "prompt_token_count", None)
+        out_tok = getattr(usage, "candidates_token_count", None)
+        if in_tok is None:
+            in_tok = estimate_tokens(router_system() + prompt_text)
+        if out_tok is None:
+            out_tok = estimate_tokens(_response_text(resp))
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += int(in_tok)
+            self.output_tokens += int(out_tok)
+            self.latency_s += latency_s
+            self.last = {"input_tokens": int(in_tok), "output_tokens": int(out_tok), "latency_ms": round(latency_s * 1000, 2)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.calls or 1
+            return {
+                "prompt_mode": ROUTER_PROMPT_MODE,
+                "canonical_version": CANONICAL_VERSION,
+                "calls": self.calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "avg_input_tokens": round(self.input_tokens / n, 1),
+                "avg_output_tokens": round(self.output_tokens / n, 1),
+                "avg_latency_ms": round(self.latency_s / n * 1000, 2),
+                "last_call": dict(self.last),
+            }
+
+
+router_stats = RouterStats()
+
+def _response_text(resp) -> str:
+    return getattr(resp, "text", "") or (
+        resp.candidates[0].content.parts[0].text
+        if getattr(resp, "candidates", None) and resp.candidates[0].content.parts else ""
+    )
+
+def _dumps(prompt_obj: dict, mode: str = ROUTER_PROMPT_MODE) -> str:
+    if mode == "lean":
+        return json.dumps(prompt_obj, separators=(",", ":"), ensure_ascii=False)
+    return json.dumps(prompt_obj)
+
 def _generate_json(prompt_obj: dict, max_retries: int = 4) -> Union[dict, None]:
     """
     Calls Gemini and returns parsed JSON. Retries on transient errors with backoff.
+    An unparseable reply is not retried here: it comes back as {"error", "raw_text"}
+    so the caller can salvage complete items and re-request only the rest.
     """
     delay = 2.0  # start with small delay; quota errors return suggested retry windows
     for attempt in range(1, max_retries + 1):
         try:
-            resp = gemini_model.generate_content(json.dumps(prompt_obj))
-            text = getattr(resp, "text", "") or (
-                resp.candidates[0].content.parts[0].text
-                if getattr(resp, "candidates", None) and resp.candidates[0].content.parts else ""
-            )
-            return json.loads(text)
+            prompt_text = _dumps(prompt_obj)
+            start = time.perf_counter()
+            resp = gemini_model.generate_content(prompt_text)
+            router_stats.record(prompt_text, resp, time.perf_counter() - start)
+            return _parse_json(_response_text(resp))
         except (ResourceExhausted, ServiceUnavailable, DeadlineExceeded) as e:
             # Backoff with jitter
             sleep_s = delay + random.uniform(0, 1.0)
@@ -67,15 +179,46 @@ def _generate_json(prompt_obj: dict, max_retries: int = 4) -> Union[dict, None]:
             if attempt == max_retries:
                 return {"error": f"{e.__class__.__name__}: {e}"}
         except Exception as e:
-            # JSON parse or other errors
+            # other errors
             if attempt == max_retries:
                 return {"error": f"JSON/Other error: {e}"}
             time.sleep(1.0 + random.uniform(0, 0.5))
     return {"error": "Unknown error after retries"}
 
-def gemini_route_and_relation_batch(user_texts: List[str], topk: int = 1, min_conf_allow: float = 0.0) -> Dict[str, Any]:
+async def _generate_json_async(prompt_obj: dict, max_retries: int = 4) -> Union[dict, None]:
+    """
+    Async twin of _generate_json: waits on Gemini without holding a worker thread.
+    """
+    delay = 2.0
+    for attempt in range(1, max_retries + 1):
+        try:
+            prompt_text = _dumps(prompt_obj)
+            start = time.perf_counter()
+            resp = await gemini_model.generate_content_async(prompt_text)
+            router_stats.record(prompt_text, resp, time.perf_counter() - start)
+            return _parse_json(_response_text(resp))
+        except (ResourceExhausted, ServiceUnavailable, DeadlineExceeded) as e:
+            await asyncio.sleep(delay + random.uniform(0, 1.0))
+            delay = min(delay * 2, 16.0)
+            if attempt == max_retries:
+                return {"error": f"{e.__class__.__name__}: {e}"}
+        except Exception as e:
+            if attempt == max_retries:
+                return {"error": f"JSON/Other error: {e}"}
+            await asyncio.sleep(1.0 + random.uniform(0, 0.5))
+    return {"error": "Unknown error after retries"}
+
+def _parse_json(text: str) -> dict:
+    try:
+        return _loads(text)
+    except ValueError as e:  # orjson.JSONDecodeError and json.JSONDecodeError are both ValueErrors
+        return {"error": f"JSON error: {e}", "raw_text": text}
+
+def _route_prompt(user_texts: List[str], topk: int, min_conf_allow: float, mode: str = ROUTER_PROMPT_MODE) -> dict:
+    if mode == "lean":
+        return {"t": user_texts, "min_conf": float(min_conf_allow), "k": int(topk)}
     canon_list = [{"id": c["id"], "text": c["text"]} for c in canonical_items]
-    prompt = {
+    return {
         "task": "route_and_relation_batch",
         "instructions": {
             "choose_one": True,
@@ -93,14 +236,109 @@ def gemini_route_and_relation_batch(user_texts: List[str], topk: int = 1, min_co
             }]
         }
     }
-    out = _generate_json(prompt)
+
+def _expand_lean_item(item: Any) -> Dict[str, Any]:
+    """[3, "Atr5", "c", 0.9, [["Atr6", 0.4]]] -> the legacy result dict (index kept as "i")."""
+    if not isinstance(item, list) or len(item) < 4:
+        return {"error": "Malformed router item", "raw": item}
+    alternates = item[4] if len(item) > 4 and isinstance(item[4], list) else []
+    return {
+        "i": item[0],
+        "target_id": item[1],
+        "relation": _RELATION_CODES.get(item[2], item[2]),
+        "confidence": item[3],
+        "alternates": [{"id": a[0], "confidence": a[1]} for a in alternates if isinstance(a, list) and len(a) == 2],
+    }
+
+def _salvage_lean_items(raw_text: str) -> List[Dict[str, Any]]:
+    """Pull the complete [i, id, rel, conf] items out of a truncated or otherwise broken lean reply."""
+    return [
+        {"i": int(i), "target_id": fid, "relation": _RELATION_CODES.get(rel, rel), "confidence": float(conf), "alternates": []}
+        for i, fid, rel, conf in _LEAN_ITEM_RE.findall(raw_text or "")
+    ]
+
+def _validate_item(item: Any) -> Union[str, None]:
+    """Reason the router item is unusable, or None if it is valid."""
+    if not isinstance(item, dict):
+        return "not an object"
+    if "error" in item:
+        return str(item["error"])
+    if item.get("target_id") not in _VALID_TARGETS:
+        return f"unknown target_id {item.get('target_id')!r}"
+    if item.get("relation") not in _VALID_RELATIONS:
+        return f"invalid relation {item.get('relation')!r}"
+    conf = item.get("confidence")
+    if isinstance(conf, bool) or not isinstance(conf, (int, float)) or not 0.0 <= conf <= 1.0:
+        return f"invalid confidence {conf!r}"
+    return None
+
+def _index_results(out: Dict[str, Any], n: int) -> Dict[int, Dict[str, Any]]:
+    """Map reply items to their input position (0..n-1). Lean items carry their index; legacy ones are positional."""
+    if isinstance(out.get("r"), list):
+        items = [_expand_lean_item(item) for item in out["r"]]
+    elif isinstance(out.get("results"), list):
+        items = [{"i": pos, **item} if isinstance(item, dict) else {"i": pos, "error": "not an object"}
+                 for pos, item in enumerate(out["results"])]
+    elif "raw_text" in out:
+        items = _salvage_lean_items(out["raw_text"])
+    else:
+        items = []
+    indexed: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        i = item.pop("i", None)
+        if isinstance(i, int) and 0 <= i < n and i not in indexed:
+            indexed[i] = item
+    return indexed
+
+def _merge_round(pending: List[int], out: Any, results: List[Dict[str, Any]]) -> List[int]:
+    """Fill results for the pending positions from one reply; return the positions still missing or invalid."""
     if not isinstance(out, dict):
-        return {"error": "Non-dict response from model"}
-    if "error" in out:
-        return out
-    if "results" not in out or not isinstance(out["results"], list):
-        return {"error": "Missing 'results' list in model output", "raw": out}
-    return out
+        out = {"error": "Non-dict response from model"}
+    indexed = _index_results(out, len(pending))
+    still_pending = []
+    for local_i, global_i in enumerate(pending):
+        item = indexed.get(local_i)
+        reason = _validate_item(item) if item is not None else (out.get("error") or "missing from reply")
+        if reason is None:
+            results[global_i] = item
+        else:
+            results[global_i] = {"error": f"Router item invalid: {reason}"}
+            still_pending.append(global_i)
+    return still_pending
+
+def _is_batch_failure(out: Any) -> bool:
+    # transport/quota failure with nothing to salvage
+    return isinstance(out, dict) and "error" in out and "raw_text" not in out
+
+def gemini_route_and_relation_batch(user_texts: List[str], topk: int = 1, min_conf_allow: float = 0.0) -> Dict[str, Any]:
+    """
+    Route a batch of texts. Results are index-aligned with user_texts; items missing from
+    the reply or failing validation are re-requested on their own (ROUTER_REPAIR_ROUNDS times)
+    and otherwise come back as {"error": ...} for that item only.
+    """
+    results: List[Dict[str, Any]] = [{}] * len(user_texts)
+    pending = list(range(len(user_texts)))
+    for round_no in range(1 + ROUTER_REPAIR_ROUNDS):
+        if not pending:
+            break
+        out = _generate_json(_route_prompt([user_texts[i] for i in pending], topk, min_conf_allow))
+        if round_no == 0 and _is_batch_failure(out):
+            return out
+        pending = _merge_round(pending, out, results)
+    return {"results": results}
+
+async def gemini_route_and_relation_batch_async(user_texts: List[str], topk: int = 1, min_conf_allow: float = 0.0) -> Dict[str, Any]:
+    """Async gemini_route_and_relation_batch."""
+    results: List[Dict[str, Any]] = [{}] * len(user_texts)
+    pending = list(range(len(user_texts)))
+    for round_no in range(1 + ROUTER_REPAIR_ROUNDS):
+        if not pending:
+            break
+        out = await _generate_json_async(_route_prompt([user_texts[i] for i in pending], topk, min_conf_allow))
+        if round_no == 0 and _is_batch_failure(out):
+            return out
+        pending = _merge_round(pending, out, results)
+    return {"results": results}
 
 # Optional: single-item helper using the batch path
 def gemini_route_and_relation(user_text: str, topk: int = 1, min_conf_allow: float = 0.0) -> Dict[str, Any]:
@@ -120,10 +358,6 @@ def call_gemini_recommend(prompt: str) -> str:
     try:
         model = genai.GenerativeModel(model_name=GEMINI_MODEL_NAME)
         resp = model.generate_content(prompt)
-        text = getattr(resp, "text", "") or (
-            resp.candidates[0].content.parts[0].text
-            if getattr(resp, "candidates", None) and resp.candidates[0].content.parts else ""
-        )
-        return text.strip()
+        return _response_text(resp).strip()
     except Exception as e:
         return f"[LLM error: {e}]"
\ No newline at end of file
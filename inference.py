@@ -1,17 +1,48 @@
 # inference.py
+import json
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Callable
+import xgboost as xgb
 from xgboost import XGBClassifier
 from canonical import FEATURES, ID2TEXT
-from gemini_router import gemini_route_and_relation_batch
-from config import MODEL_PATH
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from gemini_router import gemini_route_and_relation_batch, gemini_route_and_relation_batch_async, estimate_tokens
+from config import MODEL_PATH, ROUTER_BATCH_SIZE, ROUTER_CHUNK_TOKENS, ROUTER_MAX_CONCURRENCY
+
+ROUTER_MIN_CONF = 0.70
+# per-item overhead on top of the text itself: JSON quoting in the prompt + one lean result entry
+_ITEM_OVERHEAD_TOKENS = 12
 
 def load_xgb_model() -> XGBClassifier:
     model = XGBClassifier()
     model.load_model(MODEL_PATH)  # native json
     return model
 
+def load_compact_model(path: str) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Scorer for a model written by model_compact.py: (N, 54) float matrix (NaN =
+    unanswered) -> P(divorce). Either an XGBoost model (pruned / distilled) or a
+    {"kind": "linear"} json of coefficients.
+    """
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    if spec.get("kind") == "linear":
+        coef = np.asarray(spec["coef"], dtype=np.float32)
+        fill = np.asarray(spec["fill"], dtype=np.float32)
+        intercept = float(spec["intercept"])
+
+        def score(X: np.ndarray) -> np.ndarray:
+            X = np.asarray(X, dtype=np.float32)
+            z = np.where(np.isnan(X), fill, X) @ coef + intercept
+            return 1.0 / (1.0 + np.exp(-z))
+        return score
+
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return lambda X: booster.inplace_predict(np.asarray(X, dtype=np.float32), missing=np.nan)
+
 def _normalize_one_from_llm_route(route_obj: Dict[str, Any], user_val_0to4: int, nli_thr: float = 0.65) -> Tuple[Any, Any, Dict[str, Any]]:
     """
     Takes one route result item: {target_id, relation, confidence, alternates}
@@ -26,6 +57,9 @@ def _normalize_one_from_llm_route(route_obj: Dict[str, Any], user_val_0to4: int,
 
     if not fid:
         return None, None, {"status": "router_missing_target", "raw": route_obj}
+    if fid not in ID2TEXT:
+        # "no_match" (nothing above threshold) or an id outside the bank
+        return None, None, {"status": "no_match" if fid == "no_match" else "router_unknown_target", "raw": route_obj}
 
     v = float(np.clip(user_val_0to4, 0, 4))
     flip = (relation == "contradicts" and conf >= nli_thr)
@@ -41,32 +75,71 @@ def _normalize_one_from_llm_route(route_obj: Dict[str, Any], user_val_0to4: int,
     }
     return fid, norm_v, meta
 
-def predict_from_free_text_LLM(qas: List[Dict[str, Any]], xgb_model: XGBClassifier, nli_thr: float = 0.65, dedup: str = "best", decision_thr: float = 0.5):
+def _align_batch(chunk: List[str], out: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if "error" in out:
+        return [{"error": out["error"]} for _ in chunk]
+    results = out.get("results", [])[:len(chunk)]
+    return results + [{"error": "Missing result for item"} for _ in range(len(chunk) - len(results))]
+
+def _chunks(texts: List[str], batch_size: int, token_budget: int = ROUTER_CHUNK_TOKENS) -> List[List[str]]:
     """
-    qas = [{"text": "...", "value": 0..4}, ...]
-    Batch-calls Gemini to avoid rate-limit bursts.
-    Returns: proba, pred, filled_vector(Series), audit_log(DataFrame)
+    Split texts into in-order chunks of at most batch_size items whose estimated
+    tokens stay within token_budget (a single oversized text gets its own chunk).
+    """
+    chunks: List[List[str]] = []
+    cur: List[str] = []
+    cur_tokens = 0
+    for t in texts:
+        tokens = estimate_tokens(t) + _ITEM_OVERHEAD_TOKENS
+        if cur and (len(cur) >= max(1, batch_size) or cur_tokens + tokens > token_budget):
+            chunks.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(t)
+        cur_tokens += tokens
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+def _route_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+    return _align_batch(chunk, gemini_route_and_relation_batch(chunk, topk=1, min_conf_allow=ROUTER_MIN_CONF))
+
+def route_texts(texts: List[str], batch_size: int = ROUTER_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """
+    Routes many free-text items: token-budgeted chunks, dispatched concurrently
+    (at most ROUTER_MAX_CONCURRENCY in flight) and merged back in input order.
+    Returns one route object per input text (index-aligned); items from a failed
+    batch come back as {"error": ...} so callers can audit them individually.
+    """
+    chunks = _chunks(texts, batch_size)
+    if len(chunks) <= 1:
+        return _route_chunk(chunks[0]) if chunks else []
+    with ThreadPoolExecutor(max_workers=min(ROUTER_MAX_CONCURRENCY, len(chunks))) as pool:
+        per_chunk = list(pool.map(_route_chunk, chunks))
+    return [route for routes in per_chunk for route in routes]
+
+async def route_texts_async(texts: List[str], batch_size: int = ROUTER_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Async route_texts; same chunking, bounded by a semaphore instead of a thread pool."""
+    chunks = _chunks(texts, batch_size)
+    limit = asyncio.Semaphore(ROUTER_MAX_CONCURRENCY)
+
+    async def _one(chunk: List[str]) -> List[Dict[str, Any]]:
+        async with limit:
+            out = await gemini_route_and_relation_batch_async(chunk, topk=1, min_conf_allow=ROUTER_MIN_CONF)
+        return _align_batch(chunk, out)
+
+    per_chunk = await asyncio.gather(*(_one(chunk) for chunk in chunks))
+    return [route for routes in per_chunk for route in routes]
+
+def vector_from_routes(qas: List[Dict[str, Any]], routes: List[Dict[str, Any]], nli_thr: float = 0.65, dedup: str = "best") -> Tuple[pd.Series, List[Dict[str, Any]]]:
+    """
+    Normalizes routed answers into a 54-feature vector.
+    qas and routes are index-aligned. Returns: filled_vector(Series), audit_logs(list)
     """
-    # 1) Batch route all user texts
-    texts = [qa.get("text", "") for qa in qas]
-    routes = gemini_route_and_relation_batch(texts, topk=1, min_conf_allow=0.70)
     logs = []
     x = pd.Series(np.nan, index=FEATURES, dtype=float)
     taken: Dict[str, Tuple[float, float]] = {}
 
-    if "error" in routes:
-        # If the whole batch fails, record and return early with NaNs
-        for qa in qas:
-            logs.append({"user_text": qa.get("text", ""), "raw_value": qa.get("value", np.nan),
-                        "status": "router_error", "error": routes["error"]})
-        X_row = pd.DataFrame([x.values], columns=FEATURES)
-        proba = float(xgb_model.predict_proba(X_row)[0, 1])
-        pred = int(proba >= decision_thr)
-        return proba, pred, x, pd.DataFrame(logs)
-
-    results = routes.get("results", [])
-    # 2) Normalize each mapped item
-    for qa, route in zip(qas, results):
+    for qa, route in zip(qas, routes):
         fid, v, meta = _normalize_one_from_llm_route(route, qa.get("value", np.nan), nli_thr=nli_thr)
         if fid is None:
             logs.append({"user_text": qa.get("text", ""), "raw_value": qa.get("value", np.nan), **meta})
@@ -86,6 +159,21 @@ def predict_from_free_text_LLM(qas: List[Dict[str, Any]], xgb_model: XGBClassifi
             "user_text": qa.get("text", ""), "raw_value": qa.get("value", np.nan),
             "normalized_value": v, **meta
         })
+    return x, logs
+
+def predict_from_free_text_LLM(qas: List[Dict[str, Any]], xgb_model: XGBClassifier, nli_thr: float = 0.65, dedup: str = "best", decision_thr: float = 0.5):
+    """
+    qas = [{"text": "...", "value": 0..4}, ...]
+    Batch-calls Gemini (token-budgeted chunks) to avoid rate-limit bursts and oversized prompts.
+    Items whose routing failed are logged as router_error and left NaN.
+    Returns: proba, pred, filled_vector(Series), audit_log(DataFrame)
+    """
+    # 1) Batch route all user texts
+    texts = [qa.get("text", "") for qa in qas]
+    routes = route_texts(texts)
+
+    # 2) Normalize each mapped item
+    x, logs = vector_from_routes(qas, routes, nli_thr=nli_thr, dedup=dedup)
 
     # 3) Predict (XGBoost)
     X_row = pd.DataFrame([x.values], columns=FEATURES)
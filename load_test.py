@@ -0,0 +1,99 @@
+# load_test.py
+"""
+Concurrent HTTP load test for the API.
+
+Point it at one server, or at two (e.g. the async service and a checkout of the
+previous sync implementation) to compare throughput and latency side by side:
+
+    python load_test.py --base http://127.0.0.1:8000 --compare http://127.0.0.1:8001 \
+        --path /doctors/1/dashboard --path /couples/1/history -c 64 -n 2000
+
+or replay a recorded request mix (see seed_data.py trace):
+
+    python load_test.py --trace traces/mixed.jsonl -c 64
+"""
+import json
+import time
+import argparse
+import statistics
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+
+
+def _one_request(base: str, method: str, path: str, body: Any, timeout: float) -> Tuple[float, int]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(base.rstrip("/") + path, data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+def run_load(base: str, calls: List[Dict[str, Any]], concurrency: int, timeout: float = 60.0) -> Dict[str, Any]:
+    """Fire calls ({"method", "path", "body"}) with bounded concurrency; return a summary."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda c: _one_request(base, c.get("method", "GET"), c["path"], c.get("body"), timeout), calls
+        ))
+    wall = time.perf_counter() - start
+
+    lat = sorted(r[0] for r in results)
+    errors = sum(1 for _, status in results if status == 0 or status >= 500)
+    return {
+        "base": base,
+        "requests": len(results),
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "rps": round(len(results) / wall, 1) if wall > 0 else 0.0,
+        "p50_ms": round(_percentile(lat, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(lat, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(lat, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(lat) * 1000, 2) if lat else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", default="http://127.0.0.1:8000", help="API base URL")
+    parser.add_argument("--compare", default=None, help="Second API base URL to run the same load against")
+    parser.add_argument("--path", action="append", default=[], help="GET path to hit (repeatable, round-robin)")
+    parser.add_argument("--post", action="append", default=[], help="POST path to hit with an empty body (repeatable)")
+    parser.add_argument("--trace", default=None, help="JSONL of {method, path, body} calls to replay in order (overrides --path/--post)")
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace, encoding="utf-8") as f:
+            calls = [json.loads(line) for line in f if line.strip()]
+    else:
+        targets = [{"method": "GET", "path": p} for p in args.path] + [{"method": "POST", "path": p} for p in args.post]
+        if not targets:
+            targets = [{"method": "GET", "path": "/"}]
+        calls = [targets[i % len(targets)] for i in range(args.requests)]
+
+    for base in [args.base] + ([args.compare] if args.compare else []):
+        print(json.dumps(run_load(base, calls, args.concurrency, timeout=args.timeout)))
+
+
+if __name__ == "__main__":
+    main()
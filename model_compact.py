@@ -0,0 +1,161 @@
+# model_compact.py
+"""
+Compact scoring models derived from the full XGBoost model (MODEL_PATH).
+
+Variants, all evaluated on the model_train.py hold-out split, both complete and
+with answers randomly blanked (the API scores partial vectors):
+  - pruned:    the first N trees of the full model, N the smallest count whose
+               validation log loss is within --tol of the best prefix
+  - distilled: a small tree ensemble (reg:logistic) fit to the full model's
+               probabilities on augmented (masked / jittered) training rows
+  - linear:    ridge regression on the full model's log-odds (missing answers
+               imputed with the training mean), served as a sigmoid
+
+Prints accuracy / log loss / agreement with the full model / latency / size for
+each, and writes the chosen one to COMPACT_MODEL_PATH. Serve it on the hot path
+with SCORING_MODEL=compact; explanations then come from the compact model too.
+
+    python model_compact.py --write distilled
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, log_loss
+from canonical import FEATURES
+from config import DATA_PATH, COMPACT_MODEL_PATH, SEED
+from inference import load_xgb_model, load_compact_model
+
+VARIANTS = ("pruned", "distilled", "linear")
+
+
+def _mask(X: np.ndarray, rng: np.random.Generator, copies: int, max_rate: float) -> np.ndarray:
+    """copies of X with a random share (0..max_rate per row) of answers set to NaN."""
+    reps = np.repeat(X, copies, axis=0).astype(float)
+    rates = rng.uniform(0, max_rate, size=(len(reps), 1))
+    return np.where(rng.random(reps.shape) < rates, np.nan, reps)
+
+
+def _augment(X: np.ndarray, rng: np.random.Generator, copies: int = 40) -> np.ndarray:
+    """Training rows plus masked and +-1 jittered copies, to cover the inputs the API actually sees."""
+    jittered = np.clip(np.repeat(X, copies, axis=0) + rng.choice([-1, 0, 0, 0, 1], size=(len(X) * copies, X.shape[1])), 0, 4)
+    return np.vstack([X, _mask(X, rng, copies, 0.5), _mask(jittered, rng, 1, 0.5)])
+
+
+def prune(booster: xgb.Booster, X_val: np.ndarray, y_val: np.ndarray, tol: float) -> xgb.Booster:
+    n_trees = booster.num_boosted_rounds()
+    losses = np.array([
+        log_loss(y_val, booster.inplace_predict(X_val, iteration_range=(0, n), missing=np.nan), labels=[0, 1])
+        for n in range(1, n_trees + 1)
+    ])
+    keep = int(np.argmax(losses <= losses.min() + tol)) + 1
+    return booster[:keep]
+
+
+def distill(teacher: xgb.Booster, X_aug: np.ndarray, n_trees: int, depth: int) -> xgb.Booster:
+    soft = teacher.inplace_predict(X_aug, missing=np.nan)
+    student = xgb.XGBRegressor(
+        n_estimators=n_trees, max_depth=depth, learning_rate=0.3,
+        objective="reg:logistic", tree_method="hist", random_state=SEED, n_jobs=-1,
+    )
+    student.fit(X_aug, soft)
+    return student.get_booster()
+
+
+def fit_linear(teacher: xgb.Booster, X_aug: np.ndarray, l2: float = 1.0) -> dict:
+    p = np.clip(teacher.inplace_predict(X_aug, missing=np.nan), 1e-6, 1 - 1e-6)
+    z = np.log(p / (1 - p))
+    fill = np.nanmean(X_aug, axis=0)
+    A = np.hstack([np.where(np.isnan(X_aug), fill, X_aug), np.ones((len(X_aug), 1))])
+    reg = l2 * np.eye(A.shape[1])
+    reg[-1, -1] = 0.0  # no penalty on the intercept
+    w = np.linalg.solve(A.T @ A + reg, A.T @ z)
+    return {"kind": "linear", "features": FEATURES, "coef": w[:-1].tolist(), "intercept": float(w[-1]), "fill": fill.tolist()}
+
+
+def _save(variant: str, model, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if variant == "linear":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(model, f)
+    else:
+        model.save_model(path)
+
+
+def _latency_us(score, X: np.ndarray, repeat: int) -> float:
+    score(X)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        score(X)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--write", choices=VARIANTS, default="pruned", help="Variant saved to COMPACT_MODEL_PATH")
+    parser.add_argument("--out", default=COMPACT_MODEL_PATH)
+    parser.add_argument("--tol", type=float, default=0.005, help="Pruning: allowed validation log-loss increase")
+    parser.add_argument("--student-trees", type=int, default=30)
+    parser.add_argument("--student-depth", type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATA_PATH)
+    X = df[FEATURES].to_numpy(dtype=float)
+    y = df["Class"].astype(int).values
+    # same split as model_train.py
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=SEED, stratify=y)
+    rng = np.random.default_rng(SEED)
+    X_val = np.vstack([X_test, _mask(X_test, rng, 10, 0.5)])
+    y_val = np.concatenate([y_test, np.repeat(y_test, 10)])
+
+    teacher = load_xgb_model().get_booster()
+    X_aug = _augment(X_train, rng)
+    models = {
+        "full": teacher,
+        "pruned": prune(teacher, X_val, y_val, args.tol),
+        "distilled": distill(teacher, X_aug, args.student_trees, args.student_depth),
+        "linear": fit_linear(teacher, X_aug),
+    }
+
+    full_val = teacher.inplace_predict(X_val, missing=np.nan)
+    batch = np.tile(X_val, (max(1, 1000 // len(X_val)) + 1, 1))[:1000]
+    report = []
+    for name, model in models.items():
+        # candidates keep the .json suffix: xgboost picks its save format from the extension
+        path = f"{os.path.splitext(args.out)[0]}.{name}.tmp.json" if name != "full" else None
+        if path:
+            _save(name, model, path)
+            score = load_compact_model(path)
+            size = os.path.getsize(path)
+        else:
+            score = lambda X, b=teacher: b.inplace_predict(np.asarray(X, dtype=np.float32), missing=np.nan)
+            size = len(teacher.save_raw("json"))
+        proba = score(X_val)
+        report.append({
+            "model": name,
+            "trees": model.num_boosted_rounds() if isinstance(model, xgb.Booster) else 0,
+            "acc": round(accuracy_score(y_val, proba >= 0.5), 4),
+            "acc_complete": round(accuracy_score(y_test, score(X_test) >= 0.5), 4),
+            "logloss": round(log_loss(y_val, np.clip(proba, 1e-6, 1 - 1e-6), labels=[0, 1]), 4),
+            "agree_full": round(float(np.mean((proba >= 0.5) == (full_val >= 0.5))), 4),
+            "max_abs_diff": round(float(np.max(np.abs(proba - full_val))), 4),
+            "us_1_row": round(_latency_us(score, X_val[:1], 500), 1),
+            "us_1000_rows": round(_latency_us(score, batch, 50), 1),
+            "kb": round(size / 1024, 1),
+        })
+        if path:
+            if name == args.write:
+                os.replace(path, args.out)
+            else:
+                os.remove(path)
+
+    print(pd.DataFrame(report).to_string(index=False))
+    print(f"Saved {args.write} model → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
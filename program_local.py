@@ -0,0 +1,108 @@
+# program_local.py
+"""
+Deterministic local 4-week program (PROGRAM_BACKEND=local, and the fallback /
+instant placeholder for the Gemini program).
+
+Schedules the rule-based modules from build_modules() over four weeks by domain
+risk (highest first; a domain gets more weeks when fewer domains are at risk,
+each visit taking the next tasks of its module) and renders the Markdown table
+the Gemini prompt asks for: Week | Domain Focus | Exercises / Tasks. Couples
+with no module (all domains low risk) get a maintenance program built from
+their highest-risk domains. Same input -> same text, in microseconds:
+
+    python program_local.py
+"""
+import time
+from typing import Any, Dict, List
+
+WEEKS = 4
+TASKS_PER_WEEK = 2
+
+# Used when no domain is at risk, and to top up a week whose module has a single task
+MAINTENANCE_TASKS = {
+    "communication": ["Weekly 30-min 'state of us' check-in", "Daily 10-min stress-reducing conversation"],
+    "affection": ["Six-second greeting and goodbye ritual", "Share one appreciation every evening"],
+    "values": ["Talk about one shared goal this week", "Plan one activity that reflects your shared values"],
+    "love_maps": ["Ask each other three open-ended questions", "Update each other on current worries and hopes"],
+    "criticism": ["Turn one complaint into a gentle request", "Notice and name one thing your partner does well"],
+    "volatility": ["Agree on a calm-down signal", "Review one disagreement together once both are calm"],
+    "stonewalling": ["Name it when you feel flooded and agree when to resume", "Practice 5 minutes of slow breathing together"],
+    "defensiveness": ["Take responsibility for one small thing each day", "Listen fully before answering a complaint"],
+}
+
+
+def _title(domain: str) -> str:
+    return domain.replace("_", " ").title()
+
+
+def _focus_order(domains: Dict[str, Dict[str, Any]], modules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Modules (or maintenance blocks when there are none) sorted by domain risk, highest first; ties by name."""
+    risk = lambda d: -float(domains.get(d, {}).get("risk", 0.0))
+    if modules:
+        return sorted(({"domain": m["domain"], "tasks": list(m["tasks"])} for m in modules), key=lambda m: (risk(m["domain"]), m["domain"]))
+    top = sorted(domains, key=lambda d: (risk(d), d))[:2] or sorted(MAINTENANCE_TASKS)[:2]
+    return [{"domain": d, "tasks": MAINTENANCE_TASKS.get(d, MAINTENANCE_TASKS["communication"])} for d in top]
+
+
+def schedule(domains: Dict[str, Dict[str, Any]], modules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    [{week, domains: [primary, secondary...], tasks}] for four weeks. Week k's primary domain is
+    focus[k % n], so with fewer than four at-risk domains the riskiest ones recur; with more than four,
+    the remaining domains ride along as a secondary focus (one task each) from week 1 on.
+    """
+    focus = _focus_order(domains, modules)
+    n = len(focus)
+    visits = {m["domain"]: 0 for m in focus}
+    weeks = [{"week": k + 1, "domains": [], "tasks": []} for k in range(WEEKS)]
+
+    def take(block: Dict[str, Any], count: int) -> List[str]:
+        tasks = block["tasks"]
+        start = visits[block["domain"]] * count
+        visits[block["domain"]] += 1
+        picked = [tasks[(start + i) % len(tasks)] for i in range(min(count, len(tasks)))]
+        extra = [t for t in MAINTENANCE_TASKS.get(block["domain"], []) if t not in picked]
+        return picked + extra[:count - len(picked)]
+
+    for k, week in enumerate(weeks):
+        primary = focus[k % n]
+        week["domains"].append(primary["domain"])
+        week["tasks"].extend(take(primary, TASKS_PER_WEEK))
+    for j, block in enumerate(focus[WEEKS:]):
+        week = weeks[j % WEEKS]
+        week["domains"].append(block["domain"])
+        week["tasks"].extend(take(block, 1))
+    return weeks
+
+
+def _focus_label(domain: str, domains: Dict[str, Dict[str, Any]]) -> str:
+    info = domains.get(domain)
+    return f"{_title(domain)} ({info['band']}, risk {info['risk']})" if info else _title(domain)
+
+
+def render_program(domains: Dict[str, Dict[str, Any]], modules: List[Dict[str, Any]]) -> str:
+    """The 4-week program as Markdown (heading, table, one closing note)."""
+    lines = [
+        "### 4-Week Improvement Program",
+        "",
+        "| Week | Domain Focus | Exercises / Tasks |",
+        "|------|--------------|-------------------|",
+    ]
+    for week in schedule(domains, modules):
+        focus = " + ".join(_focus_label(d, domains) for d in week["domains"])
+        tasks = "<br>".join(f"• {t}" for t in week["tasks"])
+        lines.append(f"| Week {week['week']} | {focus} | {tasks} |")
+    lines += ["", "_Domains are ordered by risk (highest first); repeat what worked in earlier weeks as you go._"]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from app.services.recommendation import calculate_domain_risks, build_modules
+    vector = {f"Atr{i}": (4 if i > 30 else 1) for i in range(1, 55)}
+    domains = calculate_domain_risks(vector)
+    modules = build_modules(domains)
+    print(render_program(domains, modules))
+    n = 10000
+    start = time.perf_counter()
+    for _ in range(n):
+        render_program(domains, modules)
+    print(f"\n{(time.perf_counter() - start) / n * 1e6:.1f} µs per program")
@@ -1,26 +1,26 @@
 # recommend_program.py
 import google.generativeai as genai
-from config import GEMINI_API_KEY, GEMINI_MODEL_NAME
+from config import GEMINI_API_KEY, GEMINI_MODEL_NAME, PROGRAM_BACKEND
 import os, json
 
-# Ensure API key exists
-if not GEMINI_API_KEY:
+# Ensure API key exists (PROGRAM_BACKEND=local never calls Gemini)
+if not GEMINI_API_KEY and PROGRAM_BACKEND != "local":
     raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) not set. Put it in .env.")
 
 genai.configure(api_key=GEMINI_API_KEY)
 
 
-def call_gemini_recommend(domains: dict, modules: dict):
+def _recommend_prompt(domains: dict, modules: dict) -> str:
     """
-    Send risks + modules to Gemini and get structured program in markdown table.
-    
+    Build the program-generation prompt from risks + modules.
+
     Args:
         domains (dict): {"communication": 0.7, "affection": 0.2, ...}
                        (0 = no risk, 1 = highest risk)
         modules (dict): {"communication": ["active listening", "weekly check-in"], ...}
 
     Returns:
-        str: A structured 4-week program in Markdown table format.
+        str: The prompt text.
     """
 
     # Explain the meaning of the values for LLM clarity
@@ -58,8 +58,25 @@ def call_gemini_recommend(domains: dict, modules: dict):
     - Balance emotional connection, communication, and conflict resolution.
     """
 
+    return prompt
+
+
+def call_gemini_recommend(domains: dict, modules: dict):
+    """
+    Send risks + modules to Gemini and get structured program in markdown table.
+
+    Returns:
+        str: A structured 4-week program in Markdown table format.
+    """
+    model = genai.GenerativeModel(model_name=GEMINI_MODEL_NAME)
+    response = model.generate_content(_recommend_prompt(domains, modules))
+    return response.text.strip()
+
+
+async def call_gemini_recommend_async(domains: dict, modules: dict):
+    """Async call_gemini_recommend; the request thread is free while Gemini generates."""
     model = genai.GenerativeModel(model_name=GEMINI_MODEL_NAME)
-    response = model.generate_content(prompt)
+    response = await model.generate_content_async(_recommend_prompt(domains, modules))
     return response.text.strip()
 
 
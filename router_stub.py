@@ -0,0 +1,126 @@
+# router_stub.py
+"""
+Deterministic local stand-in for the Gemini router (ROUTER_BACKEND=stub).
+
+Routes each user text to the canonical item with the highest word overlap and
+answers in whichever output format the prompt asks for (lean or legacy), with
+estimated token usage. ROUTER_STUB_FAULTS (0..1) drops or corrupts that share of
+items per call, to exercise the router's per-item repair. ROUTER_STUB_LATENCY_MS
+adds a provider round trip to every call (blocking in generate_content, awaited in
+generate_content_async), for load tests. Useful for offline runs and for comparing
+prompt modes:
+
+    ROUTER_BACKEND=stub python router_stub.py
+"""
+import os
+import json
+import re
+import math
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+from typing import List, Tuple
+from canonical import canonical_items
+
+_WORD = re.compile(r"[a-z']+")
+_STOP = {"i", "my", "we", "our", "the", "a", "an", "to", "of", "and", "is", "are", "with", "when", "in",
+         "for", "it", "that", "be", "can", "her", "she", "wife", "us", "me", "about", "what", "how", "each", "other"}
+_NEGATIONS = {"not", "no", "never", "don't", "doesn't", "can't", "cannot", "rarely", "hardly", "nothing", "wouldn't"}
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+_CANON = [(c["id"], set(_tokens(c["text"])) - _STOP, bool(set(_tokens(c["text"])) & _NEGATIONS)) for c in canonical_items]
+
+
+def stub_route(text: str, topk: int = 1) -> Tuple[str, str, float, List[Tuple[str, float]]]:
+    """(target_id, relation code, confidence, alternates) by word overlap; negation mismatch -> contradicts."""
+    words = _tokens(text)
+    content = set(words) - _STOP
+    negated = bool(set(words) & _NEGATIONS)
+    scored = []
+    for cid, cwords, cneg in _CANON:
+        overlap = len(content & cwords) / math.sqrt(max(1, len(content)) * max(1, len(cwords)))
+        scored.append((round(min(1.0, 0.5 + overlap), 3), cid, cneg))
+    scored.sort(key=lambda t: (-t[0], t[1]))
+    conf, cid, cneg = scored[0]
+    if conf <= 0.5:
+        return "no_match", "n", 0.0, []
+    relation = "c" if negated != cneg else "e"
+    alternates = [(alt_id, alt_conf) for alt_conf, alt_id, _ in scored[1:max(1, topk)]]
+    return cid, relation, conf, alternates
+
+
+def _estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+class StubRouterModel:
+    """Mimics genai.GenerativeModel.generate_content(_async) for router prompts."""
+
+    def __init__(self, system_instruction: str = "", faults: float = None, seed: int = 0, latency_ms: float = None):
+        self.system_instruction = system_instruction
+        self.faults = float(os.getenv("ROUTER_STUB_FAULTS", "0")) if faults is None else faults
+        self.latency = (float(os.getenv("ROUTER_STUB_LATENCY_MS", "0")) if latency_ms is None else latency_ms) / 1000.0
+        self._rng = random.Random(seed)
+
+    def generate_content(self, prompt_text: str):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(prompt_text)
+
+    def _reply(self, prompt_text: str):
+        prompt = json.loads(prompt_text)
+        lean = "t" in prompt
+        texts = prompt["t"] if lean else prompt["user_texts"]
+        topk = int(prompt.get("k", prompt.get("instructions", {}).get("return_topk", 1)))
+        routed = [stub_route(t, topk) for t in texts]
+        if lean:
+            items = []
+            for i, (cid, rel, conf, alts) in enumerate(routed):
+                if self.faults and self._rng.random() < self.faults:
+                    if self._rng.random() < 0.5:
+                        continue  # dropped
+                    cid = "Atr999"  # corrupted
+                items.append([i, cid, rel, conf] + ([[list(a) for a in alts]] if topk > 1 else []))
+            text = json.dumps({"r": items}, separators=(",", ":"))
+        else:
+            names = {"e": "entails", "c": "contradicts", "n": "neutral"}
+            out = {"results": [{"target_id": cid, "relation": names[rel], "confidence": conf,
+                                "alternates": [{"id": a, "confidence": c} for a, c in alts]}
+                               for cid, rel, conf, alts in routed]}
+            text = json.dumps(out, indent=2)
+        usage = SimpleNamespace(prompt_token_count=_estimate_tokens(self.system_instruction + prompt_text),
+                                candidates_token_count=_estimate_tokens(text))
+        return SimpleNamespace(text=text, usage_metadata=usage, candidates=None)
+
+    async def generate_content_async(self, prompt_text: str):
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt_text)
+
+
+def main():
+    """Compare legacy vs lean prompts on the demo answers: token volume and routing agreement."""
+    import gemini_router as gr
+    from run_demo import DEFAULT_QAS
+
+    texts = [qa["text"] for qa in DEFAULT_QAS]
+    report = {}
+    results = {}
+    for mode in ("legacy", "lean"):
+        model = StubRouterModel(system_instruction=gr.router_system(mode))
+        resp = model.generate_content(gr._dumps(gr._route_prompt(texts, 1, 0.70, mode=mode), mode=mode))
+        indexed = gr._index_results(json.loads(resp.text), len(texts))
+        results[mode] = [(indexed[i]["target_id"], indexed[i]["relation"]) for i in range(len(texts))]
+        report[mode] = {"input_tokens": resp.usage_metadata.prompt_token_count,
+                        "system_tokens": _estimate_tokens(model.system_instruction),
+                        "output_tokens": resp.usage_metadata.candidates_token_count}
+    report["same_routing"] = results["legacy"] == results["lean"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# scoring_bench.py
+"""
+Throughput / latency of hot-path scoring: in-process (every API worker scores
+with its own model copy) vs the shared dynamic-batching scoring service
+(app/services/scoring.py).
+
+--workers processes stand in for API workers; each runs --threads concurrent
+callers that score --rows vector(s) per call, --calls calls per thread. Starts
+its own scoring service unless --address points at a running one.
+
+    python scoring_bench.py --workers 4 --threads 8 --calls 500
+    python scoring_bench.py --address unix:/tmp/divorce-scoring.sock --service-workers 2 --max-wait-ms 1
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+import numpy as np
+from canonical import FEATURES
+from app.services.scoring import ScoringClient, load_scorer, parse_address
+
+
+def _vectors(n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 5, size=(n, len(FEATURES))).astype(np.float32)
+    X[rng.random(X.shape) < 0.1] = np.nan  # some unanswered items
+    return X
+
+
+def _worker(mode: str, address: str, threads: int, calls: int, rows: int, seed: int, ready, out):
+    scorer = load_scorer() if mode == "in-process" else ScoringClient(address, fallback=load_scorer)
+    X = _vectors(threads * calls * rows, seed)
+    scorer(X[:rows])  # warm up (model load / connect)
+    ready.wait()  # every worker starts the timed section together
+    t0 = time.time()
+
+    def caller(t: int) -> List[float]:
+        lat = []
+        for c in range(calls):
+            start = (t * calls + c) * rows
+            begin = time.perf_counter()
+            scorer(X[start:start + rows])
+            lat.append(time.perf_counter() - begin)
+        return lat
+
+    with ThreadPoolExecutor(threads) as pool:
+        lat = [x for part in pool.map(caller, range(threads)) for x in part]
+    out.put({"lat": lat, "t0": t0, "t1": time.time(), "fallbacks": getattr(scorer, "fallbacks", 0)})
+
+
+def run(mode: str, address: str, workers: int, threads: int, calls: int, rows: int) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    ready = ctx.Barrier(workers)
+    procs = [ctx.Process(target=_worker, args=(mode, address, threads, calls, rows, i, ready, out)) for i in range(workers)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    elapsed = max(r["t1"] for r in results) - min(r["t0"] for r in results)
+    for p in procs:
+        p.join()
+    lat = np.array([x for r in results for x in r["lat"]]) * 1000
+    return {
+        "mode": mode,
+        "api_workers": workers,
+        "threads_per_worker": threads,
+        "rows_per_call": rows,
+        "calls": len(lat),
+        "vectors_per_s": round(len(lat) * rows / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+        "fallbacks": sum(r["fallbacks"] for r in results),
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def _wait_for(address: str, timeout: float = 60.0):
+    family, addr = parse_address(address)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as s:
+                s.connect(addr)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"scoring service did not come up on {address}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", default=None, help="Running scoring service (default: start one on a temp unix socket)")
+    parser.add_argument("--workers", type=int, default=4, help="Simulated API worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent callers per worker")
+    parser.add_argument("--calls", type=int, default=500, help="Calls per caller")
+    parser.add_argument("--rows", type=int, default=1, help="Vectors per call")
+    parser.add_argument("--service-workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    service = None
+    address = args.address
+    if address is None:
+        address = f"unix:/tmp/divorce-scoring-bench-{os.getpid()}.sock"
+        service = subprocess.Popen([
+            sys.executable, "-m", "app.services.scoring", "--address", address, "--workers", str(args.service_workers),
+            "--batch-size", str(args.batch_size), "--max-wait-ms", str(args.max_wait_ms),
+        ])
+    try:
+        _wait_for(address)
+        for mode in ("in-process", "service"):
+            print(json.dumps(run(mode, address, args.workers, args.threads, args.calls, args.rows)))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
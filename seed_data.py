@@ -0,0 +1,238 @@
+# seed_data.py
+"""
+Synthetic production-scale data and replayable request traces, deterministic from SEED.
+
+Couples are sampled from the joint distribution of data/divorce_atr.csv (a real
+row is drawn, then each partner's answers are jittered and partially skipped),
+answer texts are template paraphrases of the canonical items, and every row is
+bulk-inserted with Core executemany (explicit ids, no ORM objects). Each seeded
+assessment gets a Prediction scored with the real model on the fused vector.
+
+    python seed_data.py seed --doctors 200 --couples-per-doctor 100 --assessments-per-couple 3
+    python seed_data.py trace --out traces/mixed.jsonl -n 100000
+    python load_test.py --trace traces/mixed.jsonl -c 64
+"""
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, select
+from canonical import FEATURES, ID2TEXT
+from config import DATA_PATH, SEED, FUSION_STRATEGY
+from app.db import engine
+from app.migrate import upgrade
+from app.models import Doctor, Couple, Assessment, Answer, Prediction, RiskPoint
+from app.services.explain import stored_vector
+from app.services.fusion import fuse_partners, fusion_summary
+from app.services.predictor import score_matrix
+from app.services.timeline import domain_points
+
+# Paraphrase templates; {T} is the canonical text, {t} the same with its first letter lower-cased (except "I")
+TEMPLATES = [
+    "{T}",
+    "Honestly, {t}",
+    "I'd say that {t}",
+    "Most of the time, {t}",
+    "{T} That's how it is for us.",
+    "If I'm being fair, {t}",
+    "Thinking about the last few months: {t}",
+    "{T} (at least lately)",
+]
+BASE_TIME = datetime(2024, 1, 1)
+INSERT_CHUNK = 10000
+
+# Share of cells moved by +-1 per partner, extra partner B disagreement, answered share range
+JITTER = 0.20
+DISAGREE = 0.15
+COVERAGE = (0.6, 1.0)
+
+
+def paraphrase(feature: str, template: int) -> str:
+    text = ID2TEXT[feature]
+    first = text.split()[0]
+    lowered = text if first == "I" or first.startswith("I'") else text[0].lower() + text[1:]
+    return TEMPLATES[template].format(T=text, t=lowered)
+
+
+def sample_couples(n: int, rng: np.random.Generator, cohort: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(n, 54) answer matrices for partners A and B, NaN where the partner skipped the item."""
+    base = cohort[rng.integers(0, len(cohort), size=n)].astype(float)
+
+    def partner(extra: float) -> np.ndarray:
+        x = base + rng.choice([-1.0, 1.0], size=base.shape) * (rng.random(base.shape) < JITTER)
+        x += rng.choice([-2.0, -1.0, 1.0, 2.0], size=base.shape) * (rng.random(base.shape) < extra)
+        x = np.clip(x, 0, 4)
+        coverage = rng.uniform(*COVERAGE, size=(n, 1))
+        return np.where(rng.random(base.shape) < coverage, x, np.nan)
+
+    return partner(0.0), partner(DISAGREE)
+
+
+def _next_ids(conn) -> Dict[str, int]:
+    return {
+        model.__tablename__: (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+        for model in (Doctor, Couple, Assessment, Answer, Prediction)
+    }
+
+
+def _insert(conn, model, rows: List[Dict[str, Any]]):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        conn.execute(insert(model.__table__), rows[start:start + INSERT_CHUNK])
+
+
+def seed(doctors: int, couples_per_doctor: int, assessments_per_couple: int, seed: int = SEED) -> Dict[str, int]:
+    """Insert doctors -> couples -> assessments -> answers + one prediction (and its risk points) each; one transaction per doctor."""
+    upgrade(engine)
+    rng = np.random.default_rng(seed)
+    cohort = pd.read_csv(DATA_PATH)[FEATURES].to_numpy(dtype=float)
+    counts = {"doctors": 0, "couples": 0, "assessments": 0, "answers": 0, "predictions": 0}
+
+    with engine.begin() as conn:
+        ids = _next_ids(conn)  # re-runs continue after existing rows
+
+    for d in range(doctors):
+        n_assess = couples_per_doctor * assessments_per_couple
+        X_a, X_b = sample_couples(n_assess, rng, cohort)
+        templates = rng.integers(0, len(TEMPLATES), size=(n_assess, 2, len(FEATURES)))
+        fusion = fuse_partners(X_a, X_b, strategy=FUSION_STRATEGY)
+        probas = score_matrix(fusion.fused)
+
+        doctor_id = ids["doctors"]
+        doctor_rows = [{"id": doctor_id, "name": f"Dr. Synthetic {doctor_id}",
+                        "email": f"doctor{doctor_id}@seed.example", "created_at": BASE_TIME}]
+        couple_rows, assess_rows, answer_rows, pred_rows, point_rows = [], [], [], [], []
+        for c in range(couples_per_doctor):
+            couple_id = ids["couples"] + c
+            couple_rows.append({"id": couple_id, "doctor_id": doctor_id, "partner_a_name": f"A{couple_id}",
+                                "partner_b_name": f"B{couple_id}", "created_at": BASE_TIME + timedelta(days=c % 365)})
+            for k in range(assessments_per_couple):
+                i = c * assessments_per_couple + k
+                assessment_id = ids["assessments"] + i
+                created = BASE_TIME + timedelta(days=c % 365 + 30 * k)
+                assess_rows.append({"id": assessment_id, "couple_id": couple_id, "doctor_id": doctor_id,
+                                    "title": f"Session {k + 1}", "created_at": created})
+                for p, X in enumerate((X_a, X_b)):
+                    for j in np.flatnonzero(~np.isnan(X[i])):
+                        answer_rows.append({"assessment_id": assessment_id, "doctor_id": doctor_id, "partner": "AB"[p],
+                                            "value": int(X[i, j]), "user_text": paraphrase(FEATURES[j], templates[i, p, j]),
+                                            "created_at": created})
+                proba = float(probas[i])
+                prediction_id = ids["predictions"] + i
+                vector = stored_vector(fusion.fused[i])
+                pred_rows.append({
+                    "id": prediction_id, "assessment_id": assessment_id, "doctor_id": doctor_id, "proba": proba, "pred_class": int(proba >= 0.5),
+                    "vector_json": vector, "audit_json": [], "fusion_json": fusion_summary(fusion, i, FUSION_STRATEGY),
+                    "created_at": created + timedelta(minutes=5),
+                })
+                point_rows.extend({"couple_id": couple_id, "prediction_id": prediction_id, "assessment_id": assessment_id,
+                                   "created_at": created + timedelta(minutes=5), **pt} for pt in domain_points(proba, vector))
+
+        with engine.begin() as conn:
+            _insert(conn, Doctor, doctor_rows)
+            _insert(conn, Couple, couple_rows)
+            _insert(conn, Assessment, assess_rows)
+            _insert(conn, Answer, answer_rows)
+            _insert(conn, Prediction, pred_rows)
+            _insert(conn, RiskPoint, point_rows)
+
+        ids["doctors"] += 1
+        ids["couples"] += couples_per_doctor
+        ids["assessments"] += n_assess
+        ids["predictions"] += n_assess
+        counts["doctors"] += 1
+        counts["couples"] += couples_per_doctor
+        counts["assessments"] += n_assess
+        counts["answers"] += len(answer_rows)
+        counts["predictions"] += len(pred_rows)
+    return counts
+
+
+# Request mix for traces: (weight, kind)
+TRACE_MIX = [
+    (20, "dashboard"),
+    (20, "overview"),
+    (10, "history"),
+    (5, "couple"),
+    (10, "recommendation"),
+    (5, "explain"),
+    (10, "whatif"),
+    (5, "similar"),
+    (10, "next_question"),
+    (5, "bulk_predict"),
+]
+
+
+def _trace_call(kind: str, rng: np.random.Generator, ids: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    pick = lambda name: int(ids[name][rng.integers(0, len(ids[name]))])
+    if kind == "dashboard":
+        return {"method": "GET", "path": f"/doctors/{pick('doctors')}/dashboard"}
+    if kind in ("overview", "history"):
+        return {"method": "GET", "path": f"/couples/{pick('couples')}/{kind}"}
+    if kind == "couple":
+        return {"method": "GET", "path": f"/couples/{pick('couples')}"}
+    if kind == "recommendation":
+        return {"method": "GET", "path": f"/assessments/{pick('assessments')}/recommendation"}
+    if kind == "explain":
+        return {"method": "GET", "path": f"/predictions/{pick('predictions')}/explain"}
+    if kind == "whatif":
+        return {"method": "POST", "path": f"/assessments/{pick('assessments')}/whatif", "body": {"top_k": 5}}
+    if kind == "similar":
+        return {"method": "GET", "path": f"/assessments/{pick('assessments')}/similar?k=10"}
+    if kind == "next_question":
+        return {"method": "GET", "path": f"/assessments/{pick('assessments')}/next_question"}
+    return {"method": "POST", "path": "/assessments/predict/bulk",
+            "body": {"assessment_ids": sorted({pick("assessments") for _ in range(20)})}}
+
+
+def make_trace(n: int, seed: int = SEED) -> List[Dict[str, Any]]:
+    """n calls drawn from TRACE_MIX over the ids present in the database (same DB + seed -> same trace)."""
+    rng = np.random.default_rng(seed)
+    with engine.connect() as conn:
+        ids = {
+            "doctors": np.array(conn.execute(select(Doctor.id).order_by(Doctor.id)).scalars().all()),
+            "couples": np.array(conn.execute(select(Couple.id).order_by(Couple.id)).scalars().all()),
+            "assessments": np.array(conn.execute(select(Prediction.assessment_id).distinct().order_by(Prediction.assessment_id)).scalars().all()),
+            "predictions": np.array(conn.execute(select(Prediction.id).order_by(Prediction.id)).scalars().all()),
+        }
+    if any(len(v) == 0 for v in ids.values()):
+        raise RuntimeError("Database has no seeded rows; run `python seed_data.py seed` first")
+    weights = np.array([w for w, _ in TRACE_MIX], dtype=float)
+    kinds = rng.choice(len(TRACE_MIX), size=n, p=weights / weights.sum())
+    return [_trace_call(TRACE_MIX[k][1], rng, ids) for k in kinds]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_seed = sub.add_parser("seed", help="Bulk-insert synthetic doctors/couples/assessments/answers/predictions")
+    p_seed.add_argument("--doctors", type=int, default=100)
+    p_seed.add_argument("--couples-per-doctor", type=int, default=100)
+    p_seed.add_argument("--assessments-per-couple", type=int, default=3)
+    p_seed.add_argument("--seed", type=int, default=SEED)
+    p_trace = sub.add_parser("trace", help="Write a replayable JSONL request trace for load_test.py --trace")
+    p_trace.add_argument("--out", default="traces/mixed.jsonl")
+    p_trace.add_argument("-n", "--requests", type=int, default=10000)
+    p_trace.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.cmd == "seed":
+        counts = seed(args.doctors, args.couples_per_doctor, args.assessments_per_couple, seed=args.seed)
+        rows = sum(counts.values())
+        elapsed = time.perf_counter() - start
+        print(json.dumps({**counts, "seconds": round(elapsed, 1), "rows_per_s": round(rows / elapsed)}))
+    else:
+        calls = make_trace(args.requests, seed=args.seed)
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            for call in calls:
+                f.write(json.dumps(call, separators=(",", ":")) + "\n")
+        print(json.dumps({"out": args.out, "requests": len(calls), "seconds": round(time.perf_counter() - start, 1)}))
+
+
+if __name__ == "__main__":
+    main()
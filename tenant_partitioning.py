@@ -0,0 +1,170 @@
+# tenant_partitioning.py
+"""
+Tenant (doctor) partitioning of assessments, answers and predictions.
+
+  keys       any database: app.migrate.upgrade() - add every column the models added to
+             existing tables, backfill the doctor_id sharding key on answers and predictions
+             (copied from their assessment, in short id-range batches), then create the
+             model indexes whose columns exist, including the composite ones
+             (answers(assessment_id, partner, id), predictions(assessment_id, id),
+             predictions(doctor_id, created_at), assessments(doctor_id, couple_id));
+             CONCURRENTLY on PostgreSQL.
+  partition  PostgreSQL only: rebuild the three tables as PARTITION BY HASH (doctor_id)
+             with --partitions partitions (primary keys become (id, doctor_id)), copy the
+             rows, and swap names in one transaction (run it in a maintenance window).
+             PostgreSQL cannot reference a partitioned table by id alone, so foreign
+             keys pointing at these tables are dropped; the ORM cascades still apply.
+             The old tables stay as <name>_unpartitioned until `drop-old`.
+  drop-old   PostgreSQL only: drop the <name>_unpartitioned tables left by `partition`
+             (no-op when they are already gone).
+  bench      latency of a small tenant's hot queries while one large tenant holds most
+             rows (seeds that layout with seed_data.py when --seed is given). Run it
+             before and after `partition` against the same local PostgreSQL.
+
+    python tenant_partitioning.py keys
+    python tenant_partitioning.py bench --seed
+    python tenant_partitioning.py partition --partitions 16
+    python tenant_partitioning.py bench
+    python tenant_partitioning.py drop-old
+"""
+import json
+import time
+import argparse
+from typing import Any, Dict, List
+import numpy as np
+from sqlalchemy import func, select, text
+from app.db import Base, engine
+from app.migrate import upgrade
+from app.models import Assessment, Couple, Prediction
+from app.services.predictor import _answers_query, _latest_predictions_query
+from app.services.export import export_query
+from seed_data import seed
+
+TABLES = ("assessments", "answers", "predictions")
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def add_keys(batch_size: int = 50000) -> Dict[str, Any]:
+    """Bring the schema up to the models (columns first, then the doctor_id backfill, then indexes)."""
+    return upgrade(engine, batch_size)
+
+
+def _referencing_fks(conn) -> List[tuple]:
+    """(table, constraint) of every foreign key that points at one of TABLES."""
+    return conn.execute(text(
+        "SELECT c.conrelid::regclass::text, c.conname FROM pg_constraint c "
+        "WHERE c.contype = 'f' AND c.confrelid::regclass::text = ANY(:tables)"
+    ), {"tables": list(TABLES)}).all()
+
+
+def partition(partitions: int = 16) -> Dict[str, int]:
+    if not _is_postgres():
+        raise SystemExit("partition needs PostgreSQL (declarative partitioning); use `keys` elsewhere")
+    counts = {}
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE assessments, answers, predictions IN ACCESS EXCLUSIVE MODE"))
+        for table, constraint in _referencing_fks(conn):
+            conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+        for table in TABLES:
+            new = f"{table}_part"
+            conn.execute(text(f"CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY HASH (doctor_id)"))
+            conn.execute(text(f"ALTER TABLE {new} ADD PRIMARY KEY (id, doctor_id)"))
+            for r in range(partitions):
+                conn.execute(text(f"CREATE TABLE {table}_p{r} PARTITION OF {new} FOR VALUES WITH (MODULUS {partitions}, REMAINDER {r})"))
+            counts[table] = conn.execute(text(f"INSERT INTO {new} SELECT * FROM {table}")).rowcount
+            conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned"))
+            conn.execute(text(f"ALTER TABLE {new} RENAME TO {table}"))
+            conn.execute(text(f"ALTER SEQUENCE IF EXISTS {table}_id_seq OWNED BY {table}.id"))
+            # indexes on the parent are created on every partition
+            for index in Base.metadata.tables[table].indexes:
+                conn.execute(text(f"ALTER INDEX IF EXISTS {index.name} RENAME TO {index.name}_unpartitioned"))
+                conn.execute(text(f"CREATE INDEX {index.name} ON {table} ({', '.join(c.name for c in index.columns)})"))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in TABLES:
+            conn.execute(text(f"ANALYZE {table}"))
+    return counts
+
+
+def drop_old() -> List[str]:
+    """Drop the pre-partitioning copies; idempotent."""
+    if not _is_postgres():
+        raise SystemExit("drop-old needs PostgreSQL (only `partition` leaves old tables behind)")
+    with engine.begin() as conn:
+        old = [t for t in TABLES if conn.execute(text("SELECT to_regclass(:n)"), {"n": f"{t}_unpartitioned"}).scalar()]
+        for table in old:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}_unpartitioned CASCADE"))
+    return old
+
+
+def _timed(conn, stmt, repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(stmt).all()
+        out.append((time.perf_counter() - start) * 1000)
+    return out
+
+
+def bench(samples: int = 200, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """p50 / p95 ms of the small tenants' hot queries (the largest tenant is left out of the sample)."""
+    rng = np.random.default_rng(seed)
+    with engine.connect() as conn:
+        sizes = dict(conn.execute(select(Assessment.doctor_id, func.count()).group_by(Assessment.doctor_id)).all())
+        large = max(sizes, key=sizes.get)
+        small = [d for d in sizes if d != large]
+        picks = conn.execute(
+            select(Assessment.id, Assessment.doctor_id, Assessment.couple_id).where(Assessment.doctor_id.in_(small))
+        ).all()
+        picks = [picks[i] for i in rng.integers(0, len(picks), size=samples)]
+        timings: Dict[str, List[float]] = {"answers_for_predict": [], "latest_prediction": [], "dashboard_latest": [], "tenant_export_count": []}
+        for aid, doctor_id, couple_id in picks:
+            timings["answers_for_predict"] += _timed(conn, _answers_query([aid], [doctor_id]), 1)
+            timings["latest_prediction"] += _timed(conn, _latest_predictions_query([aid], [doctor_id]), 1)
+            timings["dashboard_latest"] += _timed(conn, (
+                select(Assessment.couple_id, func.max(Prediction.id))
+                .join(Prediction, Prediction.assessment_id == Assessment.id)
+                .join(Couple, Couple.id == Assessment.couple_id)
+                .where(Couple.doctor_id == doctor_id, Prediction.doctor_id == doctor_id)
+                .group_by(Assessment.couple_id)
+            ), 1)
+            timings["tenant_export_count"] += _timed(conn, select(func.count()).select_from(export_query(doctor_id, audit=False).subquery()), 1)
+        rows = {t: conn.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar() for t in TABLES}
+    report = {name: {"p50_ms": round(float(np.percentile(v, 50)), 3), "p95_ms": round(float(np.percentile(v, 95)), 3)}
+              for name, v in timings.items()}
+    return {"dialect": engine.dialect.name, "rows": rows, "large_tenant_share": round(sizes[large] / sum(sizes.values()), 3), **report}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_keys = sub.add_parser("keys", help="Add/backfill doctor_id and create the composite indexes")
+    p_keys.add_argument("--batch-size", type=int, default=50000)
+    p_part = sub.add_parser("partition", help="PostgreSQL: hash-partition assessments/answers/predictions by doctor_id")
+    p_part.add_argument("--partitions", type=int, default=16)
+    sub.add_parser("drop-old", help="PostgreSQL: drop the *_unpartitioned tables left by partition")
+    p_bench = sub.add_parser("bench", help="Small-tenant query latency next to one large tenant")
+    p_bench.add_argument("--seed", action="store_true", help="First seed 1 large + --small-tenants small tenants")
+    p_bench.add_argument("--large-couples", type=int, default=5000)
+    p_bench.add_argument("--small-tenants", type=int, default=50)
+    p_bench.add_argument("--small-couples", type=int, default=20)
+    p_bench.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.cmd == "keys":
+        print(json.dumps(add_keys(args.batch_size)))
+    elif args.cmd == "partition":
+        print(json.dumps(partition(args.partitions)))
+    elif args.cmd == "drop-old":
+        print(json.dumps({"dropped": drop_old()}))
+    else:
+        if args.seed:
+            seed(1, args.large_couples, 3)
+            seed(args.small_tenants, args.small_couples, 3, seed=1)
+        print(json.dumps(bench(args.samples)))
+
+
+if __name__ == "__main__":
+    main()
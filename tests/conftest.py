@@ -0,0 +1,62 @@
+# tests/conftest.py
+"""
+The API on a throwaway SQLite database with the offline stub router
+(ROUTER_BACKEND=stub), so the suite needs no Gemini key or PostgreSQL:
+
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+import itertools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TMP = tempfile.mkdtemp(prefix="divorce-tests-")
+
+# config.py / app/db.py read the environment at import time: set it before importing the app
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ.pop("SCORING_SERVICE", None)
+os.environ["ROUTER_BACKEND"] = "stub"
+os.environ["GEMINI_API_KEY"] = os.environ.get("GEMINI_API_KEY") or "test"
+os.environ["ARCHIVE_AFTER_DAYS"] = "0"
+os.environ["SIMILAR_INDEX_PATH"] = ""
+os.environ["SHADOW_MODEL_PATHS"] = ""
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # model / data paths in config.py are relative to the repo root
+
+import pytest
+from fastapi.testclient import TestClient
+from canonical import canonical_items
+from app.db import engine
+from app.main import app
+from app.migrate import upgrade
+
+upgrade(engine)  # the deploy step: the API does not create or migrate tables itself
+
+TEXTS = [c["text"] for c in canonical_items]
+_emails = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def doctor(client):
+    return client.post("/doctors", json={"name": "Dr Test", "email": f"doctor{next(_emails)}@example.com"}).json()
+
+
+@pytest.fixture
+def make_assessment(client):
+    """(doctor, n_answers, b_shift) -> assessment json, for a new couple with answers from both partners (B's shifted by b_shift)."""
+    def make(doctor, n_answers: int = 20, b_shift: int = 0):
+        couple = client.post("/couples", json={"doctor_id": doctor["id"], "partner_a_name": "A", "partner_b_name": "B"}).json()
+        assessment = client.post("/assessments", json={"doctor_id": doctor["id"], "couple_id": couple["id"], "title": "t"}).json()
+        items = [{"partner": p, "value": (i * 3 + (b_shift if p == "B" else 0)) % 5, "text": TEXTS[i]}
+                 for i in range(n_answers) for p in "AB"]
+        client.post(f"/assessments/{assessment['id']}/answers/bulk", json={"items": items})
+        return assessment
+    return make
@@ -0,0 +1,45 @@
+# tests/test_adaptive.py
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from canonical import FEATURES, ID2TEXT
+from app.services.adaptive import next_question, partial_vector
+
+
+def test_partial_vector_fuses_verbatim_answers_over_the_routed_vector():
+    answers = [SimpleNamespace(partner="A", value=4, user_text=ID2TEXT["Atr1"].upper()),
+               SimpleNamespace(partner="B", value=2, user_text=ID2TEXT["Atr1"]),
+               SimpleNamespace(partner="A", value=3, user_text="something else entirely")]
+    x = partial_vector(answers, routed={"Atr1": 0, "Atr2": 1})
+    assert x[FEATURES.index("Atr1")] == 3.0  # mean of the direct answers wins over the routed 0
+    assert x[FEATURES.index("Atr2")] == 1.0
+    assert np.isnan(x).sum() == len(FEATURES) - 2
+
+
+def test_next_question_ranks_open_items_by_mode():
+    x = np.full(len(FEATURES), np.nan)
+    x[:10] = 2.0
+    change = next_question(x, mode="change", top_k=5)
+    stabilize = next_question(x, mode="stabilize", top_k=5)
+    assert change["remaining"] == len(FEATURES) - 10 and change["answered"] == 10
+    assert all(c["feature"] not in FEATURES[:10] for c in change["candidates"])
+    shifts = [c["expected_shift"] for c in change["candidates"]]
+    assert shifts == sorted(shifts, reverse=True)
+    worst = [c["max_shift"] for c in stabilize["candidates"]]
+    assert worst == sorted(worst, reverse=True)
+    for c in stabilize["candidates"]:
+        assert c["max_shift"] == pytest.approx(max(abs(p - stabilize["proba"]) for p in c["by_value"]), abs=1e-3)
+    if not change["stable"]:
+        assert change["next"] == change["candidates"][0]
+
+
+def test_full_vector_is_stable_and_bad_mode_rejected(client, doctor, make_assessment):
+    done = next_question(np.full(len(FEATURES), 2.0))
+    assert done["stable"] and done["next"] is None and done["remaining"] == 0
+    with pytest.raises(ValueError):
+        next_question(np.full(len(FEATURES), 2.0), mode="fastest")
+
+    a = make_assessment(doctor, n_answers=8)
+    r = client.get(f"/assessments/{a['id']}/next_question", params={"mode": "stabilize"})
+    assert r.status_code == 200 and r.json()["answered"] == 8 and r.json()["mode"] == "stabilize"
+    assert client.get(f"/assessments/{a['id']}/next_question", params={"mode": "fastest"}).status_code == 400
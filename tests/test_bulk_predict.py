@@ -0,0 +1,24 @@
+# tests/test_bulk_predict.py
+
+
+def test_bulk_predict_returns_one_row_per_id_in_request_order(client, doctor, make_assessment):
+    a, b = make_assessment(doctor), make_assessment(doctor, n_answers=10)
+    single = client.post(f"/assessments/{b['id']}/predict").json()
+    r = client.post("/assessments/predict/bulk", json={"assessment_ids": [b["id"], a["id"], b["id"]]})
+    assert r.status_code == 200
+    items = r.json()["items"]
+    assert [p["assessment_id"] for p in items] == [b["id"], a["id"]]  # duplicates collapse
+    assert items[0]["proba"] == single["proba"]
+    assert all(0.0 <= p["proba"] <= 1.0 for p in items)
+
+
+def test_bulk_predict_unknown_ids_are_404(client, doctor, make_assessment):
+    a = make_assessment(doctor)
+    r = client.post("/assessments/predict/bulk", json={"assessment_ids": [a["id"], 10 ** 9]})
+    assert r.status_code == 404
+    assert str(10 ** 9) in r.json()["detail"]
+
+
+def test_bulk_predict_bounds_the_id_list(client):
+    assert client.post("/assessments/predict/bulk", json={"assessment_ids": []}).status_code == 422
+    assert client.post("/assessments/predict/bulk", json={"assessment_ids": list(range(1, 502))}).status_code == 422
@@ -0,0 +1,62 @@
+# tests/test_cache.py
+import time
+from app.cache import ResponseCache, response_cache
+
+
+def test_invalidate_drops_tagged_entries():
+    cache = ResponseCache(maxsize=8)
+    cache.put("a", b"1", {("doctor", 1)}, cache.versions({("doctor", 1)}))
+    cache.put("b", b"2", {("doctor", 2)}, cache.versions({("doctor", 2)}))
+    cache.invalidate({("doctor", 1)})
+    assert cache.get("a") is None
+    assert cache.get("b").body == b"2"
+
+
+def test_body_built_across_a_write_is_not_kept():
+    cache = ResponseCache(maxsize=8)
+    versions = cache.versions({("couple", 1)})
+    cache.invalidate({("couple", 1)})  # commit lands while the body is being built
+    entry = cache.put("k", b"stale", {("couple", 1)}, versions)
+    assert entry.body == b"stale"
+    assert cache.get("k") is None
+
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(maxsize=8, ttl=0.05)
+    cache.put("k", b"1", {("doctor", 1)}, {})
+    assert cache.get("k") is not None
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+def test_no_store_within_replica_lag_window():
+    cache = ResponseCache(maxsize=8, no_store_after_write=0.1)
+    cache.invalidate({("doctor", 1)})
+    cache.put("k", b"maybe-stale", {("doctor", 1)}, cache.versions({("doctor", 1)}))
+    assert cache.get("k") is None
+    time.sleep(0.15)
+    cache.put("k", b"fresh", {("doctor", 1)}, cache.versions({("doctor", 1)}))
+    assert cache.get("k").body == b"fresh"
+
+
+def test_dashboard_is_cached_and_invalidated_by_writes(client, doctor):
+    first = client.get(f"/doctors/{doctor['id']}/dashboard")
+    assert first.json()["couples"] == []
+    hits = response_cache.stats()["hits"]
+    again = client.get(f"/doctors/{doctor['id']}/dashboard", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert response_cache.stats()["hits"] == hits + 1
+
+    client.post("/couples", json={"doctor_id": doctor["id"], "partner_a_name": "A", "partner_b_name": "B"})
+    after = client.get(f"/doctors/{doctor['id']}/dashboard", headers={"If-None-Match": first.headers["etag"]})
+    assert after.status_code == 200
+    assert len(after.json()["couples"]) == 1
+
+
+def test_prediction_invalidates_dashboard(client, doctor, make_assessment):
+    assessment = make_assessment(doctor)
+    before = client.get(f"/doctors/{doctor['id']}/dashboard").json()
+    assert before["couples"][0]["last_proba"] is None
+    pred = client.post(f"/assessments/{assessment['id']}/predict").json()
+    after = client.get(f"/doctors/{doctor['id']}/dashboard").json()
+    assert after["couples"][0]["last_proba"] == pred["proba"]
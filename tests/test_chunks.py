@@ -0,0 +1,34 @@
+# tests/test_chunks.py
+import asyncio
+import inference
+from gemini_router import estimate_tokens
+from conftest import TEXTS
+
+
+def _cost(chunk):
+    return sum(estimate_tokens(t) + inference._ITEM_OVERHEAD_TOKENS for t in chunk)
+
+
+def test_chunks_keep_order_and_respect_both_limits():
+    texts = TEXTS * 4
+    chunks = inference._chunks(texts, batch_size=25, token_budget=400)
+    assert [t for c in chunks for t in c] == texts
+    assert all(len(c) <= 25 and _cost(c) <= 400 for c in chunks)
+    # greedy: each chunk was closed only because the next text would not fit
+    for c, nxt in zip(chunks, chunks[1:]):
+        assert len(c) == 25 or _cost(c + nxt[:1]) > 400
+
+
+def test_oversized_text_gets_its_own_chunk():
+    huge = "x" * 4000
+    chunks = inference._chunks(["a", huge, "b"], batch_size=10, token_budget=100)
+    assert chunks == [["a"], [huge], ["b"]]
+    assert inference._chunks([], batch_size=10) == []
+
+
+def test_routing_across_chunks_is_index_aligned():
+    texts = TEXTS[:40]
+    one_batch = inference.route_texts(texts, batch_size=len(texts))
+    assert len(inference._chunks(texts, 7)) > 3
+    assert inference.route_texts(texts, batch_size=7) == one_batch
+    assert asyncio.run(inference.route_texts_async(texts, batch_size=7)) == one_batch
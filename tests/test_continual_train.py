@@ -0,0 +1,78 @@
+# tests/test_continual_train.py
+import shutil
+import numpy as np
+import pytest
+import continual_train as ct
+from canonical import FEATURES
+from config import MODEL_PATH
+
+
+def _rows(n, label, start=0, seed=0):
+    X = np.random.default_rng(seed).integers(0, 5, size=(n, len(FEATURES))).astype(np.float32)
+    aid = np.arange(start, start + n)
+    return X, np.full(n, label), aid
+
+
+def test_reservoir_replaces_a_corrected_assessment(tmp_path):
+    store = ct.TrainStore(str(tmp_path))
+    X, y, aid = _rows(10, 0)
+    store.add_to_reservoir("holdout", 100, X, y, aid)
+    store.add_to_reservoir("holdout", 100, X[3:4], np.array([1]), aid[3:4])
+    R_X, R_y, R_a = store.reservoir("holdout")
+    assert len(R_y) == 10 and sorted(R_a) == list(aid)
+    assert R_y[R_a == 3].tolist() == [1]
+
+
+def test_latest_per_assessment_keeps_the_last_row():
+    keep = ct.latest_per_assessment(np.array([5, -1, 6, 5, -1, 7, 6]))
+    assert keep.tolist() == [False, True, False, True, True, True, True]
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    out = tmp_path / "model.json"
+    shutil.copy(MODEL_PATH, out)
+    monkeypatch.setattr(ct, "CANDIDATE_MODEL_PATH", str(tmp_path / "candidate.json"))
+    return str(out)
+
+
+def test_update_promotes_or_rejects_by_the_gates(tmp_path, model):
+    store = ct.TrainStore(str(tmp_path / "store"))
+    X, y, aid = _rows(80, 1, start=1)
+    store.write_part(X, y, aid, aid * 5 + 1, aid)  # couple_id % 5 != 0: all training rows
+    before = open(model).read()
+
+    rejected = ct.update(store, rounds=2, min_new=10, max_acc_drop=-1.0, out=model)  # accuracy must rise by 1.0
+    assert rejected["status"] == "rejected" and rejected["saved_to"] == ct.CANDIDATE_MODEL_PATH
+    assert open(model).read() == before and store.manifest["trained_through"] == 0
+
+    promoted = ct.update(store, rounds=2, min_new=10, max_acc_drop=1.0, out=model)
+    assert promoted["status"] == "promoted" and promoted["new_rows"] == 80
+    assert promoted["trees"] == rejected["trees"] and open(model).read() != before
+    assert store.manifest["trained_through"] == 1
+    assert ct.update(store, min_new=10, out=model)["status"] == "skipped"  # nothing new
+
+
+def test_update_trains_on_the_corrected_label_only(tmp_path, model):
+    store = ct.TrainStore(str(tmp_path / "store"))
+    X, y, aid = _rows(40, 0, start=1)
+    store.write_part(X, y, aid, aid * 5 + 1, aid)
+    store.write_part(X[:10], np.ones(10), aid[:10] + 1000, aid[:10] * 5 + 1, aid[:10])  # corrections
+    assert ct.update(store, rounds=2, min_new=10, max_acc_drop=1.0, out=model)["new_rows"] == 40
+
+
+def test_ingest_supersedes_a_corrected_outcome(client, doctor, make_assessment, tmp_path):
+    a = make_assessment(doctor)
+    client.post(f"/assessments/{a['id']}/predict")
+    store = ct.TrainStore(str(tmp_path / "store"))
+    ingested = 0
+    for outcome in (0, 1):
+        client.post(f"/couples/{a['couple_id']}/outcome", json={"outcome": outcome})
+        ingested += ct.ingest(store, settle_seconds=-60)["ingested"]
+    assert ingested >= 2  # read again with its new label
+    name = "holdout" if a["couple_id"] % ct.HOLDOUT_MOD == 0 else "replay"
+    _, R_y, R_a = store.reservoir(name)
+    assert R_y[R_a == a["id"]].tolist() == [1]
+    new = store.load_parts(store.manifest["parts"])
+    mine = new["assessment_id"] == a["id"]
+    assert new["y"][mine & ct.latest_per_assessment(new["assessment_id"])].tolist() == [1]
@@ -0,0 +1,40 @@
+# tests/test_explain.py
+import math
+import pytest
+from sqlalchemy import delete, select
+from app.db import SessionLocal
+from app.models import PredictionExplanation
+from app.services.explain import backfill_explanations, contributions, pack, vectors_to_matrix
+from app.services.predictor import get_explainer
+
+
+def _logit(p):
+    return math.log(p / (1.0 - p))
+
+
+def test_contributions_add_up_to_the_stored_proba(client, doctor, make_assessment):
+    a = make_assessment(doctor, n_answers=30, b_shift=1)
+    pred = client.post(f"/assessments/{a['id']}/predict").json()
+    assert any(v is not None and v != int(v) for v in pred["vector_json"].values())  # A/B means: half points kept
+    exp = client.get(f"/predictions/{pred['id']}/explain").json()
+    total = exp["base_value"] + sum(it["contribution"] for it in exp["contributions"])
+    assert total == pytest.approx(_logit(pred["proba"]), abs=1e-3)
+    assert "explained_proba" not in exp
+
+
+def test_lazy_and_backfilled_explanations_match_write_time(client, doctor, make_assessment):
+    a = make_assessment(doctor, n_answers=25, b_shift=2)
+    pred = client.post(f"/assessments/{a['id']}/predict").json()
+    with SessionLocal() as db:
+        written = db.execute(select(PredictionExplanation.contribs_json)
+                             .where(PredictionExplanation.prediction_id == pred["id"])).scalar_one()
+    model_name, explainer = get_explainer()
+    assert pack(contributions(explainer, vectors_to_matrix([pred["vector_json"]]))[0]) == written
+
+    with SessionLocal() as db:
+        db.execute(delete(PredictionExplanation))
+        db.commit()
+        assert backfill_explanations(db, model_name, explainer, batch_size=2) >= 1
+        backfilled = db.execute(select(PredictionExplanation)
+                                .where(PredictionExplanation.prediction_id == pred["id"])).scalar_one()
+        assert backfilled.contribs_json == written and backfilled.model == model_name
@@ -0,0 +1,49 @@
+# tests/test_export.py
+import csv
+import io
+import json
+from app.db import engine
+from app.services import export
+from app.services.export import columns, export_query, iter_chunks, write_file
+from app.services.retention import archive_older_than
+
+
+def _doctor_with_predictions(client, doctor, make_assessment, n=3):
+    return [client.post(f"/assessments/{make_assessment(doctor, b_shift=1)['id']}/predict").json() for _ in range(n)]
+
+
+def test_ndjson_stream_is_filtered_by_doctor_and_restores_archived_audits(client, doctor, make_assessment):
+    preds = _doctor_with_predictions(client, doctor, make_assessment)
+    hot_audit = client.get(f"/predictions/{preds[0]['id']}/audit").json()["audit_json"]
+    archive_older_than(-1)
+    r = client.get("/exports/predictions", params={"doctor_id": doctor["id"], "chunk_size": 100})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["prediction_id"] for row in rows] == [p["id"] for p in preds]
+    assert {row["doctor_id"] for row in rows} == {doctor["id"]}
+    assert rows[0]["audit_json"] == hot_audit  # from prediction_archive
+    assert {f: rows[0][f] for f in preds[0]["vector_json"]} == preds[0]["vector_json"]
+    assert set(rows[0]) == set(columns(audit=True))
+
+
+def test_csv_stream_has_one_header_and_no_audit_when_asked(client, doctor, make_assessment):
+    preds = _doctor_with_predictions(client, doctor, make_assessment, n=2)
+    r = client.get("/exports/predictions", params={"doctor_id": doctor["id"], "format": "csv", "audit": False})
+    table = list(csv.reader(io.StringIO(r.text)))
+    assert table[0] == columns(audit=False)
+    assert [int(row[0]) for row in table[1:]] == [p["id"] for p in preds]
+    empty = client.get("/exports/predictions", params={"doctor_id": 10 ** 9, "format": "csv"}).text
+    assert list(csv.reader(io.StringIO(empty))) == [columns(audit=True)]
+
+
+def test_file_export_in_small_chunks_matches_the_stream(client, doctor, make_assessment, tmp_path):
+    _doctor_with_predictions(client, doctor, make_assessment)
+    streamed = client.get("/exports/predictions", params={"doctor_id": doctor["id"]}).text
+    out = tmp_path / "predictions.ndjson"
+    with engine.connect() as conn:
+        chunks = list(iter_chunks(conn, export_query(doctor["id"]), audit=True, chunk_size=2))
+        assert [len(c) for c in chunks] == [2, 1]
+        assert write_file(iter(chunks), "ndjson", str(out), audit=True) == {"rows": 3, "format": "ndjson"}
+    assert out.read_text() == streamed
+    # Parquet / Arrow need pyarrow; without it the file is CSV
+    assert export.resolve_format("parquet") == ("csv" if export.pa is None else "parquet")
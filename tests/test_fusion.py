@@ -0,0 +1,65 @@
+# tests/test_fusion.py
+import numpy as np
+import pytest
+from canonical import FEATURES
+from app.services.fusion import fuse_partners, fusion_summary, SRC_A, SRC_BOTH
+
+POS = FEATURES.index("Atr1")   # higher answer = lower risk
+NEG = FEATURES.index("Atr31")  # higher answer = higher risk
+
+
+def _pair(a_pos, b_pos, a_neg, b_neg):
+    a = np.full((1, len(FEATURES)), np.nan)
+    b = np.full((1, len(FEATURES)), np.nan)
+    a[0, POS], b[0, POS], a[0, NEG], b[0, NEG] = a_pos, b_pos, a_neg, b_neg
+    return a, b
+
+
+def test_mean_and_single_answers():
+    a, b = _pair(4.0, 0.0, 1.0, np.nan)
+    res = fuse_partners(a, b, "mean")
+    assert res.fused[0, POS] == 2.0
+    assert res.fused[0, NEG] == 1.0  # only A answered: used as is
+    assert np.isnan(res.fused[0, FEATURES.index("Atr2")])  # neither answered
+    assert res.source[0, POS] == SRC_BOTH and res.source[0, NEG] == SRC_A
+    assert res.disagreement[0, POS] == 1.0 and np.isnan(res.disagreement[0, NEG])
+
+
+def test_max_and_min_risk_follow_item_direction():
+    a, b = _pair(4.0, 1.0, 4.0, 1.0)
+    riskiest = fuse_partners(a, b, "max_risk").fused[0]
+    safest = fuse_partners(a, b, "min_risk").fused[0]
+    assert riskiest[POS] == 1.0 and riskiest[NEG] == 4.0
+    assert safest[POS] == 4.0 and safest[NEG] == 1.0
+
+
+def test_confidence_weights_the_surer_partner():
+    a, b = _pair(4.0, 0.0, np.nan, np.nan)
+    conf_a = np.zeros((1, len(FEATURES)))
+    conf_b = np.zeros((1, len(FEATURES)))
+    conf_a[0, POS], conf_b[0, POS] = 0.75, 0.25
+    assert fuse_partners(a, b, "confidence", conf_a, conf_b).fused[0, POS] == pytest.approx(3.0)
+    # no confidence on either side: plain mean
+    assert fuse_partners(a, b, "confidence", conf_a * 0, conf_b * 0).fused[0, POS] == 2.0
+
+
+def test_disagreement_pulls_towards_risk():
+    a, b = _pair(3.0, 1.0, 2.0, 2.0)
+    res = fuse_partners(a, b, "disagreement")
+    # |3 - 1| / 4 = 0.5: halfway between the mean (2) and the riskier answer (1)
+    assert res.fused[0, POS] == pytest.approx(1.5)
+    assert res.fused[0, NEG] == 2.0  # agreement: the mean
+
+
+def test_unknown_strategy_is_rejected():
+    a, b = _pair(1.0, 1.0, 1.0, 1.0)
+    with pytest.raises(ValueError):
+        fuse_partners(a, b, "median")
+
+
+def test_summary_counts_sources():
+    a, b = _pair(4.0, 0.0, np.nan, 2.0)
+    summary = fusion_summary(fuse_partners(a, b, "mean"), 0, "mean")
+    assert summary["answered_by"] == {"A": 0, "B": 1, "both": 1}
+    assert summary["disagreement"] == {"Atr1": 1.0}
+    assert summary["mean_disagreement"] == 1.0
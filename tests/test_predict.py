@@ -0,0 +1,93 @@
+# tests/test_predict.py
+import asyncio
+import pytest
+from app.services.predictor import predict_for_assessments_async, scoring_fingerprint
+from conftest import TEXTS
+
+
+def _router_calls(client) -> int:
+    return client.get("/metrics/router").json()["calls"]
+
+
+def test_unchanged_answers_reuse_the_latest_prediction(client, doctor, make_assessment):
+    assessment = make_assessment(doctor)
+    first = client.post(f"/assessments/{assessment['id']}/predict").json()
+    calls = _router_calls(client)
+    again = client.post(f"/assessments/{assessment['id']}/predict").json()
+    assert again["id"] == first["id"]
+    assert _router_calls(client) == calls  # short-circuited before routing
+
+    bulk = client.post("/assessments/predict/bulk", json={"assessment_ids": [assessment["id"]]}).json()
+    assert [p["id"] for p in bulk["items"]] == [first["id"]]
+
+
+def test_new_answer_makes_a_new_prediction(client, doctor, make_assessment):
+    assessment = make_assessment(doctor)
+    first = client.post(f"/assessments/{assessment['id']}/predict").json()
+    client.post(f"/assessments/{assessment['id']}/answers/bulk",
+                json={"items": [{"partner": "A", "value": 4, "text": TEXTS[30]}]})
+    second = client.post(f"/assessments/{assessment['id']}/predict").json()
+    assert second["id"] != first["id"]
+
+
+def test_fingerprint_change_invalidates_the_hash(client, doctor, make_assessment, monkeypatch):
+    import app.services.predictor as predictor
+    assessment = make_assessment(doctor)
+    first = client.post(f"/assessments/{assessment['id']}/predict").json()
+    monkeypatch.setattr(predictor, "_fingerprint", scoring_fingerprint() + ":retrained")
+    second = client.post(f"/assessments/{assessment['id']}/predict").json()
+    assert second["id"] != first["id"]
+
+
+def _slow_predict(monkeypatch, fail=None):
+    """Replace _predict_async with a fake whose first call is the slowest; returns the list of calls made."""
+    import app.services.predictor as predictor
+    calls = []
+
+    async def fake(db, ids, decision_thr):
+        calls.append(list(ids))
+        n = len(calls)
+        await asyncio.sleep(0.05 if n == 1 else 0.01)
+        if fail and n == 1:
+            raise fail
+        return [f"row-{aid}-{n}" for aid in ids]
+
+    monkeypatch.setattr(predictor, "_predict_async", fake)
+    return calls
+
+
+def test_concurrent_requests_share_one_computation(monkeypatch):
+    calls = _slow_predict(monkeypatch)
+
+    async def run():
+        return await asyncio.gather(predict_for_assessments_async(None, [1, 2]),
+                                    predict_for_assessments_async(None, [2, 3]))
+    first, second = asyncio.run(run())
+    assert first == ["row-1-1", "row-2-1"] and second == ["row-2-1", "row-3-2"]
+    assert calls == [[1, 2], [3]]
+
+
+def test_waiters_recompute_when_the_leader_is_cancelled(monkeypatch):
+    calls = _slow_predict(monkeypatch)
+
+    async def run():
+        leader = asyncio.create_task(predict_for_assessments_async(None, [7]))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(predict_for_assessments_async(None, [7])) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+    assert asyncio.run(run()) == [["row-7-2"], ["row-7-2"]]  # one recomputation, shared
+    assert calls == [[7], [7]]
+
+
+def test_leader_errors_reach_the_waiters(monkeypatch):
+    _slow_predict(monkeypatch, fail=RuntimeError("router down"))
+
+    async def run():
+        return await asyncio.gather(predict_for_assessments_async(None, [9]),
+                                    predict_for_assessments_async(None, [9]), return_exceptions=True)
+    errors = asyncio.run(run())
+    assert all(isinstance(e, RuntimeError) and str(e) == "router down" for e in errors)
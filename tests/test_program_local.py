@@ -0,0 +1,47 @@
+# tests/test_program_local.py
+import app.services.recommendation as recommendation
+from program_local import MAINTENANCE_TASKS, WEEKS, render_program, schedule
+from app.services.recommendation import build_modules, calculate_domain_risks, risk_band
+
+
+def _domains(**risks):
+    return {d: {"risk": r, "band": risk_band(r)} for d, r in risks.items()}
+
+
+def test_riskiest_domains_recur_when_fewer_than_four():
+    domains = _domains(criticism=0.9, volatility=0.6, values=0.1)
+    modules = [{"domain": "volatility", "tasks": ["v1", "v2", "v3"]}, {"domain": "criticism", "tasks": ["c1", "c2", "c3"]}]
+    weeks = schedule(domains, modules)
+    assert [w["domains"] for w in weeks] == [["criticism"], ["volatility"], ["criticism"], ["volatility"]]
+    assert [w["tasks"] for w in weeks[::2]] == [["c1", "c2"], ["c3", "c1"]]  # each visit takes the next tasks
+
+
+def test_domains_beyond_four_ride_along_with_one_task():
+    risks = {d: 0.9 - i * 0.05 for i, d in enumerate(sorted(MAINTENANCE_TASKS))}
+    modules = [{"domain": d, "tasks": [f"{d}-1", f"{d}-2"]} for d in risks]
+    weeks = schedule(_domains(**risks), modules)
+    order = sorted(risks, key=lambda d: -risks[d])
+    assert [w["domains"] for w in weeks] == [[order[k], order[k + WEEKS]] for k in range(WEEKS)]
+    assert all(len(w["tasks"]) == 3 for w in weeks)
+
+
+def test_low_risk_couples_get_a_maintenance_program():
+    text = render_program(_domains(affection=0.2, values=0.1, criticism=0.15), [])
+    rows = [line for line in text.splitlines() if line.startswith("| Week ") and "Domain Focus" not in line]
+    assert len(rows) == WEEKS
+    assert "Affection (Green, risk 0.2)" in rows[0] and "Criticism (Green, risk 0.15)" in rows[1]
+    assert MAINTENANCE_TASKS["affection"][0] in rows[0]
+
+
+def test_recommendation_falls_back_to_the_local_program(client, doctor, make_assessment, monkeypatch):
+    async def gemini_down(*args):
+        raise RuntimeError("quota")
+
+    monkeypatch.setattr(recommendation, "PROGRAM_BACKEND", "gemini")
+    monkeypatch.setattr(recommendation, "call_gemini_recommend_async", gemini_down)
+    a = make_assessment(doctor, n_answers=40)
+    pred = client.post(f"/assessments/{a['id']}/predict").json()
+    rec = client.post(f"/assessments/{a['id']}/recommendation").json()
+    domains = calculate_domain_risks(pred["vector_json"])
+    assert rec["source"] == "local"
+    assert rec["text"] == render_program(domains, build_modules(domains))
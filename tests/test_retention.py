@@ -0,0 +1,29 @@
+# tests/test_retention.py
+from app.services.retention import archive_older_than, encode, decode
+
+
+def test_encode_roundtrip():
+    audit = [{"user_text": "x", "status": "ok", "confidence": 0.9}]
+    fusion = {"strategy": "mean", "disagreement": {"Atr1": 1.0}}
+    assert decode(encode(audit, fusion)) == {"audit_json": audit, "fusion_json": fusion}
+
+
+def test_archive_and_restore(client, doctor, make_assessment):
+    assessment = make_assessment(doctor)
+    pred = client.post(f"/assessments/{assessment['id']}/predict").json()
+    hot = client.get(f"/predictions/{pred['id']}/audit").json()
+    assert not hot["archived"] and hot["audit_json"]
+
+    result = archive_older_than(-1)  # cutoff in the future: everything not yet archived
+    assert result["archived"] >= 1
+
+    cold = client.get(f"/predictions/{pred['id']}/audit").json()
+    assert cold["archived"]
+    assert cold["audit_json"] == hot["audit_json"]
+    assert cold["fusion_json"] == hot["fusion_json"]
+    assert cold["audit_summary"]["entries"] == len(hot["audit_json"])
+
+    # an archived prediction is still served as the latest one
+    history = client.get(f"/couples/{assessment['couple_id']}/history").json()
+    assert history["items"][0]["id"] == pred["id"]
+    assert archive_older_than(-1)["archived"] == 0
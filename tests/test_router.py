@@ -0,0 +1,68 @@
+# tests/test_router.py
+import json
+from types import SimpleNamespace
+import gemini_router as gr
+from canonical import canonical_items
+from router_stub import StubRouterModel, _estimate_tokens
+from conftest import TEXTS
+
+
+def test_lean_system_instruction_sends_keys_not_statements():
+    lean = gr.router_system("lean")
+    assert not any(c["text"] in lean for c in canonical_items)
+    assert all(f'{c["id"]}: {c["key"]}' in lean for c in canonical_items)
+    assert len({c["key"] for c in canonical_items}) == len(canonical_items)
+    assert _estimate_tokens(lean) < _estimate_tokens(gr.router_system("legacy") + "\n".join(TEXTS))
+
+
+def test_lean_and_legacy_route_alike():
+    texts = TEXTS[:12]
+    routed = {}
+    for mode in ("legacy", "lean"):
+        model = StubRouterModel(system_instruction=gr.router_system(mode))
+        resp = model.generate_content(gr._dumps(gr._route_prompt(texts, 1, 0.70, mode=mode), mode=mode))
+        indexed = gr._index_results(json.loads(resp.text), len(texts))
+        routed[mode] = [(indexed[i]["target_id"], indexed[i]["relation"]) for i in range(len(texts))]
+    assert routed["lean"] == routed["legacy"]
+
+
+class _Scripted:
+    """Router model that replays canned replies and records the prompts it was sent."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def generate_content(self, prompt_text):
+        self.prompts.append(json.loads(prompt_text))
+        return SimpleNamespace(text=self.replies.pop(0), candidates=None)
+
+
+def test_truncated_reply_is_salvaged_and_only_the_rest_re_requested(monkeypatch):
+    model = _Scripted('{"r":[[0,"Atr1","e",0.9],[1,"Atr2","c",0.8],[2,"Atr',
+                      '{"r":[[0,"Atr3","e",0.7]]}')
+    monkeypatch.setattr(gr, "gemini_model", model)
+    out = gr.gemini_route_and_relation_batch(TEXTS[:3])
+    assert [r["target_id"] for r in out["results"]] == ["Atr1", "Atr2", "Atr3"]
+    assert out["results"][1]["relation"] == "contradicts"
+    assert model.prompts[1]["t"] == [TEXTS[2]]
+
+
+def test_invalid_items_fail_alone_after_the_repair_rounds(monkeypatch):
+    bad = '{"r":[[0,"Atr999","e",0.9]]}'
+    model = _Scripted('{"r":[[0,"Atr1","e",1.5],[1,"Atr2","n",0.6]]}', *[bad] * gr.ROUTER_REPAIR_ROUNDS)
+    monkeypatch.setattr(gr, "gemini_model", model)
+    out = gr.gemini_route_and_relation_batch(TEXTS[:2])
+    assert out["results"][1]["target_id"] == "Atr2"
+    assert "unknown target_id 'Atr999'" in out["results"][0]["error"]
+    assert len(model.prompts) == 1 + gr.ROUTER_REPAIR_ROUNDS
+
+
+def test_faulty_stub_is_repaired_to_the_clean_routing(monkeypatch):
+    texts = TEXTS[:30]
+    clean = gr._index_results(json.loads(StubRouterModel(system_instruction="").generate_content(
+        gr._dumps(gr._route_prompt(texts, 1, 0.0, mode="lean"), mode="lean")).text), len(texts))
+    monkeypatch.setattr(gr, "ROUTER_REPAIR_ROUNDS", 10)
+    monkeypatch.setattr(gr, "gemini_model", StubRouterModel(faults=0.3, seed=1))
+    out = gr.gemini_route_and_relation_batch(texts)
+    assert [r["target_id"] for r in out["results"]] == [clean[i]["target_id"] for i in range(len(texts))]
@@ -0,0 +1,68 @@
+# tests/test_scoring.py
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from canonical import FEATURES
+from app.services.scoring import ScoringClient, load_scorer, parse_address
+
+
+def _matrix(n, seed):
+    X = np.random.default_rng(seed).integers(0, 5, size=(n, len(FEATURES))).astype(np.float32)
+    X[:, ::7] = np.nan
+    return X
+
+
+@pytest.fixture
+def service(tmp_path):
+    """The scoring service in its own process on a unix socket (SIGTERM stops it, as in production)."""
+    address = f"unix:{tmp_path / 'scoring.sock'}"
+    env = {**os.environ, "SCORING_SERVICE": ""}
+    proc = subprocess.Popen([sys.executable, "-m", "app.services.scoring", "--address", address, "--workers", "1",
+                             "--max-wait-ms", "20"], env=env, stdout=subprocess.PIPE, text=True)
+    assert "scoring service on" in proc.stdout.readline()  # printed once the worker is up and listening
+    yield address, proc
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def test_parse_address():
+    assert parse_address("unix:/tmp/s.sock") == (socket.AF_UNIX, "/tmp/s.sock")
+    assert parse_address("127.0.0.1:7000") == (socket.AF_INET, ("127.0.0.1", 7000))
+    assert parse_address(":7000") == (socket.AF_INET, ("127.0.0.1", 7000))
+
+
+def test_service_scores_like_the_in_process_model_then_falls_back(service):
+    address, proc = service
+    local = load_scorer()
+    client = ScoringClient(address, fallback=lambda: local, retry_seconds=60)
+    batches = [_matrix(n, seed) for seed, n in enumerate([1, 5, 40, 3, 17, 8])]
+    with ThreadPoolExecutor(4) as pool:  # one connection per thread; requests batch together in the service
+        remote = list(pool.map(client, batches))
+    for X, p in zip(batches, remote):
+        np.testing.assert_allclose(p, local(X), rtol=1e-6)
+    assert client.remote_rows == sum(len(X) for X in batches) and client.fallbacks == 0
+
+    proc.send_signal(signal.SIGTERM)
+    proc.wait(timeout=30)
+    X = _matrix(10, 99)
+    np.testing.assert_allclose(client(X), local(X), rtol=1e-6)  # in-process while the service is down
+    stats = client.stats()
+    assert stats["fallbacks"] == 1 and stats["service_down"] and stats["last_error"]
+    client(X)
+    assert client.fallbacks == 2  # no reconnect attempt before retry_seconds
+
+
+def test_unreachable_service_uses_the_fallback(tmp_path):
+    local = load_scorer()
+    client = ScoringClient(f"unix:{tmp_path / 'nobody.sock'}", fallback=lambda: local)
+    X = _matrix(4, 1)
+    start = time.monotonic()
+    np.testing.assert_allclose(client(X), local(X))
+    assert client.fallbacks == 1 and time.monotonic() - start < 1.0
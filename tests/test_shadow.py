@@ -0,0 +1,48 @@
+# tests/test_shadow.py
+import json
+import math
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from canonical import FEATURES
+from app.db import SessionLocal
+from app.services.explain import vectors_to_matrix
+from app.services.shadow import ShadowScorer, _psi, comparison, shadow_report, shadow_report_query
+
+
+def test_psi_is_zero_for_the_same_distribution_and_grows_with_drift():
+    live = np.linspace(0.0, 0.999, 1000)
+    assert _psi(live, live) == 0.0
+    # half the mass moves from [0.0, 0.1) to [0.9, 1.0): two bins of 0.1 vs 0.05 / 0.15
+    shifted = live.copy()
+    shifted[:50] = 0.95
+    expected = (0.05 - 0.1) * math.log(0.05 / 0.1) + (0.15 - 0.1) * math.log(0.15 / 0.1)
+    assert _psi(live, shifted) == pytest.approx(expected)
+    assert _psi(live, np.full(1000, 0.95)) > 0.25  # the usual "significant shift" line
+
+
+def test_comparison_counts_flips_against_the_live_model():
+    live = np.array([0.2, 0.4, 0.6, 0.8])
+    shadow = np.array([0.1, 0.6, 0.4, 0.9])
+    out = comparison(live, shadow)
+    assert out["n"] == 4 and out["agreement"] == 0.5
+    assert out["flips_to_1"] == 1 and out["flips_to_0"] == 1
+    assert out["mean_diff"] == 0.0 and out["mean_abs_diff"] == pytest.approx(0.15)
+
+
+def test_scorer_stores_candidate_scores_for_the_report(client, doctor, make_assessment, tmp_path):
+    pred = client.post(f"/assessments/{make_assessment(doctor)['id']}/predict").json()
+    linear = tmp_path / "always_low.json"
+    linear.write_text(json.dumps({"kind": "linear", "coef": [0.0] * len(FEATURES),
+                                  "fill": [0.0] * len(FEATURES), "intercept": -5.0}))
+    scorer = ShadowScorer([str(linear), str(tmp_path / "missing.json")], SessionLocal, batch_size=8, flush_seconds=0.01)
+    scorer.submit([SimpleNamespace(id=pred["id"])], vectors_to_matrix([pred["vector_json"]]))
+    scorer.flush()
+    scorer.close()
+    assert scorer.stats()["scored"] == 1 and scorer.errors == 1  # the missing candidate only
+
+    with SessionLocal() as db:
+        rows = [r for r in db.execute(shadow_report_query(1000)).all() if r[0] == "always_low"]
+    report = shadow_report(rows)["always_low"]
+    assert report["n"] == 1 and report["live_mean"] == round(pred["proba"], 4)
+    assert report["shadow_mean"] == round(1 / (1 + math.exp(5.0)), 4)
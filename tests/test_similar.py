@@ -0,0 +1,78 @@
+# tests/test_similar.py
+import asyncio
+import numpy as np
+from canonical import FEATURES
+from app.db import AsyncReadSessionLocal
+from app.services.similar import VectorIndex, SRC_PREDICTION, get_index, sync_index
+
+N = len(FEATURES)
+
+
+def _random_index(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 5, size=(n, N)).astype(float)
+    X[rng.random((n, N)) < 0.2] = np.nan
+    index = VectorIndex(capacity=16)  # grows while adding
+    index.add(X, SRC_PREDICTION, refs=np.arange(1, n + 1), couples=np.arange(n), assessments=np.arange(n))
+    return index, X
+
+
+def test_exact_search_ranks_by_rms_over_common_answers():
+    index, X = _random_index(300)
+    hits = index.search(X[7], k=5, exact=True)
+    assert hits[0]["ref"] == 8 and hits[0]["distance"] == 0.0
+    common = ~np.isnan(X[7]) & ~np.isnan(X)
+    brute = np.sqrt(np.nansum(np.where(common, (X - X[7]) ** 2, 0.0), axis=1) / common.sum(axis=1))
+    assert [h["distance"] for h in hits] == [round(float(d), 4) for d in np.sort(brute)[:5]]
+    assert all(h["ref"] != 8 for h in index.search(X[7], k=5, exclude_couple=7))
+
+
+def test_newer_prediction_retires_the_old_row():
+    index, X = _random_index(50)
+    index.add(X[3:4] * 0 + 4.0, SRC_PREDICTION, refs=[999], couples=[3], assessments=[3])
+    assert len(index) == 50 and index.last_prediction_id == 999
+    assert index.search(X[3], k=1, exact=True)[0]["ref"] != 4
+
+
+def test_trained_index_probing_every_cell_is_exact(tmp_path):
+    index, X = _random_index()
+    index.train(n_cells=32)
+    for q in X[:20]:
+        assert index.search(q, k=5, nprobe=32) == index.search(q, k=5, exact=True)
+    index.save(str(tmp_path / "index.npz"))
+    loaded = VectorIndex.load(str(tmp_path / "index.npz"))
+    assert loaded.search(X[0], k=5, nprobe=4) == index.search(X[0], k=5, nprobe=4)
+    assert loaded.last_prediction_id == index.last_prediction_id
+
+
+def test_concurrent_syncs_add_each_prediction_once(client, doctor, make_assessment):
+    for _ in range(3):
+        a = make_assessment(doctor)
+        client.post(f"/assessments/{a['id']}/predict")
+    index = VectorIndex()
+
+    async def sync_twice():
+        async def one():
+            async with AsyncReadSessionLocal() as db:
+                return await sync_index(db, index, batch_size=1)
+        return await asyncio.gather(one(), one())
+
+    added = client.portal.call(sync_twice)
+    assert sum(added) == index.size == index.last_prediction_id >= 3
+    assert len(set(index.ref[:index.size])) == index.size
+
+
+def test_similar_finds_a_couple_with_the_same_answers(client, doctor, make_assessment):
+    a, b = make_assessment(doctor, n_answers=30, b_shift=3), make_assessment(doctor, n_answers=30, b_shift=3)
+    pred_a = client.post(f"/assessments/{a['id']}/predict").json()
+    client.post(f"/assessments/{b['id']}/predict")
+
+    async def catch_up():
+        async with AsyncReadSessionLocal() as db:
+            await sync_index(db, get_index())
+
+    client.portal.call(catch_up)  # what the background refresh does
+    hits = client.get(f"/assessments/{b['id']}/similar", params={"k": 3}).json()["items"]
+    assert hits[0]["distance"] == 0.0 and hits[0]["source"] == "prediction"
+    assert all(h.get("couple_id") != b["couple_id"] for h in hits)
+    assert hits[0]["prediction_id"] == pred_a["id"]
@@ -0,0 +1,69 @@
+# tests/test_tenants.py
+from sqlalchemy import create_engine, text
+from app.db import Base, SessionLocal
+from app.migrate import upgrade
+from app.models import Answer, Prediction, PartnerEnum
+from conftest import TEXTS
+
+
+def test_couple_of_another_doctor_is_rejected(client, doctor):
+    other = client.post("/doctors", json={"name": "Dr Other", "email": f"other-of-{doctor['id']}@example.com"}).json()
+    couple = client.post("/couples", json={"doctor_id": other["id"], "partner_a_name": "A", "partner_b_name": "B"}).json()
+    r = client.post("/assessments", json={"doctor_id": doctor["id"], "couple_id": couple["id"], "title": "t"})
+    assert r.status_code == 400
+
+
+def test_dashboard_lists_only_own_couples(client, doctor, make_assessment):
+    other = client.post("/doctors", json={"name": "Dr Other", "email": f"peer-of-{doctor['id']}@example.com"}).json()
+    mine = make_assessment(doctor)
+    theirs = make_assessment(other)
+    client.post("/assessments/predict/bulk", json={"assessment_ids": [mine["id"], theirs["id"]]})
+
+    dash = client.get(f"/doctors/{doctor['id']}/dashboard").json()
+    assert [c["couple_id"] for c in dash["couples"]] == [mine["couple_id"]]
+    assert dash["couples"][0]["last_proba"] is not None
+
+
+def test_rows_carry_the_tenant_key(client, doctor, make_assessment):
+    assessment = make_assessment(doctor)
+    pred = client.post(f"/assessments/{assessment['id']}/predict").json()
+    with SessionLocal() as db:
+        assert db.get(Prediction, pred["id"]).doctor_id == doctor["id"]
+        doctors = {a.doctor_id for a in db.query(Answer).filter(Answer.assessment_id == assessment["id"])}
+    assert doctors == {doctor["id"]}
+
+
+def test_answers_keyed_to_another_doctor_are_ignored(client, doctor, make_assessment):
+    other = client.post("/doctors", json={"name": "Dr Other", "email": f"stray-of-{doctor['id']}@example.com"}).json()
+    assessment = make_assessment(doctor)
+    first = client.post(f"/assessments/{assessment['id']}/predict").json()
+    with SessionLocal() as db:
+        db.add(Answer(assessment_id=assessment["id"], doctor_id=other["id"], partner=PartnerEnum("A"), value=4, user_text=TEXTS[40]))
+        db.commit()
+    # the stray row is outside this tenant: same answer set, same prediction
+    again = client.post(f"/assessments/{assessment['id']}/predict").json()
+    assert again["id"] == first["id"]
+
+
+def test_keys_step_upgrades_a_database_from_before_tenant_keys(tmp_path):
+    # answers as first created: no doctor_id column and no composite index
+    eng = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(eng, tables=[Base.metadata.tables[t] for t in ("doctors", "couples", "assessments", "questions")])
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE answers (id INTEGER PRIMARY KEY, assessment_id INTEGER NOT NULL REFERENCES assessments(id), "
+                          "question_id INTEGER, partner VARCHAR(1) NOT NULL, value INTEGER NOT NULL, "
+                          "user_text TEXT NOT NULL, created_at DATETIME)"))
+        conn.execute(text("INSERT INTO doctors (id, name, email) VALUES (7, 'Dr Legacy', 'legacy@example.com')"))
+        conn.execute(text("INSERT INTO couples (id, doctor_id, partner_a_name, partner_b_name) VALUES (1, 7, 'A', 'B')"))
+        conn.execute(text("INSERT INTO assessments (id, doctor_id, couple_id, title) VALUES (1, 7, 1, 't')"))
+        for i in range(5):
+            conn.execute(text("INSERT INTO answers (assessment_id, partner, value, user_text) VALUES (1, 'A', 2, :t)"), {"t": TEXTS[i]})
+
+    result = upgrade(eng, batch_size=2)
+    assert "answers.doctor_id" in result["columns_added"]
+    assert result["tenant_keys_backfilled"]["answers"] == 5
+    assert "ix_answers_assessment_partner" in result["indexes_created"]
+    with eng.connect() as conn:
+        assert conn.execute(text("SELECT DISTINCT doctor_id FROM answers")).scalars().all() == [7]
+    again = upgrade(eng)  # idempotent: nothing left to do
+    assert again["columns_added"] == [] and again["indexes_created"] == [] and again["tenant_keys_backfilled"]["answers"] == 0
@@ -0,0 +1,55 @@
+# tests/test_timeline.py
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import delete
+from app.db import SessionLocal
+from app.models import RiskPoint
+from app.services.recommendation import risk_band
+from app.services.timeline import OVERALL, backfill, build_timeline, timeline_query
+
+T0 = datetime(2024, 1, 1)
+
+
+def _point(i, domain, risk):
+    return SimpleNamespace(prediction_id=i, assessment_id=i, domain=domain, risk=risk, band=risk_band(risk),
+                           created_at=T0 + timedelta(days=i))
+
+
+def test_series_deltas_moving_average_and_band_transitions():
+    rows = [_point(i, d, r) for i, r in enumerate([0.2, 0.6, 0.8, 0.3]) for d in ("conflict", OVERALL)]
+    out = build_timeline(rows, window=2)
+    assert list(out) == [OVERALL, "conflict"]
+    overall = out[OVERALL]
+    assert [p["delta"] for p in overall["points"]] == [None, 0.4, 0.2, -0.5]
+    assert [p["moving_avg"] for p in overall["points"]] == [0.2, 0.4, 0.7, 0.55]
+    assert [(t["from"], t["to"], t["direction"]) for t in overall["transitions"]] == [
+        ("Green", "Orange", "worse"), ("Orange", "Red", "worse"), ("Red", "Yellow", "better")]
+    assert overall["latest"] == 0.3 and overall["band"] == "Yellow" and overall["change"] == 0.1
+
+
+def _timeline(client, couple_id):
+    return client.get(f"/couples/{couple_id}/timeline").json()["domains"]
+
+
+def test_timeline_follows_new_predictions_and_backfill(client, doctor, make_assessment):
+    first = make_assessment(doctor, n_answers=10)
+    couple_id = first["couple_id"]
+    second = client.post("/assessments", json={"doctor_id": doctor["id"], "couple_id": couple_id, "title": "t2"}).json()
+    client.post(f"/assessments/{second['id']}/answers/bulk", json={"items": [
+        {"partner": p, "value": 4, "text": "We fight all the time and I insult my spouse."} for p in "AB"]})
+
+    p1 = client.post(f"/assessments/{first['id']}/predict").json()
+    assert [pt["prediction_id"] for pt in _timeline(client, couple_id)[OVERALL]["points"]] == [p1["id"]]
+    p2 = client.post(f"/assessments/{second['id']}/predict").json()  # invalidates the cached timeline
+    domains = _timeline(client, couple_id)
+    overall = domains[OVERALL]["points"]
+    assert [pt["prediction_id"] for pt in overall] == [p1["id"], p2["id"]]
+    assert [pt["risk"] for pt in overall] == [round(p1["proba"], 4), round(p2["proba"], 4)]
+    assert overall[1]["delta"] == round(overall[1]["risk"] - overall[0]["risk"], 4)
+
+    with SessionLocal() as db:
+        db.execute(delete(RiskPoint).where(RiskPoint.couple_id == couple_id))
+        db.commit()
+        assert backfill(db, batch_size=1) >= 2
+        rebuilt = build_timeline(db.execute(timeline_query(couple_id)).all())
+    assert {d: v["points"] for d, v in rebuilt.items()} == {d: v["points"] for d, v in domains.items()}
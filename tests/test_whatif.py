@@ -0,0 +1,37 @@
+# tests/test_whatif.py
+import pytest
+from canonical import FEATURES
+from app.services.whatif import run_whatif
+
+
+def test_whatif_ranks_changes_that_lower_the_risk(client, doctor, make_assessment):
+    a = make_assessment(doctor, n_answers=30)
+    pred = client.post(f"/assessments/{a['id']}/predict").json()
+    out = client.post(f"/assessments/{a['id']}/whatif", json={"top_k": 5}).json()
+    assert out["prediction_id"] == pred["id"]
+    assert out["base_proba"] == pytest.approx(pred["proba"], abs=1e-4)  # same vector, same model
+    assert out["rows_scored"] == 1 + len(FEATURES) * 5
+    for bucket, answered in (("items", True), ("unanswered", False)):
+        deltas = [it["delta"] for it in out[bucket]]
+        assert len(deltas) <= 5 and deltas == sorted(deltas) and all(d < 0 for d in deltas)
+        assert all((pred["vector_json"][it["feature"]] is not None) == answered for it in out[bucket])
+        assert all(it["proba"] == min(it["by_value"]) for it in out[bucket])
+
+
+def test_scenarios_match_single_changes():
+    vector = {f: 2 for f in FEATURES[:20]}
+    best = run_whatif(vector, top_k=1)["items"][0]
+    out = run_whatif(vector, [{"changes": {best["feature"]: best["suggested"]}},
+                              {"name": "clear", "changes": {best["feature"]: None}}], top_k=1)
+    assert out["scenarios"][0]["name"] == "scenario_1"
+    assert out["scenarios"][0]["proba"] == best["proba"]
+    assert out["rows_scored"] == 1 + len(FEATURES) * 5 + 2
+
+
+def test_whatif_validates_scenarios(client, doctor, make_assessment):
+    a = make_assessment(doctor)
+    client.post(f"/assessments/{a['id']}/predict")
+    url = f"/assessments/{a['id']}/whatif"
+    assert client.post(url, json={"scenarios": [{"changes": {"Atr99": 1}}]}).status_code == 400
+    assert client.post(url, json={"scenarios": [{"changes": {"Atr1": 1}}] * 101}).status_code == 422
+    assert client.post(url, json={"scenarios": [{"changes": {"Atr1": 1}}] * 100}).status_code == 200